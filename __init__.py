@@ -32,7 +32,7 @@ import sys
 from .utils import *
 from mathutils import Vector, Matrix, Quaternion
 from bpy.app.handlers import persistent
-from . import auto_load
+from . import auto_load, guid_map
 this_module = sys.modules[__name__]
 auto_load.init()
 
@@ -94,6 +94,7 @@ def add_lex_suite_registered_callback(callback):
 
 @persistent
 def _on_blend_save_pre(context):
+    guid_map.compact_journal()
     for bpy_scene in bpy.data.scenes:
         bpy_scene.smithy2d.version = get_addon_version()
 
@@ -103,13 +104,13 @@ def _on_blend_load_post(dummy):
     if bpy.data.filepath:
         # write the "last_opened_state_info.txt" file (TODO: why do i need this??)
         if bpy.context.scene.smithy2d.scenes:
-            serialized_state = ""
-            for scene in bpy.context.scene.smithy2d.scenes:
-                serialized_state += "{}~\n".format(serialize_scene(scene))
+            def iter_state_chunks():
+                for scene in bpy.context.scene.smithy2d.scenes:
+                    yield from iter_scene_state_chunks(scene)
+                    yield "~\n"
             state_outputfilepath = os.path.join(bpy.path.abspath("//"), ".lexeditor", "last_opened_state_info.txt")
             os.makedirs(os.path.dirname(state_outputfilepath), exist_ok=True)
-            with open(state_outputfilepath, "w") as state_file:
-                state_file.write(serialized_state)
+            write_file_atomic(state_outputfilepath, iter_state_chunks())
     
         # check version
         version_on_file = bpy.context.scene.smithy2d.version
@@ -118,6 +119,7 @@ def _on_blend_load_post(dummy):
             bpy.ops.smithy2d.update_assets_to_addon_version("INVOKE_DEFAULT", old_version=version_on_file, new_version=current_version)
 
         # sync with the assets on drive
+        guid_map.load()
         bpy.ops.smithy2d.sync_with_asset_folder()
 
     for im in bpy.data.images:
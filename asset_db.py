@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import bpy
+from .utils import *
+from . import guid_map
+
+# Asset Registry Database
+# ---------------------------
+# optional index of the scripts folder in .lexeditor/registry.sqlite (see use_asset_registry). the asset
+# folder sync walks the disk once through sync() (only rehashing files whose (mtime, size) changed), reports
+# what changed since the last sync and finds the new scenes/rooms/variants with get_scene_tree().
+# the export syncs the script directories it reads from and answers its "does this script exist" questions
+# from get_file_stats() (see ExportPreflight). deleting a directory unbinds the guids registered inside it.
+#   assets:  one row per scene dir, room dir, variant script and component script with its guid
+#            (if it has one), kind, (mtime_ns, size) and the sha1 of a file's content
+# assetpath is the primary key, so a directory's subtree is one index range ("<dir>/" to "<dir>0",
+# "0" being the character after "/"). the database is only a cache: sync() rebuilds it from the disk.
+# which object states use a component is answered by the in-memory index (component_usage.py).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    assetpath TEXT PRIMARY KEY,
+    guid TEXT,
+    kind TEXT NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER,
+    content_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS assets_guid ON assets(guid);
+CREATE INDEX IF NOT EXISTS assets_kind ON assets(kind, assetpath);
+"""
+
+_connection = None
+_connection_filepath = None
+
+def registry_filepath():
+    return os.path.join(bpy.path.abspath("//"), ".lexeditor", "registry.sqlite")
+
+def is_enabled():
+    return bool(bpy.data.filepath) and bpy.context.scene.smithy2d.use_asset_registry
+
+# the connection to the current blend file's registry. a new registry gets the guid map imported
+def connect():
+    global _connection, _connection_filepath
+    filepath = registry_filepath()
+    if _connection is not None and _connection_filepath == filepath:
+        return _connection
+    close()
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    connection = sqlite3.connect(filepath)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    with connection:
+        connection.executescript(SCHEMA)
+    _connection, _connection_filepath = connection, filepath
+    if connection.execute("SELECT COUNT(*) FROM assets").fetchone()[0] == 0:
+        import_guid_map()
+    return connection
+
+def close():
+    global _connection, _connection_filepath
+    if _connection is not None:
+        _connection.close()
+    _connection, _connection_filepath = None, None
+
+# scenes and rooms are directories, a .lua file at their depth (eg. scripts/<scene>/main.lua) is just a file
+def asset_kind(assetpath, is_dir):
+    if is_dir:
+        if valid_room_assetpath(assetpath):
+            return "room"
+        elif valid_scene_assetpath(assetpath):
+            return "scene"
+    elif valid_variant_assetpath(assetpath):
+        return "variant"
+    elif "/components/" in assetpath and assetpath.endswith(".lua"):
+        return "component"
+    return "file"
+
+def _subtree_where(column):
+    return "({0} = ? OR ({0} >= ? AND {0} < ?))".format(column)
+
+def _subtree_args(dir_assetpath):
+    return (dir_assetpath, dir_assetpath + "/", dir_assetpath + "0")
+
+def _asset_row(assetpath, guid, old_row=None):
+    abspath = asset_abspath(assetpath)
+    stat = os.stat(abspath)
+    if os.path.isdir(abspath):
+        return (assetpath, guid, asset_kind(assetpath, True), stat.st_mtime_ns, None, None)
+    # only rehash files whose (mtime, size) changed
+    if old_row and (old_row[3], old_row[4]) == (stat.st_mtime_ns, stat.st_size):
+        content_hash = old_row[5]
+    else:
+        content_hash = file_content_hash(abspath)
+    return (assetpath, guid, asset_kind(assetpath, False), stat.st_mtime_ns, stat.st_size, content_hash)
+
+# importer: one row for every asset in the guid map (.lexeditor/guids and its journal) that exists on disk
+def import_guid_map():
+    connection = connect()
+    rows = [_asset_row(assetpath, guid) for guid, assetpath in guid_map.get_maps()[0].items()
+        if os.path.exists(asset_abspath(assetpath))]
+    with connection:
+        connection.executemany("INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?)", rows)
+    print("Smithy2D - Imported {} guids into the asset registry".format(len(rows)))
+
+def _iter_script_assetpaths(dir_assetpath="scripts"):
+    pending = [dir_assetpath]
+    while pending:
+        current = pending.pop()
+        try:
+            entries = list(os.scandir(asset_abspath(current)))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        for entry in entries:
+            # skip the exported files (.definition.lua, .component_includes.lua, ...)
+            if entry.name.startswith("."):
+                continue
+            entry_assetpath = "{}/{}".format(current, entry.name)
+            if entry.is_dir():
+                pending.append(entry_assetpath)
+                if asset_kind(entry_assetpath, True) != "file":
+                    yield entry_assetpath
+            elif entry.name.endswith(".lua") and asset_kind(entry_assetpath, False) != "file":
+                yield entry_assetpath
+
+# update the registry from the scripts folder (or one directory of it). returns (changed, removed) assetpaths
+# since the last sync. guid_to_assetpath defaults to the guid map
+def sync(guid_to_assetpath=None, dir_assetpath="scripts"):
+    connection = connect()
+    if guid_to_assetpath is None:
+        guid_to_assetpath = guid_map.get_maps()[0]
+    guids = dict((assetpath, guid) for guid, assetpath in guid_to_assetpath.items())
+    old_rows = dict((row[0], row) for row in connection.execute(
+        "SELECT * FROM assets WHERE " + _subtree_where("assetpath"), _subtree_args(dir_assetpath)))
+    old_rows.pop(dir_assetpath, None)   # only what's inside is walked, the directory's own row stays
+
+    changed = []
+    rows = []
+    for assetpath in _iter_script_assetpaths(dir_assetpath):
+        old_row = old_rows.pop(assetpath, None)
+        row = _asset_row(assetpath, guids.get(assetpath), old_row)
+        if row != old_row:
+            rows.append(row)
+            # a directory's mtime changes with its contents, that's not a change of the directory itself
+            if old_row is None or row[5] != old_row[5]:
+                changed.append(assetpath)
+    removed = sorted(old_rows)
+    with connection:
+        connection.executemany("INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?)", rows)
+        connection.executemany("DELETE FROM assets WHERE assetpath = ?", [(assetpath,) for assetpath in removed])
+    return sorted(changed), removed
+
+# a renamed scene/room directory or variant script
+def rename_subtree(old_assetpath, new_assetpath):
+    connection = connect()
+    with connection:
+        connection.execute("DELETE FROM assets WHERE " + _subtree_where("assetpath"), _subtree_args(new_assetpath))
+        connection.execute("UPDATE assets SET assetpath = ? || substr(assetpath, ?) WHERE " + _subtree_where("assetpath"),
+            (new_assetpath, len(old_assetpath) + 1) + _subtree_args(old_assetpath))
+
+# returns the guids that were registered at or inside the assetpath
+def remove_subtree(assetpath):
+    connection = connect()
+    with connection:
+        guids = [row[0] for row in connection.execute("SELECT guid FROM assets WHERE guid IS NOT NULL AND "
+            + _subtree_where("assetpath"), _subtree_args(assetpath))]
+        connection.execute("DELETE FROM assets WHERE " + _subtree_where("assetpath"), _subtree_args(assetpath))
+    return guids
+
+# bindings made after the sync (the assets it found that weren't bound yet)
+def set_guids(guid_to_assetpath):
+    connection = connect()
+    with connection:
+        connection.executemany("UPDATE assets SET guid = ? WHERE assetpath = ? AND guid IS NOT ?",
+            [(guid, assetpath, guid) for guid, assetpath in guid_to_assetpath.items()])
+
+# queries
+# {assetpath: (size, mtime_ns)} of the variant and component scripts at or inside the directory, as of the last sync
+def get_file_stats(dir_assetpath):
+    return dict((row[0], (row[1], row[2])) for row in connect().execute(
+        "SELECT assetpath, size, mtime_ns FROM assets WHERE size IS NOT NULL AND " + _subtree_where("assetpath"),
+        _subtree_args(dir_assetpath)))
+
+# {scene name: {room name: [variant names]}}, like utils.get_scene_tree_on_disk as of the last sync
+def get_scene_tree():
+    scene_tree = {}
+    for assetpath, kind in connect().execute(
+            "SELECT assetpath, kind FROM assets WHERE kind IN ('scene', 'room', 'variant') ORDER BY assetpath"):
+        parts = assetpath.split("/")
+        if kind == "scene":
+            scene_tree.setdefault(parts[1], {})
+        elif kind == "room":
+            scene_tree.setdefault(parts[1], {}).setdefault(parts[2], [])
+        elif kind == "variant":
+            scene_tree.setdefault(parts[1], {}).setdefault(parts[2], []).append(os.path.splitext(parts[4])[0])
+    return scene_tree
+
+def unregister():
+    close()
@@ -0,0 +1,129 @@
+# Asset Registry
+# ---------------------------
+# {assetpath: value} with a trie over the path segments ("scripts" > "<scene>" > "<room>" > ...) next
+# to the flat dict. lookups go through the dict, subtree queries (a renamed or deleted scene/room
+# directory) only walk the trie nodes below that directory instead of testing every assetpath.
+# prefixes are matched per segment, so "scripts/S/Room1" doesn't contain "scripts/S/Room10".
+# keys are normalized like the trie's segments ("scripts/S/" and "scripts//S" are "scripts/S").
+# used by the guid map (guid_map.py) and the component cache (ecs/component_system.py).
+
+class _Node:
+    __slots__ = ("children", "assetpath")
+
+    def __init__(self):
+        self.children = {}      # {segment: _Node}
+        self.assetpath = None   # set if an assetpath ends at this node
+
+def split_assetpath(assetpath):
+    return [segment for segment in assetpath.split("/") if segment]
+
+def normalize_assetpath(assetpath):
+    return "/".join(split_assetpath(assetpath))
+
+class AssetRegistry:
+    def __init__(self):
+        self.root = _Node()
+        self.values = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, assetpath):
+        return normalize_assetpath(assetpath) in self.values
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, assetpath):
+        return self.values[normalize_assetpath(assetpath)]
+
+    def get(self, assetpath, default=None):
+        return self.values.get(normalize_assetpath(assetpath), default)
+
+    def items(self):
+        return self.values.items()
+
+    # the nodes from the root to the assetpath's node, or None
+    def find_path(self, segments):
+        path = [self.root]
+        for segment in segments:
+            node = path[-1].children.get(segment)
+            if node is None:
+                return None
+            path.append(node)
+        return path
+
+    # remove the nodes at the end of the path that don't lead to any assetpath anymore
+    def prune(self, path, segments):
+        for i in range(len(segments), 0, -1):
+            node = path[i]
+            if node.children or node.assetpath is not None:
+                break
+            del path[i - 1].children[segments[i - 1]]
+
+    def set(self, assetpath, value):
+        segments = split_assetpath(assetpath)
+        assetpath = "/".join(segments)
+        if assetpath not in self.values:
+            node = self.root
+            for segment in segments:
+                child = node.children.get(segment)
+                if child is None:
+                    child = node.children[segment] = _Node()
+                node = child
+            node.assetpath = assetpath
+        self.values[assetpath] = value
+
+    # removes a single assetpath (not the ones inside it)
+    def pop(self, assetpath, default=None):
+        segments = split_assetpath(assetpath)
+        assetpath = "/".join(segments)
+        if assetpath not in self.values:
+            return default
+        path = self.find_path(segments)
+        path[-1].assetpath = None
+        self.prune(path, segments)
+        return self.values.pop(assetpath)
+
+    # (assetpath, value) of the assetpath and everything inside it
+    def iter_subtree(self, dir_assetpath):
+        path = self.find_path(split_assetpath(dir_assetpath))
+        pending = [path[-1]] if path else []
+        while pending:
+            node = pending.pop()
+            if node.assetpath is not None:
+                yield node.assetpath, self.values[node.assetpath]
+            pending.extend(node.children.values())
+
+    # removes the assetpath and everything inside it, returns the removed (assetpath, value)
+    def remove_subtree(self, dir_assetpath):
+        removed = list(self.iter_subtree(dir_assetpath))
+        if not removed:
+            return removed
+        segments = split_assetpath(dir_assetpath)
+        if not segments:
+            self.clear()
+            return removed
+        path = self.find_path(segments)
+        path[-1].children.clear()
+        path[-1].assetpath = None
+        self.prune(path, segments)
+        for assetpath, _ in removed:
+            del self.values[assetpath]
+        return removed
+
+    # move the assetpath and everything inside it, returns [(old assetpath, new assetpath, value)]
+    def move_subtree(self, old_assetpath, new_assetpath):
+        old_len = len(split_assetpath(old_assetpath))
+        new_segments = split_assetpath(new_assetpath)
+        moved = []
+        for assetpath, value in self.remove_subtree(old_assetpath):
+            moved_assetpath = "/".join(new_segments + split_assetpath(assetpath)[old_len:])
+            moved.append((assetpath, moved_assetpath, value))
+        for _, moved_assetpath, value in moved:
+            self.set(moved_assetpath, value)
+        return moved
+
+    def clear(self):
+        self.root = _Node()
+        self.values.clear()
@@ -0,0 +1,138 @@
+# Compares the exported '.definition.lua' files with their '.definition.bin' counterparts (size and parse time).
+# Export with "Binary Definitions" enabled first, then run with plain python (no blender needed):
+#
+#   python benchmarks/definition_format_benchmark.py path/to/project [--repeat 5] [--output results.json]
+#
+# The lua files are parsed with a small reader for the subset of lua the exporter writes,
+# which stands in for the game's own lua parse.
+import os
+import re
+import sys
+import fnmatch
+import json
+import time
+import argparse
+import importlib.util
+
+def load_binary_definition_module():
+    module_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "binary_definition.py")
+    spec = importlib.util.spec_from_file_location("binary_definition", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+_lua_token = re.compile(r'\s*(?:([{}=,\[\]])|"([^"]*)"|(-?(?:inf|nan|[0-9][0-9.eE+\-]*))|([A-Za-z_][A-Za-z_0-9]*))')
+
+def parse_lua_definition(text):
+    tokens = []
+    pos = 0
+    end = len(text.rstrip())
+    while pos < end:
+        m = _lua_token.match(text, pos)
+        if not m:
+            raise ValueError("Unexpected lua at {}: '{}'".format(pos, text[pos:pos + 20]))
+        symbol, string, number, name = m.groups()
+        if symbol: tokens.append(symbol)
+        elif string is not None: tokens.append(("s", string))
+        elif number: tokens.append(("n", float(number)))
+        else: tokens.append(("id", name))
+        pos = m.end()
+
+    idx = 0
+    def parse_value():
+        nonlocal idx
+        tok = tokens[idx]
+        idx += 1
+        if tok == "{":
+            return parse_table()
+        kind, val = tok
+        if kind == "id":
+            return {"nil": None, "true": True, "false": False}[val]
+        return val
+
+    def parse_table():
+        nonlocal idx
+        table = {}
+        array = []
+        while tokens[idx] != "}":
+            tok = tokens[idx]
+            if tok == "[":
+                key = tokens[idx + 1][1]
+                idx += 4  # [ key ] =
+                table[key] = parse_value()
+            elif isinstance(tok, tuple) and tok[0] == "id" and tokens[idx + 1] == "=":
+                idx += 2
+                table[tok[1]] = parse_value()
+            else:
+                array.append(parse_value())
+            if tokens[idx] == ",":
+                idx += 1
+        idx += 1
+        return array if array and not table else table
+
+    if tokens[0] != ("id", "return"):
+        raise ValueError("Expected 'return'")
+    idx = 1
+    return parse_value()
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# every '*.definition.lua' with a '.bin' counterpart: '.definition.lua' of the SCENE and ROOM layouts and
+# '.<variant>.definition.lua' of the VARIANT layout
+def find_definitions(project_dir):
+    assets_dir = os.path.join(project_dir, "gamedata", "assets")
+    search_dir = assets_dir if os.path.isdir(assets_dir) else project_dir
+    for dirpath, dirnames, filenames in os.walk(search_dir):
+        for lua_filename in sorted(fnmatch.filter(filenames, "*.definition.lua")):   # unlike glob, also matches dotfiles
+            bin_filename = os.path.splitext(lua_filename)[0] + ".bin"
+            if bin_filename in filenames:
+                yield os.path.join(dirpath, lua_filename), os.path.join(dirpath, bin_filename)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Compare lua and binary scene definitions")
+    parser.add_argument("project_dir")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args(argv)
+
+    binary_definition = load_binary_definition_module()
+    results = []
+    for lua_filepath, bin_filepath in find_definitions(args.project_dir):
+        with open(lua_filepath, "r") as f:
+            lua_text = f.read()
+        with open(bin_filepath, "rb") as f:
+            bin_data = f.read()
+
+        lua_time = best_time(lambda: parse_lua_definition(lua_text), args.repeat)
+        bin_time = best_time(lambda: binary_definition.read_definition(bin_data), args.repeat)
+        result = {
+            "file": os.path.relpath(lua_filepath, args.project_dir),
+            "lua_bytes": len(lua_text.encode("utf-8")),
+            "bin_bytes": len(bin_data),
+            "lua_parse_seconds": lua_time,
+            "bin_parse_seconds": bin_time,
+        }
+        results.append(result)
+        print("{file}: lua {lua_bytes} B / {lua_parse_seconds:.4f}s, bin {bin_bytes} B / {bin_parse_seconds:.4f}s".format(**result))
+
+    if not results:
+        print("No '.definition.lua' files with a '.definition.bin' found in '{}'".format(args.project_dir))
+        return 1
+
+    total_lua = sum(r["lua_bytes"] for r in results)
+    total_bin = sum(r["bin_bytes"] for r in results)
+    print("Total: lua {} B, bin {} B ({:.1%})".format(total_lua, total_bin, total_bin / total_lua))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
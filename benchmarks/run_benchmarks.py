@@ -0,0 +1,233 @@
+# Times the export pipeline and the clipboard (de)serialization on a synthetic project
+# (scenes x rooms x variants x objects x components per object), and writes throughput and peak memory to json.
+# Needs a blender with lex_suite and the lex2d addon enabled. Runs headless:
+#
+#   blender --background --python benchmarks/run_benchmarks.py -- --objects 200 --output results.json
+#
+# Compare the json files of two commits to spot regressions.
+# The synthetic project replaces the open blend file (it's generated in a new empty one), and the benchmarks write
+# and deserialize into it. So it refuses to run over a saved project or unsaved changes, start it from a plain blender.
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import importlib
+import contextlib
+import subprocess
+import tracemalloc
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic_project
+
+def get_addon(name):
+    lex2d = importlib.import_module(name)
+    if not hasattr(bpy.types.Scene, "smithy2d"):
+        raise RuntimeError("The '{}' addon is not registered (it needs lex_suite to be enabled)".format(name))
+    for submodule in ["utils", "exporter", "component_usage", "export_preflight", "state_format"]:
+        importlib.import_module("{}.{}".format(name, submodule))
+    return lex2d
+
+# generating the project discards the open blend file, and it's written into project_dir (None: a new temp dir)
+def check_safe_to_run(project_dir):
+    blend_filepath = os.path.abspath(bpy.data.filepath) if bpy.data.filepath else ""
+    if blend_filepath and not blend_filepath.startswith(os.path.abspath(tempfile.gettempdir()) + os.sep):
+        raise RuntimeError("'{}' is open. Run the benchmarks without a blend file, they replace it".format(blend_filepath))
+    if bpy.data.is_dirty and not bpy.app.background:
+        raise RuntimeError("The open blend file has unsaved changes. Run the benchmarks in a new blender, they replace it")
+    if project_dir and os.path.isdir(project_dir) and os.listdir(project_dir):
+        raise RuntimeError("'{}' isn't empty. The benchmarks generate a project there, use a new directory".format(project_dir))
+
+def git_commit(addon_dir):
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=addon_dir, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+# best/mean of `repeat` timed runs, then one extra run under tracemalloc for the peak memory
+def measure(func, item_count, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+
+    if setup: setup()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {
+        "best_s": best,
+        "mean_s": sum(times) / len(times),
+        "items": item_count,
+        "items_per_s": item_count / best if best > 0 else None,
+        "peak_memory_bytes": peak_memory,
+    }
+
+def run(lex2d, args):
+    exporter = lex2d.exporter
+    component_usage = lex2d.component_usage
+    bpy_scene = bpy.context.scene
+    scenes = list(bpy_scene.smithy2d.scenes)
+    obj_count = sum(len(v.object_states) for s in scenes for r in s.rooms for v in r.variants)
+
+    def clear_export_caches():
+        exporter._obj_state_cache.clear()
+        exporter._export_manifests.clear()
+
+    def export():
+        exporter.export_scene_definitions(scenes)
+
+    def export_parallel():
+        exporter.export_scene_definitions(scenes, args.workers)
+
+    def usage_walk():
+        preflight = exporter.ExportPreflight()
+        exporter.get_valid_global_component_assetpaths(bpy_scene, preflight)
+        for scene in scenes:
+            exporter.get_valid_component_assetpaths_for_scene(scene, preflight)
+
+    serialized_scenes = [lex2d.utils.serialize_scene(scene) for scene in scenes]
+    def serialize():
+        for scene in bpy_scene.smithy2d.scenes:
+            lex2d.utils.serialize_scene(scene)
+
+    # same as _on_blend_load_post: all scenes streamed into one file
+    state_filepath = os.path.join(bpy.path.abspath("//"), ".lexeditor", "benchmark_state.txt")
+    os.makedirs(os.path.dirname(state_filepath), exist_ok=True)
+    def serialize_to_file():
+        def iter_state_chunks():
+            for scene in bpy_scene.smithy2d.scenes:
+                yield from lex2d.utils.iter_scene_state_chunks(scene)
+                yield "~\n"
+        lex2d.utils.write_file_atomic(state_filepath, iter_state_chunks())
+
+    def deserialize():
+        for serialized in serialized_scenes:
+            lex2d.utils.deserialize_state(serialized, scene=None, room=None, variant=None, assetpath_to_guid_map={})
+
+    # the paste room/scene operators: object states are only created once a variant is needed
+    def deserialize_lazy():
+        for serialized in serialized_scenes:
+            lex2d.utils.deserialize_state(serialized, scene=None, room=None, variant=None, assetpath_to_guid_map={}, lazy=True)
+
+    def parse():
+        for serialized in serialized_scenes:
+            lex2d.state_format.parse_state(serialized.split("\n"))
+
+    # renaming a room back and forth in a registry of all of the project's assetpaths (the guid map)
+    registry = lex2d.asset_registry.AssetRegistry()
+    for scene in scenes:
+        registry.set(lex2d.utils.scene_dir_assetpath(scene.name), scene.guid)
+        for room in scene.rooms:
+            registry.set(lex2d.utils.room_dir_assetpath(scene.name, room.name), room.guid)
+            for variant in room.variants:
+                registry.set(lex2d.utils.variant_script_assetpath(scene.name, room.name, variant.name), variant.guid)
+    renamed_room = scenes[0].rooms[0] if scenes and scenes[0].rooms else None
+    def registry_rename_room():
+        if renamed_room:
+            room_assetpath = lex2d.utils.room_dir_assetpath(scenes[0].name, renamed_room.name)
+            registry.move_subtree(room_assetpath, room_assetpath + "_renamed")
+            registry.move_subtree(room_assetpath + "_renamed", room_assetpath)
+
+    results = {}
+    results["export_cold"] = measure(export, obj_count, args.repeat, setup=clear_export_caches)
+    results["export_warm"] = measure(export, obj_count, args.repeat)
+    if args.workers > 1:
+        results["export_parallel_cold"] = measure(export_parallel, obj_count, args.repeat, setup=clear_export_caches)
+    results["usage_walk_rebuild"] = measure(usage_walk, obj_count, args.repeat, setup=component_usage.invalidate)
+    results["usage_walk_indexed"] = measure(usage_walk, obj_count, args.repeat)
+    component_system = lex2d.ecs.component_system
+    results["component_refresh_rebuild"] = measure(component_system.refresh_changed_components, obj_count, args.repeat,
+        setup=component_system.invalidate_instance_index)
+    results["component_refresh_indexed"] = measure(component_system.refresh_changed_components, obj_count, args.repeat)
+    results["serialize"] = measure(serialize, obj_count, args.repeat)
+    results["serialize_to_file"] = measure(serialize_to_file, obj_count, args.repeat)
+    results["deserialize_lazy"] = measure(deserialize_lazy, obj_count, args.repeat)
+    results["deserialize"] = measure(deserialize, obj_count, args.repeat)
+    results["parse"] = measure(parse, obj_count, args.repeat)
+    results["registry_rename_room"] = measure(registry_rename_room, len(registry), args.repeat)
+    check_round_trip(lex2d, bpy_scene, serialized_scenes)
+    return results
+
+# deserializing a scene's text (done by the deserialize benchmark) and serializing it again must give the same text
+def check_round_trip(lex2d, bpy_scene, serialized_scenes):
+    for serialized in serialized_scenes:
+        nodes = lex2d.state_format.parse_state(serialized.split("\n"))
+        scene = bpy_scene.smithy2d.scenes[nodes[0]["name"]]
+        reserialized = lex2d.utils.serialize_scene(scene)
+        if reserialized != serialized:
+            for line_number, (line, other_line) in enumerate(zip(serialized.split("\n"), reserialized.split("\n")), 1):
+                if line != other_line:
+                    break
+            raise AssertionError("Scene '{}' changed in a serialize/deserialize round trip. line {}: {!r} != {!r}".format(
+                scene.name, line_number, line, other_line))
+        obj_count = sum(len(v["objects"]) for r in nodes[0]["rooms"] for v in r["variants"])
+        if obj_count != sum(len(v.object_states) for r in scene.rooms for v in r.variants):
+            raise AssertionError("Scene '{}' parsed to a different number of object states".format(scene.name))
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="run_benchmarks.py")
+    parser.add_argument("--addon", default="lex2d", help="module name of the addon")
+    parser.add_argument("--scenes", type=int, default=2)
+    parser.add_argument("--rooms", type=int, default=4)
+    parser.add_argument("--variants", type=int, default=2)
+    parser.add_argument("--objects", type=int, default=50, help="object states per variant")
+    parser.add_argument("--components", type=int, default=3, help="components per object state")
+    parser.add_argument("--global-ratio", type=float, default=.5, help="share of the components that are global")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=0, help="also time a parallel export with this many workers")
+    parser.add_argument("--project-dir", help="new or empty directory to generate the project in (default: a temp dir, removed afterwards)")
+    parser.add_argument("--output", help="write the results to this json file")
+    args = parser.parse_args(argv)
+
+    lex2d = get_addon(args.addon)
+    check_safe_to_run(args.project_dir)
+    project_dir = args.project_dir or tempfile.mkdtemp(prefix="lex2d_bench_")
+    os.makedirs(project_dir, exist_ok=True)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            synthetic_project.generate_project(lex2d, project_dir, scenes=args.scenes, rooms=args.rooms, variants=args.variants,
+                objects=args.objects, components=args.components, global_ratio=args.global_ratio, seed=args.seed)
+        results = run(lex2d, args)
+    finally:
+        if not args.project_dir:
+            shutil.rmtree(project_dir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(os.path.dirname(lex2d.__file__)),
+        "blender": bpy.app.version_string,
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ["output", "project_dir"]},
+        "results": results,
+    }
+
+    print("{:<24}{:>12}{:>14}{:>16}".format("benchmark", "best (ms)", "objects/s", "peak mem (KB)"))
+    for name, r in results.items():
+        print("{:<24}{:>12.2f}{:>14.0f}{:>16.1f}".format(name, r["best_s"] * 1000, r["items_per_s"] or 0, r["peak_memory_bytes"] / 1024))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    try:
+        code = main(argv)
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        code = 1
+    sys.exit(code)
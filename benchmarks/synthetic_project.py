@@ -0,0 +1,82 @@
+# Builds a synthetic Lex2D project of a configurable size in the current blender session (see run_benchmarks.py).
+# The generated data is deterministic for a given seed, so results are comparable between commits.
+import os
+import math
+import random
+import bpy
+from mathutils import Matrix
+
+COMPONENT_SCRIPT = """--$speed(scalar, 1, 0, 10)
+--$label(string, "synthetic")
+--$offset(vec2, [0, 0])
+--$enabled(bool, True)
+
+return {}
+"""
+
+def flatten(mat):
+    return [mat[j][i] for i in range(4) for j in range(4)]
+
+def component_names(count):
+    return ["Comp{}".format(i) for i in range(count)]
+
+def write_component_script(lex2d, assetpath):
+    filepath = lex2d.utils.asset_abspath(assetpath)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "w") as f:
+        f.write(COMPONENT_SCRIPT)
+
+def serialized_component_data(rng, obj_idx):
+    return "\n".join([
+        "speed,float,{}".format(round(rng.uniform(0, 10), 3)),
+        "label,string,obj{}".format(obj_idx),
+        "offset,vec2,{},{}".format(round(rng.uniform(-1, 1), 3), round(rng.uniform(-1, 1), 3)),
+        "enabled,bool,{}".format(rng.random() > .5)])
+
+def fill_object_state(rng, obj_state, obj_idx, names, global_count):
+    obj_state.name = "obj{}".format(obj_idx)
+    mat = Matrix.Translation((rng.uniform(-10, 10), rng.uniform(-10, 10), 0)) \
+        @ Matrix.Rotation(rng.uniform(-math.pi, math.pi), 4, 'Z') \
+        @ Matrix.Diagonal((rng.uniform(.5, 2), rng.uniform(.5, 2), 1, 1))
+    obj_state.matrix_local = flatten(mat)
+    obj_state.bounds.box_min = (-.5, -.5, 0)
+    obj_state.bounds.box_max = (.5, .5, 0)
+    obj_state.topleft = (-.5, -.5, 0)
+    obj_state.obj_type = "MESH"
+    obj_state.parent = "obj{}".format(obj_idx - 1) if obj_idx % 5 == 4 else ""
+    for c_idx, name in enumerate(names):
+        sc = obj_state.components_serialized.add()
+        sc.name = name
+        sc.is_global = c_idx < global_count
+        sc.data = serialized_component_data(rng, obj_idx)
+
+# start from an empty blend file saved in project_dir, so "//" resolves to it
+def generate_project(lex2d, project_dir, scenes=2, rooms=4, variants=2, objects=50, components=3, global_ratio=.5, seed=0):
+    rng = random.Random(seed)
+    bpy.ops.wm.read_homefile(use_empty=True)
+    bpy.ops.wm.save_as_mainfile(filepath=os.path.join(project_dir, "synthetic.blend"))
+
+    names = component_names(components)
+    global_count = int(round(components * global_ratio))
+    for name in names[:global_count]:
+        write_component_script(lex2d, lex2d.utils.global_component_assetpath(name))
+
+    settings = bpy.context.scene.smithy2d
+    settings.scenes.clear()
+    for s_idx in range(scenes):
+        scene = settings.scenes.add()
+        scene.name = "Scene{}".format(s_idx)
+        for r_idx in range(rooms):
+            room = scene.rooms.add()
+            room.name = "Room{}".format(r_idx)
+            room.location = (r_idx / max(rooms, 1), 0)
+            room.size = (1 / max(rooms, 1), 1)
+            for name in names[global_count:]:
+                write_component_script(lex2d, lex2d.utils.component_assetpath(name, scene.name, room.name))
+            for v_idx in range(variants):
+                variant = room.variants.add()
+                variant.name = "Variant{}".format(v_idx)
+                lex2d.utils.create_variant_script(scene.name, room.name, variant.name)
+                for obj_idx in range(objects):
+                    fill_object_state(rng, variant.object_states.add(), obj_idx, names, global_count)
+    return settings
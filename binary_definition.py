@@ -0,0 +1,217 @@
+import struct
+
+# Compact binary scene definition (.definition.bin)
+# ---------------------------
+# Written next to .definition.lua. Holds the same data, but the game can read it without parsing lua.
+# All values are little endian. Names, paths and component ids are stored once in a string table.
+#
+#   header      <4sHHIIIII  magic, version, reserved, component section offset, defaults section offset,
+#                           string table offset, scene name, room count
+#   room        <IffffI     name, map location x, y, map size w, h, variant count
+#   variant     <III        name, script path, object count
+#     objects   <IiI        name, parent (-1 if none), offset of the object's component block
+#     transforms <16f       per object: position(3) pivot(3) rotation_quat(4) size(3) scale(3)
+#   component section: one block per object (offsets in the object records are relative to the section)
+#     block     <H          component count
+#     component <IH         component id, input count
+#       input   <IB         name, value type, followed by the value:
+#                               nil: nothing, number: <d, string: <I (string index), vec: <B count + <d per value
+#   defaults section: the script defaults of the components used in the file, for definitions exported with
+#   override_only (the objects then only hold the inputs that differ from them). empty otherwise
+#     <H          component count, then per component the same component record + inputs as above
+#   string table  <I count, then per string: <I byte length + utf-8 bytes
+#
+# Values follow the same conversion as the lua exporter (ints, bools, enums end up as strings).
+
+MAGIC = b"L2DB"
+VERSION = 2
+
+TYPE_NIL = 0
+TYPE_NUMBER = 1
+TYPE_STRING = 2
+TYPE_VEC = 3
+
+TRANSFORM_INPUTS = [("position", 3), ("pivot", 3), ("rotation_quat", 4), ("size", 3), ("scale", 3)]
+TRANSFORM_FLOAT_COUNT = sum(n for _, n in TRANSFORM_INPUTS)
+
+_header = struct.Struct("<4sHHIIIII")
+_room = struct.Struct("<IffffI")
+_variant = struct.Struct("<III")
+_object = struct.Struct("<IiI")
+_transform = struct.Struct("<{}f".format(TRANSFORM_FLOAT_COUNT))
+_component_count = struct.Struct("<H")
+_component = struct.Struct("<IH")
+_input = struct.Struct("<IB")
+_u8 = struct.Struct("<B")
+_u32 = struct.Struct("<I")
+_f64 = struct.Struct("<d")
+
+def _value_type(datatype, val):
+    if datatype == "string":
+        return TYPE_STRING, val
+    elif datatype in ["vec2", "vec3", "vec4"]:
+        return TYPE_VEC, [float(v) for v in val[0:int(datatype[3])]]
+    elif val in ["", None]:
+        return TYPE_NIL, None
+    elif datatype == "float":
+        return TYPE_NUMBER, float(val)
+    return TYPE_STRING, str(val)
+
+class _StringTable:
+    def __init__(self):
+        self.indices = {}
+        self.strings = []
+
+    def index(self, s):
+        idx = self.indices.get(s)
+        if idx is None:
+            idx = len(self.strings)
+            self.indices[s] = idx
+            self.strings.append(s)
+        return idx
+
+    def pack(self):
+        out = bytearray(_u32.pack(len(self.strings)))
+        for s in self.strings:
+            data = s.encode("utf-8")
+            out += _u32.pack(len(data))
+            out += data
+        return out
+
+def _pack_components(out, components, strings, component_idpath):
+    out += _component_count.pack(len(components))
+    for c_assetpath, inputs in components:
+        out += _component.pack(strings.index(component_idpath(c_assetpath)), len(inputs))
+        for input_name, input_datatype, input_value in inputs:
+            value_type, value = _value_type(input_datatype, input_value)
+            out += _input.pack(strings.index(input_name), value_type)
+            if value_type == TYPE_NUMBER:
+                out += _f64.pack(value)
+            elif value_type == TYPE_STRING:
+                out += _u32.pack(strings.index(value))
+            elif value_type == TYPE_VEC:
+                out += _u8.pack(len(value))
+                out += struct.pack("<{}d".format(len(value)), *value)
+
+# component_idpath converts a component assetpath to the id the game uses (see utils.component_idpath)
+# component_defaults {assetpath: [(name, datatype, default)]} is written for the components the file uses
+def scene_snapshot_to_bytes(scene_snapshot, component_idpath, component_defaults=None):
+    strings = _StringTable()
+    out = bytearray(_header.size)
+    components_out = bytearray()
+    used_assetpaths = {}    # ordered set
+    for room_snapshot in scene_snapshot["rooms"]:
+        location, size = room_snapshot["location"], room_snapshot["size"]
+        out += _room.pack(strings.index(room_snapshot["name"]), location[0], location[1], size[0], size[1], len(room_snapshot["variants"]))
+        for variant_snapshot in room_snapshot["variants"]:
+            objs = variant_snapshot["objects"]
+            out += _variant.pack(strings.index(variant_snapshot["name"]), strings.index(variant_snapshot["script"]), len(objs))
+
+            for obj in objs:
+                parent_idx = strings.index(obj["parent"]) if obj["parent"] else -1
+                out += _object.pack(strings.index(obj["name"]), parent_idx, len(components_out))
+                _pack_components(components_out, obj["components"], strings, component_idpath)
+                used_assetpaths.update((c_assetpath, None) for c_assetpath, _ in obj["components"])
+
+            for obj in objs:
+                transform = dict((i_n, i_v) for i_n, i_t, i_v in obj["transform"])
+                out += _transform.pack(*(float(v) for i_n, n in TRANSFORM_INPUTS for v in transform[i_n][0:n]))
+
+    components_offset = len(out)
+    out += components_out
+    defaults_offset = len(out)
+    defaults = [(c_assetpath, component_defaults[c_assetpath]) for c_assetpath in used_assetpaths
+        if component_defaults and c_assetpath in component_defaults]
+    _pack_components(out, defaults, strings, component_idpath)
+    string_table_offset = len(out)
+    scene_name_idx = strings.index(scene_snapshot["name"])
+    out += strings.pack()
+    _header.pack_into(out, 0, MAGIC, VERSION, 0, components_offset, defaults_offset, string_table_offset, scene_name_idx,
+        len(scene_snapshot["rooms"]))
+    return bytes(out)
+
+# Reference reader
+# ---------------------------
+# returns the same tables as the .definition.lua, plus each room's map rectangle:
+#   {scene: {room: {"location": (x, y), "size": (w, h), "variants": {variant: {"script": ..., "objects": [...]}}}}}
+# the inputs of an override_only definition are completed with the defaults section, so every component has all of them
+def read_definition(data):
+    magic, version, _, components_offset, defaults_offset, string_table_offset, scene_name_idx, room_count = _header.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a Lex2D binary definition")
+    if version != VERSION:
+        raise ValueError("Unsupported binary definition version {}".format(version))
+
+    # string table
+    strings = []
+    pos = string_table_offset
+    string_count, = _u32.unpack_from(data, pos)
+    pos += _u32.size
+    for _ in range(string_count):
+        length, = _u32.unpack_from(data, pos)
+        pos += _u32.size
+        strings.append(bytes(data[pos:pos + length]).decode("utf-8"))
+        pos += length
+
+    def read_components(pos):
+        components = {}
+        component_count, = _component_count.unpack_from(data, pos)
+        pos += _component_count.size
+        for _ in range(component_count):
+            idpath_idx, input_count = _component.unpack_from(data, pos)
+            pos += _component.size
+            inputs = {}
+            for _ in range(input_count):
+                name_idx, value_type = _input.unpack_from(data, pos)
+                pos += _input.size
+                value = None
+                if value_type == TYPE_NUMBER:
+                    value, = _f64.unpack_from(data, pos)
+                    pos += _f64.size
+                elif value_type == TYPE_STRING:
+                    value = strings[_u32.unpack_from(data, pos)[0]]
+                    pos += _u32.size
+                elif value_type == TYPE_VEC:
+                    count, = _u8.unpack_from(data, pos)
+                    pos += _u8.size
+                    value = list(struct.unpack_from("<{}d".format(count), data, pos))
+                    pos += _f64.size * count
+                inputs[strings[name_idx]] = value
+            components[strings[idpath_idx]] = inputs
+        return components
+
+    defaults = read_components(defaults_offset)
+    rooms = {}
+    pos = _header.size
+    for _ in range(room_count):
+        name_idx, x, y, w, h, variant_count = _room.unpack_from(data, pos)
+        pos += _room.size
+        variants = {}
+        for _ in range(variant_count):
+            variant_name_idx, script_idx, object_count = _variant.unpack_from(data, pos)
+            pos += _variant.size
+            transforms_pos = pos + _object.size * object_count
+            objects = []
+            for i in range(object_count):
+                obj_name_idx, parent_idx, component_block_offset = _object.unpack_from(data, pos + i * _object.size)
+                transform_values = _transform.unpack_from(data, transforms_pos + i * _transform.size)
+                transform = {}
+                offset = 0
+                for i_n, n in TRANSFORM_INPUTS:
+                    transform[i_n] = list(transform_values[offset:offset + n])
+                    offset += n
+                obj = {"name": strings[obj_name_idx], "components": {"core/Transform": transform}}
+                if parent_idx >= 0:
+                    obj["parent"] = strings[parent_idx]
+                for idpath, inputs in read_components(components_offset + component_block_offset).items():
+                    obj["components"][idpath] = dict(defaults.get(idpath, {}), **inputs)
+                objects.append(obj)
+            pos = transforms_pos + _transform.size * object_count
+            variants[strings[variant_name_idx]] = {"script": strings[script_idx], "objects": objects}
+        rooms[strings[name_idx]] = {"location": (x, y), "size": (w, h), "variants": variants}
+
+    return {strings[scene_name_idx]: rooms}
+
+def read_definition_file(filepath):
+    with open(filepath, "rb") as f:
+        return read_definition(f.read())
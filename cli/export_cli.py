@@ -0,0 +1,95 @@
+# Runs the full export (sync with the asset folder, component includes, scene definitions) without the UI.
+# Needs a blender with lex_suite and the lex2d addon enabled:
+#
+#   blender --background project.blend --python-exit-code 1 --python cli/export_cli.py -- [--scenes Town,Forest]
+#
+# Exit codes: 0 exported, 1 the export failed, 2 bad arguments or the project can't be exported
+import sys
+import time
+import argparse
+import importlib
+import traceback
+import bpy
+
+EXIT_OK = 0
+EXIT_EXPORT_FAILED = 1
+EXIT_USAGE = 2
+
+class UsageError(Exception):
+    pass
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="export_cli.py", description="Export Lex2D scene definitions")
+    parser.add_argument("--scenes", action="append", default=[],
+        help="comma separated scene names to export (can be repeated). default: all scenes")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: the project setting)")
+    parser.add_argument("--binary", action="store_true", default=None, help="also write binary definitions")
+    parser.add_argument("--override-only", action="store_true", default=None,
+        help="only write inputs that differ from the script defaults")
+    parser.add_argument("--layout", choices=["SCENE", "ROOM", "VARIANT"], default=None,
+        help="definition files per scene, room or variant (default: the project setting)")
+    parser.add_argument("--no-sync", action="store_true", help="don't sync with the asset folder first")
+    parser.add_argument("--addon", default="lex2d", help="module name of the addon")
+    return parser.parse_args(argv)
+
+def get_exporter(addon_name):
+    if not hasattr(bpy.types.Scene, "smithy2d"):
+        raise UsageError("The '{}' addon is not registered (it needs lex_suite to be enabled)".format(addon_name))
+    return importlib.import_module("{}.exporter".format(addon_name))
+
+def select_scenes(settings, scene_args):
+    names = [name.strip() for arg in scene_args for name in arg.split(",") if name.strip()]
+    if not names:
+        return list(settings.scenes)
+    missing = [name for name in names if name not in settings.scenes]
+    if missing:
+        raise UsageError("Unknown scene(s): {}".format(", ".join(missing)))
+    return [settings.scenes[name] for name in names]
+
+def run(args):
+    timings = []
+    def timed(label, func, *func_args, **kwargs):
+        start = time.perf_counter()
+        result = func(*func_args, **kwargs)
+        timings.append((label, time.perf_counter() - start))
+        return result
+
+    exporter = get_exporter(args.addon)
+    if not bpy.data.filepath:
+        raise UsageError("Open a saved .blend file (blender --background project.blend ...)")
+
+    bpy_scene = bpy.context.scene
+    settings = bpy_scene.smithy2d
+    if not args.no_sync:
+        timed("sync", bpy.ops.smithy2d.sync_with_asset_folder)
+    scenes = select_scenes(settings, args.scenes)
+    worker_count = settings.export_worker_count if args.workers is None else args.workers
+    binary = settings.export_binary_definition if args.binary is None else args.binary
+    override_only = settings.export_override_only if args.override_only is None else args.override_only
+    layout = settings.export_layout if args.layout is None else args.layout
+
+    profile_filepath = exporter.export_profile.export_profile_filepath()
+    timed("save active variant", exporter.save_active_variant, bpy_scene)
+    timed("export", exporter.export_all, bpy_scene, scenes, worker_count, binary=binary, override_only=override_only, layout=layout)
+
+    print("Exported {} scene(s): {}".format(len(scenes), ", ".join(scene.name for scene in scenes)))
+    for label, seconds in timings:
+        print("  {:<20}{:>10.1f} ms".format(label, seconds * 1000))
+    print("  {:<20}{:>10.1f} ms".format("total", sum(seconds for _, seconds in timings) * 1000))
+    print("Profile: {}".format(profile_filepath))
+
+def main(argv):
+    args = parse_args(argv)
+    try:
+        run(args)
+    except UsageError as err:
+        print("Smithy2D - Error: {}".format(err))
+        return EXIT_USAGE
+    except Exception:
+        traceback.print_exc()
+        print("Smithy2D - Error: export failed")
+        return EXIT_EXPORT_FAILED
+    return EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []))
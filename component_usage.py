@@ -0,0 +1,106 @@
+import bpy
+from bpy.app.handlers import persistent
+from . import state_format
+from .utils import global_component_assetpath, component_assetpath
+
+# Component Usage Index
+# ---------------------------
+# which object states use which component scripts, so the exporter and the operators can ask
+# "who uses this component" without walking every scene > room > variant > object state.
+#   _usages:         {component assetpath: {(scene name, room name, variant name, object name)}}
+#   _variant_usages: {(scene name, room name, variant name): {(component assetpath, object name)}}
+# updated per variant when its object states are saved or deserialized. renames and other structural
+# changes just invalidate it, and the next query rebuilds it with one full walk.
+_usages = {}
+_variant_usages = {}
+_indexed_scene_name = None    # the bpy scene the index was built from (None if invalid)
+
+def invalidate():
+    global _indexed_scene_name
+    _indexed_scene_name = None
+
+def is_valid():
+    return _indexed_scene_name is not None
+
+def _set_variant_usages(variant_key, new_usages):
+    old_usages = _variant_usages.get(variant_key, set())
+    for c_assetpath, obj_name in old_usages - new_usages:
+        users = _usages.get(c_assetpath)
+        if users is not None:
+            users.discard((*variant_key, obj_name))
+            if not users:
+                del _usages[c_assetpath]
+    for c_assetpath, obj_name in new_usages - old_usages:
+        _usages.setdefault(c_assetpath, set()).add((*variant_key, obj_name))
+
+    if new_usages:
+        _variant_usages[variant_key] = new_usages
+    else:
+        _variant_usages.pop(variant_key, None)
+
+def _collect_variant_usages(scene, room, variant):
+    usages = set()
+    # a lazily pasted variant: read the component lines instead of creating its object states
+    if variant.pending_state:
+        for obj_name, c_name, is_global in state_format.iter_component_usages(variant.pending_state.split("\n")):
+            if c_name:
+                c_assetpath = global_component_assetpath(c_name) if is_global else component_assetpath(c_name, scene.name, room.name)
+                usages.add((c_assetpath, obj_name))
+        return usages
+
+    for obj_state in variant.object_states:
+        for sc in obj_state.components_serialized:
+            if sc.name:
+                usages.add((sc.get_assetpath(scene, room), obj_state.name))
+    return usages
+
+# call after the object states of a variant changed
+def update_variant(scene, room, variant):
+    if is_valid():
+        _set_variant_usages((scene.name, room.name, variant.name), _collect_variant_usages(scene, room, variant))
+
+# drop the usages of a removed scene, room or variant
+def forget(scene_name, room_name=None, variant_name=None):
+    if not is_valid():
+        return
+    for variant_key in list(_variant_usages):
+        if variant_key[0] == scene_name and room_name in [None, variant_key[1]] and variant_name in [None, variant_key[2]]:
+            _set_variant_usages(variant_key, set())
+
+def rebuild(bpy_scene):
+    global _indexed_scene_name
+    _usages.clear()
+    _variant_usages.clear()
+    for scene in bpy_scene.smithy2d.scenes:
+        for room in scene.rooms:
+            for variant in room.variants:
+                _set_variant_usages((scene.name, room.name, variant.name), _collect_variant_usages(scene, room, variant))
+    _indexed_scene_name = bpy_scene.name
+
+def _ensure_index(bpy_scene):
+    if _indexed_scene_name != bpy_scene.name:
+        rebuild(bpy_scene)
+
+# {(scene name, room name, variant name, object name)} using the component
+def get_usages(bpy_scene, c_assetpath):
+    _ensure_index(bpy_scene)
+    return set(_usages.get(c_assetpath, ()))
+
+# all used component assetpaths at or within the given directory (eg. "scripts/core/")
+def get_used_component_assetpaths(bpy_scene, dir_assetpath=""):
+    _ensure_index(bpy_scene)
+    return [c_assetpath for c_assetpath in _usages if c_assetpath.startswith(dir_assetpath)]
+
+@persistent
+def _invalidate_handler(*args):
+    invalidate()
+
+def register():
+    for handlers in [bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post]:
+        handlers.append(_invalidate_handler)
+
+def unregister():
+    for handlers in [bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post]:
+        if _invalidate_handler in handlers:
+            handlers.remove(_invalidate_handler)
+    invalidate()
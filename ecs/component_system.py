@@ -1,6 +1,8 @@
 import bpy
 from math import inf
 from ..utils import * 
+from ..asset_registry import AssetRegistry
+from . import script_watcher
 import sys
 from bpy.app.handlers import persistent
 
@@ -114,6 +116,7 @@ class Component:
         self.inputs = {}
         self.err_log = ""
         self.inputs_changed = False
+        self.stat = None    # (size, mtime_ns) of the script when an export preflight last checked it
 
     def file_exists(self):
         return self.filewatcher.file_exists
@@ -121,24 +124,23 @@ class Component:
     def check_file_change(self):
         return self.filewatcher.look()
 
-_components = {}
+_components = AssetRegistry()
 def get_or_create_component(assetpath):
-    return _components.setdefault(assetpath, Component(assetpath))
+    component = _components.get(assetpath)
+    if component is None:
+        component = Component(assetpath)
+        _components.set(assetpath, component)
+    return component
 
-# rename any component at or within the given assetpath
+# rename any component at or within the given assetpath (a renamed scene/room directory)
 def rename_asset(old_assetpath, new_assetpath):
-    assets = [ap for ap in _components if old_assetpath in ap]
-    for c_assetpath in assets:
-        new_c_assetpath = c_assetpath.replace(old_assetpath, new_assetpath, 1)
-        if c_assetpath != new_c_assetpath:
-            _components[new_c_assetpath] = _components[c_assetpath]
-            del _components[c_assetpath]
+    for _, new_c_assetpath, component in _components.move_subtree(old_assetpath, new_assetpath):
+        component.assetpath = new_c_assetpath
+        component.filewatcher = FileWatcher(asset_abspath(new_c_assetpath))
 
 # remove all asset at or within the given assetpath
 def remove_asset(assetpath):
-    remove_assets = [ap for ap in _components if old_assetpath in ap]
-    for c_assetpath in remove_assets:
-        del _components[c_assetpath]
+    _components.remove_subtree(assetpath)
 
 def get_component(assetpath):
     return _components.get(assetpath)
@@ -160,6 +162,13 @@ def recompile_component_if_changed(component):
         component.inputs_changed = True
     return has_changed
 
+# only asks the file watcher when the stat from an export preflight differs from the last one seen
+def recompile_component_if_stat_changed(component, stat):
+    if stat == component.stat:
+        return False
+    component.stat = stat
+    return recompile_component_if_changed(component)
+
 # -------------------------------------------------------
 
 # sync the current ui inputs with the base inputs parsed from the script
@@ -183,6 +192,7 @@ def set_bpy_inputs(bpy_component, parsed_inputs):
 
 # check for script changes and sync the current input values with the input slots in the script 
 def refresh_inputs(scene, room, bpy_component_instance):
+    index_component(scene, room, bpy_component_instance)
     c_assetpath = bpy_component_instance.get_assetpath(scene, room)
     if c_assetpath:
         component = get_or_create_component(c_assetpath)
@@ -204,48 +214,170 @@ def input_updated(bpy_component_instance, bpy_input):
     from . import on_component_updated
     on_component_updated(bpy.context.scene.smithy2d.get_active_scene(), bpy_component_instance.id_data, bpy_component_instance)
 
-@persistent
-def check_file_changes():
+# Component Instance Index
+# ---------------------------
+# which component instances (obj.smithy2d.components) use which script, for the active scene and room:
+#   _instances:        {component assetpath: {(object name, component name)}}
+#   _object_instances: {object name: {component name: component assetpath}}
+# instances are kept by name (component names are unique per object), RNA references to collection items
+# don't survive the collection changing. updated by add/remove_component, the name and is_global setters
+# and variant loads (through refresh_inputs). changes made around those (renamed, duplicated or deleted
+# objects, undo) are caught when an entry doesn't resolve anymore or the object count differs, and the
+# index is rebuilt with one walk over the objects.
+_instances = {}
+_object_instances = {}
+_indexed_key = None     # (scene name, room name, object count) the index was built for (None if invalid)
+
+def invalidate_instance_index():
+    global _indexed_key
+    _indexed_key = None
+
+def _instance_index_key(scene, room):
+    return (scene.name if scene else None, room.name if room else None, len(bpy.data.objects))
+
+def unindex_component(obj_name, c_name):
+    c_assetpath = _object_instances.get(obj_name, {}).pop(c_name, None)
+    if c_assetpath is not None:
+        users = _instances.get(c_assetpath)
+        users.discard((obj_name, c_name))
+        if not users:
+            del _instances[c_assetpath]
+
+def unindex_object(obj_name):
+    for c_name in list(_object_instances.get(obj_name, ())):
+        unindex_component(obj_name, c_name)
+    _object_instances.pop(obj_name, None)
+
+def index_component(scene, room, bpy_component_instance):
+    if _indexed_key is None or not bpy_component_instance.name:
+        return
+    obj_name = bpy_component_instance.id_data.name
+    unindex_component(obj_name, bpy_component_instance.name)
+    c_assetpath = bpy_component_instance.get_assetpath(scene, room)
+    if c_assetpath:
+        _object_instances.setdefault(obj_name, {})[bpy_component_instance.name] = c_assetpath
+        _instances.setdefault(c_assetpath, set()).add((obj_name, bpy_component_instance.name))
+
+def rebuild_instance_index(scene, room):
+    global _indexed_key
+    _instances.clear()
+    _object_instances.clear()
+    _indexed_key = _instance_index_key(scene, room)
+    for obj in bpy.data.objects:
+        for c in obj.smithy2d.components:
+            index_component(scene, room, c)
+
+# the live instances using the script, or None if the index is out of date
+def get_component_instances(scene, room, c_assetpath):
+    if _indexed_key != _instance_index_key(scene, room):
+        return None
+    instances = []
+    for obj_name, c_name in _instances.get(c_assetpath, ()):
+        obj = bpy.data.objects.get(obj_name)
+        c = obj.smithy2d.get_component(c_name) if obj else None
+        if c is None or c.get_assetpath(scene, room) != c_assetpath:
+            return None
+        instances.append(c)
+    return instances
+
+# assetpaths of the scripts with instances, at the given absolute filepaths (or all of them)
+def get_used_component_assetpaths(scene, room, changed_filepaths=None):
+    if _indexed_key != _instance_index_key(scene, room):
+        rebuild_instance_index(scene, room)
+    if changed_filepaths is None or script_watcher.RESCAN in changed_filepaths:
+        return list(_instances)
+    assets_dir = asset_abspath("")
+    changed_assetpaths = (path[len(assets_dir):] for path in changed_filepaths if path.startswith(assets_dir))
+    return [c_assetpath for c_assetpath in changed_assetpaths if c_assetpath in _instances]
+
+# reparse the used scripts that changed and sync the inputs of the component instances using them.
+# changed_filepaths limits it to the scripts the watcher reported
+def refresh_changed_components(changed_filepaths=None):
     scene = bpy.context.scene.smithy2d.get_active_scene()
     if scene:
-        # collect used scripts
-        used_component_scripts = {} 
         room = scene.get_active_room()
-
-        for obj in bpy.data.objects:
-            for c in obj.smithy2d.components:
-                if c.name != "":
-                    c_assetpath = c.get_assetpath(scene, room)
-                    if c_assetpath:
-                        instances_using_script = used_component_scripts.get(c_assetpath, set())
-                        instances_using_script.add(c)
-                        used_component_scripts[c_assetpath] = instances_using_script
-
-        # reparse any scripts that were modified
-        for c_assetpath, instances in used_component_scripts.items():
+        for c_assetpath in get_used_component_assetpaths(scene, room, changed_filepaths):
             component = get_or_create_component(c_assetpath)
             recompile_component_if_changed(component)
-            
+
             # set inputs for component instances
             if component.inputs_changed:
+                instances = get_component_instances(scene, room, c_assetpath)
+                if instances is None:
+                    rebuild_instance_index(scene, room)
+                    instances = get_component_instances(scene, room, c_assetpath) or []
                 for bpy_component_instance in instances:
                     bpy_component_instance.err_log = component.err_log
                     bpy_component_instance.file_exists = component.filewatcher.file_exists
                     set_bpy_inputs(bpy_component_instance, component.inputs)
                 refresh_screen_area("PROPERTIES")
             component.inputs_changed = False
-    
-    return 1.5   # repeat every x seconds 
 
+# with an inotify watcher on the scripts folder the timer only drains its queue, the used scripts are
+# checked when something in there changed. without one they're polled every POLL_INTERVAL seconds
+WATCH_INTERVAL = 0.2
+POLL_INTERVAL = 1.5
+
+_watcher = None
+_watcher_unavailable_dir = None    # the scripts dir inotify failed for, so it's not retried every tick
+
+def stop_watcher():
+    global _watcher
+    if _watcher:
+        _watcher.stop()
+        _watcher = None
+
+# (re)start the watcher for the current blend file's scripts folder. returns True if a new one started
+def _update_watcher():
+    global _watcher, _watcher_unavailable_dir
+    scripts_dir = asset_abspath("scripts") if bpy.data.filepath else None
+    if _watcher and not _watcher.is_alive():
+        _watcher_unavailable_dir = _watcher.root_dir
+        stop_watcher()
+    elif _watcher and _watcher.root_dir != scripts_dir:
+        stop_watcher()
+    if _watcher is None and scripts_dir and scripts_dir != _watcher_unavailable_dir and os.path.isdir(scripts_dir):
+        _watcher = script_watcher.create_watcher(scripts_dir)
+        if _watcher is None:
+            _watcher_unavailable_dir = scripts_dir
+        return _watcher is not None
+    return False
 
+@persistent
+def check_file_changes():
+    started = _update_watcher()
+    if _watcher is None:
+        refresh_changed_components()
+        return POLL_INTERVAL
+
+    # a new watcher only reports the changes from now on
+    changed_filepaths = _watcher.drain()
+    if started:
+        refresh_changed_components()
+    elif changed_filepaths:
+        refresh_changed_components(changed_filepaths)
+    return WATCH_INTERVAL
+
+
+
+@persistent
+def _invalidate_instance_index_handler(*args):
+    invalidate_instance_index()
 
 def register():
     lexsuite = sys.modules.get('lex_suite')
     globals()['FileWatcher'] = lexsuite.filewatcher.FileWatcher
 
     bpy.app.timers.register(check_file_changes, persistent=True)
+    for handlers in [bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post]:
+        handlers.append(_invalidate_instance_index_handler)
     
 
 def unregister():
     if bpy.app.timers.is_registered(check_file_changes):
         bpy.app.timers.unregister(check_file_changes)
+    stop_watcher()
+    for handlers in [bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post]:
+        if _invalidate_instance_index_handler in handlers:
+            handlers.remove(_invalidate_instance_index_handler)
+    invalidate_instance_index()
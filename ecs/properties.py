@@ -17,6 +17,7 @@ class Smithy2D_ComponentInput(bpy.types.PropertyGroup, GenericValue):
 class Smithy2D_Component(bpy.types.PropertyGroup):
     def set_name_and_update(self, name):
         from . import component_system
+        component_system.unindex_component(self.id_data.name, self.get_name())
         self['name'] = name
         scene = bpy.context.scene.smithy2d.get_active_scene()
         component_system.refresh_inputs(scene, scene.get_active_room(), self)
@@ -0,0 +1,155 @@
+import os
+import sys
+import queue
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+# Script Watcher
+# ---------------------------
+# watches a directory tree (the scripts folder) with linux inotify on a background thread and queues the
+# absolute paths of the files that changed. the main thread only drains the queue (drain()), so nothing
+# has to be stat'ed while no script is edited. new directories are watched as they appear.
+# create_watcher returns None where inotify isn't available (other platforms, no watches left, ...),
+# the caller then keeps polling.
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")    # wd, mask, cookie, name length
+RESCAN = None   # queued when events were lost (queue overflow): everything has to be checked
+
+class InotifyWatcher:
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}      # {watch descriptor: directory}
+        self.changes = queue.Queue()
+        self.stop_read_fd, self.stop_write_fd = os.pipe()
+        try:
+            self.watch_tree(root_dir)
+        except OSError:
+            self.close_fds()
+            raise
+        self.thread = threading.Thread(target=self.run, name="Smithy2D script watcher", daemon=True)
+        self.thread.start()
+
+    def watch_dir(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed for '{}'".format(directory))
+        self.dirs[wd] = directory
+
+    # returns the files found inside (they may have been written before the watch existed)
+    def watch_tree(self, root_dir):
+        files = []
+        pending = [root_dir]
+        while pending:
+            directory = pending.pop()
+            self.watch_dir(directory)
+            try:
+                entries = list(os.scandir(directory))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                else:
+                    files.append(entry.path)
+        return files
+
+    def read_events(self):
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, name_length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = data[pos:pos + name_length].rstrip(b"\0")
+            pos += name_length
+            if mask & IN_Q_OVERFLOW:
+                self.changes.put(RESCAN)
+                continue
+            directory = self.dirs.get(wd)
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        for filepath in self.watch_tree(path):
+                            self.changes.put(filepath)
+                    except OSError:
+                        self.changes.put(RESCAN)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.changes.put(RESCAN)   # everything inside is gone
+            else:
+                self.changes.put(path)
+
+    def run(self):
+        while True:
+            readable, _, _ = select.select([self.fd, self.stop_read_fd], [], [])
+            if self.stop_read_fd in readable:
+                break
+            try:
+                self.read_events()
+            except OSError as e:
+                print("Smithy2D - Warning: The script watcher stopped ({})".format(e))
+                self.changes.put(RESCAN)
+                break
+
+    # the changed file paths (RESCAN if everything has to be checked) since the last drain
+    def drain(self):
+        changes = set()
+        while True:
+            try:
+                changes.add(self.changes.get_nowait())
+            except queue.Empty:
+                return changes
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def close_fds(self):
+        for fd in [self.fd, self.stop_read_fd, self.stop_write_fd]:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def stop(self):
+        os.write(self.stop_write_fd, b"\0")
+        self.thread.join(timeout=1.0)
+        self.close_fds()
+
+def create_watcher(root_dir):
+    if not sys.platform.startswith("linux") or not os.path.isdir(root_dir):
+        return None
+    try:
+        return InotifyWatcher(root_dir)
+    except (OSError, AttributeError) as e:
+        print("Smithy2D - Warning: Can't watch '{}' with inotify, polling the component scripts instead ({})".format(root_dir, e))
+        return None
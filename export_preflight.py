@@ -0,0 +1,68 @@
+import os
+import time
+from .utils import *
+from . import ecs, export_profile, asset_db
+
+# Export Preflight
+# ---------------------------
+# scans the script directories an export reads from once (os.scandir) and answers every
+# "does this file exist" / "did this component change" question from that table.
+# directories are scanned the first time something inside them is asked for, so exporting
+# one scene only scans scripts/core and scripts/<scene>.
+# with use_registry a directory is synced into the asset registry instead (asset_db.py) and the stats come
+# from there. the registry only has the variant and component scripts, which is all an export asks about.
+class ExportPreflight:
+    def __init__(self, use_registry=False):
+        self.use_registry = use_registry
+        self.stats = {}             # {assetpath: (size, mtime_ns)}
+        self.scanned_dirs = set()   # top level script dirs: "scripts/core", "scripts/<scene>"
+        self.components = {}        # components that were already checked during this export
+
+    def scan_dir(self, dir_assetpath):
+        self.scanned_dirs.add(dir_assetpath)
+        if self.use_registry:
+            asset_db.sync(dir_assetpath=dir_assetpath)
+            self.stats.update(asset_db.get_file_stats(dir_assetpath))
+            return
+        pending = [dir_assetpath]
+        while pending:
+            current = pending.pop()
+            try:
+                entries = list(os.scandir(asset_abspath(current)))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for entry in entries:
+                entry_assetpath = "{}/{}".format(current, entry.name)
+                if entry.is_dir():
+                    pending.append(entry_assetpath)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    self.stats[entry_assetpath] = (stat.st_size, stat.st_mtime_ns)
+
+    def get_stat(self, assetpath):
+        # "scripts/<scene>/..." -> "scripts/<scene>"
+        dir_assetpath = "/".join(assetpath.split("/", 2)[0:2])
+        if dir_assetpath not in self.scanned_dirs:
+            self.scan_dir(dir_assetpath)
+        return self.stats.get(assetpath)
+
+    def file_exists(self, assetpath):
+        return self.get_stat(assetpath) is not None
+
+    # a file created during the export (eg. a new variant script)
+    def add_file(self, assetpath):
+        stat = os.stat(asset_abspath(assetpath))
+        self.stats[assetpath] = (stat.st_size, stat.st_mtime_ns)
+
+    # get the component and reparse its script if it changed. at most once per component per export
+    def get_component(self, assetpath):
+        component = self.components.get(assetpath)
+        if component is None:
+            start = time.perf_counter()
+            component = ecs.component_system.get_or_create_component(assetpath)
+            ecs.component_system.recompile_component_if_stat_changed(component, self.get_stat(assetpath))
+            self.components[assetpath] = component
+            export_profile.record_component_lookup(assetpath, time.perf_counter() - start)
+        else:
+            export_profile.record_component_lookup(assetpath)
+        return component
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import bpy
+
+# Export Profile
+# ---------------------------
+# timings, counts and bytes of one export (export_all): per scene > room > variant, per component script
+# and per exported file. saved to .lexeditor/export_profile.json next to the blend file.
+#  - snapshot_s: copying the object states out of bpy (the per object cache hits are cheap)
+#  - render_s:   rendering the rooms to lua (in the worker processes for a parallel export)
+#  - write_s:    hashing/writing a file. without workers the rooms are rendered while their file is
+#                written, so there render_s is part of write_s
+# the record_* functions are no-ops outside of a profiled export.
+_profile = None
+
+class ExportProfile:
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.total_s = 0.0
+        self.phases = {}        # {phase name: seconds}
+        self.scenes = {}        # {scene name: {"rooms": {room name: {"variants": {variant name: {...}}}}}}
+        self.components = {}    # {component assetpath: {"lookups": n, "resolve_s": seconds}}
+        self.files = {}         # {assetpath: {"write_s": seconds, "bytes": size, "written": bool}}
+
+    def get_room(self, scene_name, room_name):
+        scene = self.scenes.setdefault(scene_name, {"rooms": {}})
+        return scene["rooms"].setdefault(room_name, {"snapshot_s": 0.0, "render_s": 0.0, "variants": {}})
+
+    def get_variant(self, scene_name, room_name, variant_name):
+        return self.get_room(scene_name, room_name)["variants"].setdefault(variant_name, {
+            "snapshot_s": 0.0, "objects": 0, "objects_snapshotted": 0, "components": 0, "lua_bytes": 0})
+
+    def room_to_dict(self, room_name, room):
+        variants = [dict(name=name, **variant) for name, variant in room["variants"].items()]
+        room_dict = {"name": room_name, "snapshot_s": room["snapshot_s"], "render_s": room["render_s"]}
+        for key in ["objects", "objects_snapshotted", "components", "lua_bytes"]:
+            room_dict[key] = sum(v[key] for v in variants)
+        room_dict["snapshot_s"] += sum(v["snapshot_s"] for v in variants)
+        room_dict["variants"] = variants
+        return room_dict
+
+    def scene_to_dict(self, scene_name, scene):
+        rooms = [self.room_to_dict(name, room) for name, room in scene["rooms"].items()]
+        scene_dir = "scripts/{}/".format(scene_name)
+        scene_files = [f for path, f in self.files.items() if path.startswith(scene_dir)]
+        scene_dict = {"name": scene_name}
+        for key in ["snapshot_s", "render_s", "objects", "objects_snapshotted", "components", "lua_bytes"]:
+            scene_dict[key] = sum(r[key] for r in rooms)
+        scene_dict["write_s"] = sum(f["write_s"] for f in scene_files)
+        scene_dict["file_bytes"] = sum(f["bytes"] for f in scene_files)
+        scene_dict["rooms"] = rooms
+        return scene_dict
+
+    def to_dict(self):
+        scenes = [self.scene_to_dict(name, scene) for name, scene in self.scenes.items()]
+        rooms = [dict(r, scene=s["name"]) for s in scenes for r in s["rooms"]]
+        rooms.sort(key=lambda r: r["snapshot_s"] + r["render_s"], reverse=True)
+        components = sorted((dict(assetpath=path, **c) for path, c in self.components.items()),
+            key=lambda c: c["resolve_s"], reverse=True)
+        files = sorted((dict(assetpath=path, **f) for path, f in self.files.items()),
+            key=lambda f: f["write_s"], reverse=True)
+        totals = {
+            "scenes": len(scenes),
+            "rooms": len(rooms),
+            "variants": sum(len(r["variants"]) for s in self.scenes.values() for r in s["rooms"].values()),
+            "objects": sum(s["objects"] for s in scenes),
+            "objects_snapshotted": sum(s["objects_snapshotted"] for s in scenes),
+            "components": sum(s["components"] for s in scenes),
+            "component_scripts": len(components),
+            "component_resolve_s": sum(c["resolve_s"] for c in components),
+            "files": len(files),
+            "files_written": sum(1 for f in files if f["written"]),
+            "files_skipped": sum(1 for f in files if not f["written"]),
+            "bytes_written": sum(f["bytes"] for f in files if f["written"]),
+        }
+        return {
+            "total_s": self.total_s,
+            "phases": self.phases,
+            "totals": totals,
+            "slowest_rooms": [dict((k, r[k]) for k in ["scene", "name", "snapshot_s", "render_s", "objects"]) for r in rooms[0:10]],
+            "scenes": scenes,
+            "components": components,
+            "files": files,
+        }
+
+    # one line for the operator report
+    def summary(self):
+        data = self.to_dict()
+        totals = data["totals"]
+        text = "Exported {} scene(s), {} objects ({} changed), {}/{} files written ({:.1f} KB, {} unchanged skipped) in {:.0f} ms".format(
+            totals["scenes"], totals["objects"], totals["objects_snapshotted"], totals["files_written"], totals["files"],
+            totals["bytes_written"] / 1024, totals["files_skipped"], self.total_s * 1000)
+        slowest = [r for r in data["slowest_rooms"][0:3] if r["snapshot_s"] + r["render_s"] > 0]
+        if slowest:
+            text += ". Slowest rooms: " + ", ".join("{}/{} {:.0f} ms".format(
+                r["scene"], r["name"], (r["snapshot_s"] + r["render_s"]) * 1000) for r in slowest)
+        return text
+
+def export_profile_filepath():
+    return os.path.join(bpy.path.abspath("//"), ".lexeditor", "export_profile.json")
+
+def save(profile):
+    filepath = export_profile_filepath()
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "w") as f:
+        json.dump(profile.to_dict(), f, indent=1)
+
+def begin():
+    global _profile
+    _profile = ExportProfile()
+    return _profile
+
+def end():
+    global _profile
+    profile, _profile = _profile, None
+    if profile:
+        profile.total_s = time.perf_counter() - profile.start_time
+    return profile
+
+def is_active():
+    return _profile is not None
+
+def record_phase(name, seconds):
+    if _profile:
+        _profile.phases[name] = _profile.phases.get(name, 0.0) + seconds
+
+def record_variant_snapshot(scene_name, room_name, variant_name, seconds, objs, snapshotted_count):
+    if _profile:
+        record = _profile.get_variant(scene_name, room_name, variant_name)
+        record["snapshot_s"] += seconds
+        record["objects"] += len(objs)
+        record["objects_snapshotted"] += snapshotted_count
+        record["components"] += sum(len(obj["components"]) for obj in objs)
+
+def record_room_render(scene_name, room_name, seconds):
+    if _profile:
+        _profile.get_room(scene_name, room_name)["render_s"] += seconds
+
+# lua size of each variant, once all of its objects are rendered
+def record_rendered_scene(scene_snapshot):
+    if _profile:
+        for room_snapshot in scene_snapshot["rooms"]:
+            for variant_snapshot in room_snapshot["variants"]:
+                record = _profile.get_variant(scene_snapshot["name"], room_snapshot["name"], variant_snapshot["name"])
+                record["lua_bytes"] = sum(len(obj["lua"] or "") + 2 for obj in variant_snapshot["objects"])
+
+def record_component_lookup(assetpath, resolve_seconds=None):
+    if _profile:
+        record = _profile.components.setdefault(assetpath, {"lookups": 0, "resolve_s": 0.0})
+        record["lookups"] += 1
+        if resolve_seconds is not None:
+            record["resolve_s"] += resolve_seconds
+
+def record_file_write(assetpath, seconds, size, written):
+    if _profile:
+        record = _profile.files.setdefault(assetpath, {"write_s": 0.0, "bytes": 0, "written": False})
+        record["write_s"] += seconds
+        record["bytes"] = size
+        record["written"] = record["written"] or written
+
+# times only the work done inside the chunk generator (not the consumer writing the chunks)
+def iter_timed_room_chunks(chunks, scene_name, room_name):
+    if not _profile:
+        yield from chunks
+        return
+    chunks = iter(chunks)
+    seconds = 0.0
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        seconds += time.perf_counter() - start
+        if chunk is None:
+            break
+        yield chunk
+    record_room_render(scene_name, room_name, seconds)
@@ -1,165 +1,508 @@
 import bpy
+import re
+import sys
+import time
+import hashlib
 import traceback
+import contextlib
+import multiprocessing
+import site
+import concurrent.futures
 from .utils import *
-from . import ecs
-from mathutils import Vector
-
-def obj_state_to_lua_string(obj_state, line_prefix):
-    def convert_to_lua_value(datatype, val):
-        if datatype == "string":
-            return "\"" + val + "\""
-        elif datatype == "vec2":
-            return "{" + ",".join(map(str, val[0:2])) + "}" 
-        elif datatype == "vec3":
-            return "{" + ",".join(map(str, val[0:3])) + "}"
-        elif datatype == "vec4":
-            return "{" + ",".join(map(str, val[0:4])) + "}"
-        elif val in ["", None]:
-            return "nil"
-        elif datatype == "float":
-            return str(val)
-        return "\"" + str(val) + "\""
-
-    def convert_to_screen_position(blender_pos):
-        return [(blender_pos[0] * 120), -(blender_pos[1] * 120), blender_pos[2]]
-
-    def convert_to_screen_size(blender_size):
-        return [blender_size[0] * 120, blender_size[1] * 120, blender_size[2]]
-
-    serialized_state = "{}{{\n".format(line_prefix)
-    serialized_state += "{}\tname = \"{}\",\n".format(line_prefix, obj_state.name)
-    if obj_state.parent != "":
-        serialized_state += "{}\tparent = \"{}\",\n".format(line_prefix, obj_state.parent)
-
-    serialized_state += "{}\tcomponents = {{\n".format(line_prefix)
-    
-    # transform component
-    serialized_state += "{}\t\t[\"{}\"] = {{\n".format(line_prefix, component_idpath(global_component_assetpath("Transform")))
-
-    loc, rot, scale = obj_state.matrix_local.decompose()
-    mesh_size =  obj_state.bounds.get_dimensions()
-    pivotpos_from_topleft = Vector(obj_state.topleft) * -1
-    pivotpos_from_topleft_normalized = [a / b if b != 0 else a for a,b in zip(pivotpos_from_topleft, mesh_size)]
-    pivotpos_from_topleft_normalized[1] *= -1  # invert y because topleft coordinate system
-    transform_inputs = [
-        ('position', 'vec3', [round(v, 3) for v in convert_to_screen_position(loc)]), 
-        ('pivot', 'vec3', [round(v, 3) for v in pivotpos_from_topleft_normalized]), 
-        ('rotation_quat', 'vec4', [round(v, 3) for v in rot]), 
-        ('size', 'vec4', [round(v, 3) for v in convert_to_screen_size(mesh_size)]), 
-        ('scale', 'vec3', [round(v, 3) for v in scale])]
-    for i_n, i_t, i_v in transform_inputs:
-        serialized_state += "{}\t\t\t[\"{}\"]={},\n".format(line_prefix, i_n, convert_to_lua_value(i_t, i_v))
-
-    serialized_state += "{}\t\t}},\n".format(line_prefix) # end component
-
-    # other components
+from . import ecs, binary_definition, component_usage, export_profile, asset_db
+from .export_preflight import ExportPreflight
+from .transforms import obj_state_transform_inputs, VariantTransforms
+
+# Snapshots
+# ---------------------------
+# the exporter first copies everything it needs out of bpy into plain python data (a "snapshot"),
+# then renders the snapshot to lua. rendering doesn't touch bpy, so it can run in other processes.
+
+# override_only leaves out the inputs that are equal to the script's defaults (see iter_component_includes_chunks)
+def snapshot_obj_state(obj_state, scene, room, preflight, transform=None, override_only=False):
+    components = []
     for sc in obj_state.components_serialized:
         if sc.name:
-            _, room, scene = obj_state.get_variant_room_scene()
-            
-            component = ecs.component_system.get_or_create_component(sc.get_assetpath(scene, room))
-            ecs.component_system.recompile_component_if_changed(component)
-
-            if component.file_exists():
-                serialized_state += "{}\t\t[\"{}\"] = {{\n".format(line_prefix, component_idpath(sc.get_assetpath(scene, room)))
+            c_assetpath = sc.get_assetpath(scene, room)
+            component = preflight.get_component(c_assetpath)
 
+            if preflight.file_exists(c_assetpath):
                 stored_inputs = ecs.inputs_from_serialized_component(sc)
                 inputs = ecs.override_script_inputs(base_inputs=component.inputs, overrides=stored_inputs)
+                if override_only:
+                    defaults = [i[2] for i in component.inputs]
+                    inputs = [i for i, default in zip(inputs, defaults) if i[2] != default]
+                components.append((c_assetpath, [i[0:3] for i in inputs]))
 
-                for i in inputs:
-                    try:
-                        input_name, input_datatype, input_value, input_args = i
-                        serialized_state += "{}\t\t\t[\"{}\"]={},\n".format(line_prefix, input_name, convert_to_lua_value(input_datatype, input_value))
-                    except:
-                        print("ERROR: Invalid component input in a state for object '{}', component '{}', input ['{}']".format(
-                            obj_state.name, sc.get_assetpath(scene, room), i[0]))
-                        raise
-                serialized_state += "{}\t\t}},\n".format(line_prefix) # end component 
-
-    serialized_state += line_prefix + "\t}\n" # end component list
-    serialized_state += line_prefix + "}" # end object state
-    return serialized_state
-
-def scene_to_lua_string(scene):
-    print("Exporting scene '{}'".format(scene.name))
+    return {
+        "name": obj_state.name,
+        "parent": obj_state.parent,
+        "transform": transform or obj_state_transform_inputs(obj_state),
+        "components": components,
+        "lua": None,
+    }
+
+# snapshots of object states from previous exports (with their rendered lua)
+#   {(scene name, room name, variant name): {object name: obj snapshot}}
+_obj_state_cache = {}
+
+# hash everything that goes into an object state's lua (including the parsed inputs of its component scripts).
+# the inputs themselves, not a counter on the Component: that starts over when the Component is recreated
+def obj_state_content_hash(obj_state, scene, room, preflight, transform_values, override_only):
+    content = [
+        obj_state.name,
+        obj_state.parent,
+        transform_values,
+        override_only]
+
+    for sc in obj_state.components_serialized:
+        if sc.name:
+            c_assetpath = sc.get_assetpath(scene, room)
+            component = preflight.get_component(c_assetpath)
+            content.append((c_assetpath, sc.data, component.inputs, preflight.file_exists(c_assetpath)))
+
+    return hashlib.sha1(repr(content).encode()).hexdigest()
 
-    serialized_scene = "\t[\"{}\"] = {{\n".format(scene.name)   # export scene
+def snapshot_scene(scene, preflight=None, override_only=False):
+    if preflight is None:
+        preflight = ExportPreflight()
+    scene_snapshot = {"name": scene.name, "rooms": []}
     for room in scene.rooms:
-        serialized_scene += "\t\t[\"{}\"] = {{\n".format(room.name)   # export room
+        room_snapshot = {
+            "name": room.name, 
+            "location": tuple(room.location), 
+            "size": tuple(room.size), 
+            "variants": []}
+        scene_snapshot["rooms"].append(room_snapshot)
         for variant in room.variants:
             # create state script if it doesnt exist
             try:
-                if not variant_script_exists(scene.name, room.name, variant.name):
+                script_assetpath = variant_script_assetpath(scene.name, room.name, variant.name)
+                if not preflight.file_exists(script_assetpath):
                     create_variant_script(scene.name, room.name, variant.name)
+                    preflight.add_file(script_assetpath)
             except Exception as err:
                 print(err)
                 raise
-            
-            # export state node
-            serialized_scene += "\t\t\t[\"{}\"] = {{\n".format(variant.name)
-            serialized_scene += "\t\t\t\t{} = \"{}\",\n".format("script", variant_scriptpath(scene.name, room.name, variant.name))
-            
-            serialized_scene += "\t\t\t\tobjects = {\n"  # object list
-
-            obj_states = variant.object_states
-            for obj_state in obj_states:
-                serialized_scene += obj_state_to_lua_string(obj_state, "\t\t\t\t\t") + ",\n"
-            
-            serialized_scene += "\t\t\t\t}\n\t\t\t},\n"  # end object list + end variant
-        serialized_scene += "\t\t},\n" # end room
-
-    serialized_scene += "\t},\n" # end scene
-    return serialized_scene
-
-def export_scene_definition(scene):
-    serialized_scene = "return {\n"
-    serialized_scene += scene_to_lua_string(scene)
-    serialized_scene += "}\n"
-
-    abs_output_dir = asset_abspath(scene_dir_assetpath(scene.name))
-    os.makedirs(abs_output_dir, exist_ok=True)
-    output_filepath = os.path.join(abs_output_dir, ".definition.lua")
-    with open(output_filepath, 'w') as f:
-        f.write(serialized_scene)
+
+            # only snapshot the object states that changed since the last export
+            start = time.perf_counter()
+            variant.materialize()
+            variant_key = (scene.name, room.name, variant.name)
+            cached_objs = _obj_state_cache.get(variant_key, {})
+            objs = []
+            snapshotted_count = 0
+            transforms = VariantTransforms(variant.object_states)
+            for i, obj_state in enumerate(variant.object_states):
+                content_hash = obj_state_content_hash(obj_state, scene, room, preflight, transforms.get_raw_values(i), override_only)
+                obj = cached_objs.get(obj_state.name)
+                if not obj or obj["hash"] != content_hash:
+                    obj = snapshot_obj_state(obj_state, scene, room, preflight, transforms.get_inputs(i), override_only)
+                    obj["hash"] = content_hash
+                    snapshotted_count += 1
+                objs.append(obj)
+            export_profile.record_variant_snapshot(scene.name, room.name, variant.name, time.perf_counter() - start, objs, snapshotted_count)
+
+            room_snapshot["variants"].append({
+                "key": variant_key,
+                "name": variant.name,
+                "script": variant_scriptpath(scene.name, room.name, variant.name),
+                "objects": objs})
+
+    # the binary definition holds the defaults the objects leave out (the lua gets them from the component includes)
+    if override_only:
+        c_assetpaths = set(c_assetpath for room_snapshot in scene_snapshot["rooms"] for variant_snapshot in room_snapshot["variants"]
+            for obj in variant_snapshot["objects"] for c_assetpath, _ in obj["components"])
+        scene_snapshot["component_defaults"] = dict((c_assetpath, [i[0:3] for i in preflight.get_component(c_assetpath).inputs])
+            for c_assetpath in c_assetpaths)
+    return scene_snapshot
+
+# store the rendered object snapshots for the next export
+def update_export_cache(scene_snapshot, rendered_objs):
+    exported_variant_keys = set()
+    for room_snapshot in scene_snapshot["rooms"]:
+        for variant_snapshot in room_snapshot["variants"]:
+            variant_key = variant_snapshot["key"]
+            cached_objs = {}
+            for obj in variant_snapshot["objects"]:
+                if obj["lua"] is None:
+                    obj["lua"] = rendered_objs.get((variant_key, obj["name"]))
+                if obj["lua"] is not None:
+                    cached_objs[obj["name"]] = obj
+            _obj_state_cache[variant_key] = cached_objs
+            exported_variant_keys.add(variant_key)
+
+    # forget cached variants of this scene that don't exist anymore
+    for variant_key in [k for k in _obj_state_cache if k[0] == scene_snapshot["name"] and k not in exported_variant_keys]:
+        del _obj_state_cache[variant_key]
+    export_profile.record_rendered_scene(scene_snapshot)
+
+# Rendering (no bpy from here on)
+# ---------------------------
+# the object states and rooms are rendered by smithy2d_lua_render (see workers/), this puts them together
+def iter_scene_lua_chunks(scene_snapshot, rendered_objs, room_luas=None):
+    yield "\t[\"{}\"] = {{\n".format(scene_snapshot["name"])   # export scene
+    for i, room_snapshot in enumerate(scene_snapshot["rooms"]):
+        if room_luas is not None:
+            yield room_luas[i]  # already rendered by a worker
+        else:
+            yield from export_profile.iter_timed_room_chunks(lua_render.iter_room_lua_chunks(room_snapshot, rendered_objs),
+                scene_snapshot["name"], room_snapshot["name"])
+    yield "\t},\n" # end scene
+
+def iter_scene_definition_chunks(scene_snapshot, rendered_objs, room_luas=None):
+    yield "return {\n"
+    yield from iter_scene_lua_chunks(scene_snapshot, rendered_objs, room_luas)
+    yield "}\n"
+
+# Definition Layouts
+# ---------------------------
+# SCENE:   one scripts/<scene>/.definition.lua
+# ROOM:    one scripts/<scene>/<room>/.definition.lua per room
+# VARIANT: one scripts/<scene>/<room>/.<variant>.definition.lua per variant
+# every file has the same scene > room > variant nesting, holding only its part of the scene.
+# split layouts also write scripts/<scene>/.index.lua (rooms, their map rectangles and files),
+# so the game can load rooms on demand
+EXPORT_LAYOUTS = ["SCENE", "ROOM", "VARIANT"]
+
+def scene_definition_assetpath(scene_name):
+    return "{}/.definition.lua".format(scene_dir_assetpath(scene_name))
+
+def room_definition_assetpath(scene_name, room_name):
+    return "{}/.definition.lua".format(room_dir_assetpath(scene_name, room_name))
+
+def variant_definition_assetpath(scene_name, room_name, variant_name):
+    return "{}/.{}.definition.lua".format(room_dir_assetpath(scene_name, room_name), variant_name)
+
+def scene_index_assetpath(scene_name):
+    return "{}/.index.lua".format(scene_dir_assetpath(scene_name))
+
+def room_component_includes_assetpath(scene_name, room_name):
+    return "{}/.component_includes.lua".format(room_dir_assetpath(scene_name, room_name))
+
+# yields (assetpath, snapshot of the part of the scene that goes into it, pre-rendered room luas or None)
+def iter_definition_files(scene_snapshot, layout, room_luas=None):
+    scene_name = scene_snapshot["name"]
+    if layout == "SCENE":
+        yield scene_definition_assetpath(scene_name), scene_snapshot, room_luas
+        return
+    for i, room_snapshot in enumerate(scene_snapshot["rooms"]):
+        if layout == "ROOM":
+            yield (room_definition_assetpath(scene_name, room_snapshot["name"]),
+                {"name": scene_name, "rooms": [room_snapshot]},
+                [room_luas[i]] if room_luas is not None else None)
+        else:
+            for variant_snapshot in room_snapshot["variants"]:
+                yield (variant_definition_assetpath(scene_name, room_snapshot["name"], variant_snapshot["name"]),
+                    {"name": scene_name, "rooms": [dict(room_snapshot, variants=[variant_snapshot])]},
+                    None)
+
+def iter_scene_index_chunks(scene_snapshot, layout):
+    scene_name = scene_snapshot["name"]
+    yield "return {\n"
+    yield "\t[\"{}\"] = {{\n".format(scene_name)
+    for room_snapshot in scene_snapshot["rooms"]:
+        room_name = room_snapshot["name"]
+        yield "\t\t[\"{}\"] = {{\n".format(room_name)
+        yield "\t\t\tlocation = {{{},{}}},\n".format(*room_snapshot["location"])
+        yield "\t\t\tsize = {{{},{}}},\n".format(*room_snapshot["size"])
+        yield "\t\t\tincludes = \"{}\",\n".format(asset_scriptpath(room_component_includes_assetpath(scene_name, room_name)))
+        if layout == "ROOM":
+            yield "\t\t\tfile = \"{}\",\n".format(asset_scriptpath(room_definition_assetpath(scene_name, room_name)))
+        else:
+            yield "\t\t\tvariants = {\n"
+            for variant_snapshot in room_snapshot["variants"]:
+                variant_assetpath = variant_definition_assetpath(scene_name, room_name, variant_snapshot["name"])
+                yield "\t\t\t\t[\"{}\"] = \"{}\",\n".format(variant_snapshot["name"], asset_scriptpath(variant_assetpath))
+            yield "\t\t\t},\n"
+        yield "\t\t},\n"
+    yield "\t},\n"
+    yield "}\n"
+
+_definition_filename_pattern = re.compile(r"^\.(.*\.)?definition\.(lua|bin)$|^\.index\.lua$")
+
+# remove definitions left over from another layout (or from removed variants).
+# the room component includes only belong to the split layouts
+def remove_stale_definition_files(scene_snapshot, written_assetpaths, layout="SCENE"):
+    scene_name = scene_snapshot["name"]
+    dir_assetpaths = [scene_dir_assetpath(scene_name)]
+    dir_assetpaths.extend(room_dir_assetpath(scene_name, room_snapshot["name"]) for room_snapshot in scene_snapshot["rooms"])
+    if layout == "SCENE":
+        for room_snapshot in scene_snapshot["rooms"]:
+            includes_assetpath = room_component_includes_assetpath(scene_name, room_snapshot["name"])
+            if os.path.exists(asset_abspath(includes_assetpath)):
+                print("Removing stale component includes '{}'".format(includes_assetpath))
+                os.remove(asset_abspath(includes_assetpath))
+    for dir_assetpath in dir_assetpaths:
+        try:
+            filenames = os.listdir(asset_abspath(dir_assetpath))
+        except FileNotFoundError:
+            continue
+        for filename in filenames:
+            assetpath = "{}/{}".format(dir_assetpath, filename)
+            if _definition_filename_pattern.match(filename) and assetpath not in written_assetpaths:
+                print("Removing stale definition '{}'".format(assetpath))
+                os.remove(asset_abspath(assetpath))
+
+def write_scene_definition(scene_snapshot, room_luas=None, binary=False, layout="SCENE"):
+    rendered_objs = {}
+    written_assetpaths = set()
+    for output_assetpath, file_snapshot, file_room_luas in iter_definition_files(scene_snapshot, layout, room_luas):
+        write_export_file(output_assetpath, iter_scene_definition_chunks(file_snapshot, rendered_objs, file_room_luas))
+        written_assetpaths.add(output_assetpath)
+        if binary:
+            binary_assetpath = os.path.splitext(output_assetpath)[0] + ".bin"
+            write_export_file(binary_assetpath, [binary_definition.scene_snapshot_to_bytes(file_snapshot, component_idpath,
+                scene_snapshot.get("component_defaults"))], binary=True)
+            written_assetpaths.add(binary_assetpath)
+
+    if layout != "SCENE":
+        index_assetpath = scene_index_assetpath(scene_snapshot["name"])
+        write_export_file(index_assetpath, iter_scene_index_chunks(scene_snapshot, layout))
+        written_assetpaths.add(index_assetpath)
+
+    remove_stale_definition_files(scene_snapshot, written_assetpaths, layout)
+    return rendered_objs
+
+# Export Manifest
+# ---------------------------
+# every exported file is listed with its content hash in scripts/.export_manifest.lua, so the game can skip
+# reparsing files that didn't change. files whose content is unchanged aren't rewritten at all (same mtime).
+EXPORT_MANIFEST_ASSETPATH = "scripts/.export_manifest.lua"
+
+# {asset dir: {assetpath: (hash, size, mtime_ns)}}
+_export_manifests = {}
+
+_manifest_entry_pattern = re.compile(r'^\t\["(.*)"\] = {hash = "([0-9a-f]+)", size = (\d+)},$')
+
+def load_export_manifest(filepath):
+    manifest = {}
+    if os.path.exists(filepath):
+        with open(filepath) as f:
+            for line in f:
+                match = _manifest_entry_pattern.match(line.rstrip("\n"))
+                if match:
+                    # mtime isn't stored, so the first write of a session rehashes the file on disk
+                    manifest[match.group(1)] = (match.group(2), int(match.group(3)), None)
+    return manifest
+
+def get_export_manifest():
+    asset_dir = asset_abspath("")
+    manifest = _export_manifests.get(asset_dir)
+    if manifest is None:
+        manifest = load_export_manifest(asset_abspath(EXPORT_MANIFEST_ASSETPATH))
+        _export_manifests[asset_dir] = manifest
+    return manifest
+
+def write_export_file(assetpath, chunks, binary=False):
+    manifest = get_export_manifest()
+    filepath = asset_abspath(assetpath)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    start = time.perf_counter()
+    manifest[assetpath], written = write_file_if_changed(filepath, chunks, binary=binary, known_record=manifest.get(assetpath))
+    # the skipped files are counted in the profile (files_skipped), not printed one by one
+    export_profile.record_file_write(assetpath, time.perf_counter() - start, manifest[assetpath][1], written)
+    return written
+
+def iter_export_manifest_chunks(manifest):
+    yield "return {\n"
+    for assetpath in sorted(manifest):
+        content_hash, size, _ = manifest[assetpath]
+        yield '\t["{}"] = {{hash = "{}", size = {}}},\n'.format(assetpath, content_hash, size)
+    yield "}\n"
+
+def save_export_manifest():
+    manifest = get_export_manifest()
+    # forget files that were removed since (deleted scenes etc.)
+    for assetpath in [path for path in manifest if not os.path.exists(asset_abspath(path))]:
+        del manifest[assetpath]
+    write_file_if_changed(asset_abspath(EXPORT_MANIFEST_ASSETPATH), iter_export_manifest_chunks(manifest))
+
+# Export
+# ---------------------------
+def export_scene_definition(scene, binary=False, preflight=None, override_only=False, layout="SCENE"):
+    print("Exporting scene '{}'".format(scene.name))
+    scene_snapshot = snapshot_scene(scene, preflight, override_only)
+    rendered_objs = write_scene_definition(scene_snapshot, binary=binary, layout=layout)
+    update_export_cache(scene_snapshot, rendered_objs)
+
+# the workers are spawned, not forked: a forked blender would inherit its locks and threads (the script
+# watcher, the ui) in whatever state they're in. a spawned worker only unpickles render_room_lua from
+# smithy2d_lua_render, it never imports bpy
+def get_worker_context():
+    mp_context = multiprocessing.get_context("spawn")
+    # before 2.91 sys.executable is blender itself
+    mp_context.set_executable(getattr(bpy.app, "binary_path_python", None) or sys.executable)
+    return mp_context
+
+# spawned workers run the parent's __main__ again (by module name or file path), which is blender's
+# startup or a "blender --python" script that imports bpy. hide it while the workers start
+@contextlib.contextmanager
+def hidden_main_module():
+    main_module = sys.modules["__main__"]
+    hidden = dict((attr, getattr(main_module, attr)) for attr in ["__spec__", "__file__"] if hasattr(main_module, attr))
+    main_module.__spec__ = None
+    if hasattr(main_module, "__file__"):
+        del main_module.__file__
+    try:
+        yield
+    finally:
+        for attr, value in hidden.items():
+            setattr(main_module, attr, value)
+
+# the pool pickles render_room_lua by its module's name, which has to resolve to the loaded renderer in blender too.
+# the workers import it from LUA_RENDER_DIR, which the pool's initializer puts on their sys.path
+@contextlib.contextmanager
+def importable_lua_render_module():
+    sys.modules[LUA_RENDER_MODULE_NAME] = lua_render
+    try:
+        yield
+    finally:
+        sys.modules.pop(LUA_RENDER_MODULE_NAME, None)
+
+# render the rooms of all scenes in a process pool, and write each scene as soon as all of its rooms are done
+def export_scene_definitions_parallel(scenes, worker_count, binary=False, preflight=None, override_only=False, layout="SCENE"):
+    scene_snapshots = []
+    for scene in scenes:
+        print("Exporting scene '{}'".format(scene.name))
+        scene_snapshots.append(snapshot_scene(scene, preflight, override_only))
+
+    rendered_objs = {}
+    room_luas = [[None] * len(s["rooms"]) for s in scene_snapshots]
+    pending_rooms = [len(s["rooms"]) for s in scene_snapshots]
+
+    def finish_scene(scene_idx):
+        scene_snapshot = scene_snapshots[scene_idx]
+        # fills in the objects' lua, so files that don't hold whole rooms don't render them again
+        update_export_cache(scene_snapshot, rendered_objs)
+        write_scene_definition(scene_snapshot, room_luas=room_luas[scene_idx], binary=binary, layout=layout)
+
+    with hidden_main_module(), importable_lua_render_module(), concurrent.futures.ProcessPoolExecutor(max_workers=worker_count,
+            mp_context=get_worker_context(), initializer=site.addsitedir, initargs=(LUA_RENDER_DIR,)) as pool:
+        futures = {}
+        for scene_idx, scene_snapshot in enumerate(scene_snapshots):
+            if not scene_snapshot["rooms"]:
+                finish_scene(scene_idx)
+            for room_idx, room_snapshot in enumerate(scene_snapshot["rooms"]):
+                futures[pool.submit(lua_render.render_room_lua, room_snapshot)] = (scene_idx, room_idx)
+
+        for future in concurrent.futures.as_completed(futures):
+            scene_idx, room_idx = futures[future]
+            room_luas[scene_idx][room_idx], room_rendered_objs, render_seconds = future.result()
+            rendered_objs.update(room_rendered_objs)
+            export_profile.record_room_render(scene_snapshots[scene_idx]["name"], scene_snapshots[scene_idx]["rooms"][room_idx]["name"], render_seconds)
+            pending_rooms[scene_idx] -= 1
+            if pending_rooms[scene_idx] == 0:
+                finish_scene(scene_idx)
+
+def export_scene_definitions(scenes, worker_count=0, binary=False, preflight=None, override_only=False, layout="SCENE"):
+    scenes = list(scenes)
+    if preflight is None:
+        preflight = ExportPreflight()
+    if worker_count > 1 and len(scenes) > 0:
+        export_scene_definitions_parallel(scenes, worker_count, binary=binary, preflight=preflight, override_only=override_only, layout=layout)
+    else:
+        for scene in scenes:
+            export_scene_definition(scene, binary=binary, preflight=preflight, override_only=override_only, layout=layout)
         
 def export_scene_states():
     # export the scene states into separate files
-    for scene in bpy.context.scene.smithy2d.scenes:
-        export_scene_definition(scene)
+    settings = bpy.context.scene.smithy2d
+    export_scene_definitions(settings.scenes, settings.export_worker_count, binary=settings.export_binary_definition,
+        override_only=settings.export_override_only, layout=settings.export_layout)
+    save_export_manifest()
 
 # get all global component assetpaths
-def get_valid_global_component_assetpaths(bpy_scene):
-    component_assetpaths = set()
-    for scene in bpy_scene.smithy2d.scenes:
-        for room in scene.rooms:
-            for variant in room.variants:
-                for obj_state in variant.object_states:
-                    for sc in obj_state.components_serialized:
-                        if sc.is_global:
-                            assetpath = global_component_assetpath(sc.name)
-                            component_assetpaths.add(assetpath)
-
-    return [path for path in component_assetpaths if os.path.exists(asset_abspath(path))]
+def get_valid_global_component_assetpaths(bpy_scene, preflight):
+    component_assetpaths = component_usage.get_used_component_assetpaths(bpy_scene, "scripts/core/")
+    return sorted(path for path in component_assetpaths if preflight.file_exists(path))
 
 # get all non-global component assetpaths for a scene
-def get_valid_component_assetpaths_for_scene(scene):
-    component_assetpaths = set()
-    for room in scene.rooms:
-        for variant in room.variants:
-            for obj_state in variant.object_states:
-                for sc in obj_state.components_serialized:
-                    if not sc.is_global:
-                        assetpath = component_assetpath(sc.name, scene.name, room.name)
-                        component_assetpaths.add(assetpath)
+def get_valid_component_assetpaths_for_scene(scene, preflight):
+    scene_dir = scene_dir_assetpath(scene.name) + "/"
+    component_assetpaths = component_usage.get_used_component_assetpaths(scene.id_data, scene_dir)
+    return sorted(path for path in component_assetpaths if preflight.file_exists(path))
+
+# get all non-global component assetpaths for a room (for the split definition layouts)
+def get_valid_component_assetpaths_for_room(scene, room, preflight):
+    room_dir = room_dir_assetpath(scene.name, room.name) + "/"
+    component_assetpaths = component_usage.get_used_component_assetpaths(scene.id_data, room_dir)
+    return sorted(path for path in component_assetpaths if preflight.file_exists(path))
+
+# component_inputs {assetpath: parsed script inputs} adds a defaults table to each component.
+# needed when the definitions are exported with override_only
+def iter_component_includes_chunks(component_assetpaths, component_inputs=None):
+    yield "return {\n"
+    for asset in component_assetpaths:
+        if component_inputs is None:
+            yield '\t{{"{}", "{}"}},\n'.format(component_idpath(asset), asset_scriptpath(asset))
+        else:
+            defaults = ", ".join('["{}"]={}'.format(i_name, lua_render.convert_to_lua_value(i_datatype, i_default))
+                for i_name, i_datatype, i_default, i_args in component_inputs.get(asset, []))
+            yield '\t{{"{}", "{}", defaults = {{{}}}}},\n'.format(component_idpath(asset), asset_scriptpath(asset), defaults)
+    yield "}"
+
+def export_component_includes_file(output_assetpath, component_assetpaths, component_inputs=None):
+    write_export_file(output_assetpath, iter_component_includes_chunks(component_assetpaths, component_inputs))
+
+def get_component_inputs(component_assetpaths, preflight):
+    return dict((path, preflight.get_component(path).inputs) for path in component_assetpaths)
 
-    return [path for path in component_assetpaths if os.path.exists(asset_abspath(path))]
+# save the active variant into its object states
+def save_active_variant(bpy_scene):
+    scene = bpy_scene.smithy2d.get_active_scene()
+    room = scene.get_active_room() if scene else None
+    variant = room.get_active_variant() if room else None
+    if variant:
+        variant.save_scene_state(bpy_scene)
 
-def export_component_includes_file(output_filepath, component_assetpaths):
-    with open(bpy.path.abspath(output_filepath), 'w') as f:
-        f.write("return {\n")
-        for asset in component_assetpaths:
-            f.write('\t{{"{}", "{}"}},\n'.format(component_idpath(asset), asset_scriptpath(asset)))
-        f.write("}")
+# the full export: the global includes file, then the includes file and definition of each given scene, then the manifest.
+# returns the export's profile (also saved to .lexeditor/export_profile.json)
+def export_all(bpy_scene, scenes, worker_count=0, binary=False, override_only=False, layout="SCENE"):
+    profile = export_profile.begin()
+    try:
+        _export_all(bpy_scene, scenes, worker_count, binary, override_only, layout)
+    finally:
+        export_profile.end()
+    export_profile.save(profile)
+    print(profile.summary())
+    return profile
+
+def _export_all(bpy_scene, scenes, worker_count, binary, override_only, layout):
+    start = time.perf_counter()
+    # every script lookup during the export goes through this one scan of the script dirs
+    preflight = ExportPreflight(use_registry=asset_db.is_enabled())
+
+    # export global component includes file
+    global_component_includes_assetpath = "scripts/core/.component_includes.lua"
+    component_assetpaths = get_valid_global_component_assetpaths(bpy_scene, preflight)
+    component_inputs = get_component_inputs(component_assetpaths, preflight) if override_only else None
+    export_component_includes_file(global_component_includes_assetpath, component_assetpaths, component_inputs)
+
+    for scene in scenes:
+        scene.dirty = False
+        # export scene component includes file
+        component_includes_assetpath = "{}/.component_includes.lua".format(scene_dir_assetpath(scene.name))
+        component_assetpaths = get_valid_component_assetpaths_for_scene(scene, preflight)
+        component_inputs = get_component_inputs(component_assetpaths, preflight) if override_only else None
+        export_component_includes_file(component_includes_assetpath, component_assetpaths, component_inputs)
+
+        # rooms that are loaded on their own also get their own includes
+        if layout != "SCENE":
+            for room in scene.rooms:
+                component_assetpaths = get_valid_component_assetpaths_for_room(scene, room, preflight)
+                component_inputs = get_component_inputs(component_assetpaths, preflight) if override_only else None
+                export_component_includes_file(room_component_includes_assetpath(scene.name, room.name), component_assetpaths, component_inputs)
+    export_profile.record_phase("component_includes_s", time.perf_counter() - start)
+
+    # export scene definitions
+    start = time.perf_counter()
+    export_scene_definitions(scenes, worker_count, binary=binary, preflight=preflight, override_only=override_only, layout=layout)
+    export_profile.record_phase("definitions_s", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    save_export_manifest()
+    export_profile.record_phase("manifest_s", time.perf_counter() - start)
 
 class Smithy2D_ExportSceneStates(bpy.types.Operator):
     bl_idname = "smithy2d.export_scene_states"
@@ -169,32 +512,25 @@ class Smithy2D_ExportSceneStates(bpy.types.Operator):
         # save the current state
         scene = context.scene.smithy2d.get_active_scene()
         scene.dirty = True # always export the active scene
-        room = scene.get_active_room()
-        if room:
-            variant = room.get_active_variant()
-            if variant: 
-                variant.save_scene_state(context.scene)
+        save_active_variant(context.scene)
 
         # try exporting all scenes     
         try:
-            # export global component includes file
-            global_component_includes_filepath = "{}scripts/core/.component_includes.lua".format(get_asset_dir())
-            component_assetpaths = get_valid_global_component_assetpaths(context.scene)
-            export_component_includes_file(global_component_includes_filepath, component_assetpaths)
-            
-            for scene in context.scene.smithy2d.scenes:
-                if scene.dirty:
-                    scene.dirty = False
-                    # export scene component includes file
-                    component_includes_filepath = "{}/.component_includes.lua".format(asset_abspath(scene_dir_assetpath(scene.name)))
-                    component_assetpaths = get_valid_component_assetpaths_for_scene(scene)
-                    export_component_includes_file(component_includes_filepath, component_assetpaths)
-
-                    # export scene definition
-                    export_scene_definition(scene)
-
+            settings = context.scene.smithy2d
+            dirty_scenes = [scene for scene in settings.scenes if scene.dirty]
+            profile = export_all(context.scene, dirty_scenes, settings.export_worker_count, binary=settings.export_binary_definition,
+                override_only=settings.export_override_only, layout=settings.export_layout)
+            self.report({"INFO"}, profile.summary())
         except Exception as err:
             traceback.print_tb(err.__traceback__)
             print(err)
             self.report({"ERROR"}, "Error encountered while exporting scene states. See Console.")
         return {'FINISHED'}
+
+# Registration
+# ---------------------------
+# older versions of the addon put the workers folder on blender's sys.path and imported the renderer from there
+def unregister():
+    if LUA_RENDER_DIR in sys.path:
+        sys.path.remove(LUA_RENDER_DIR)
+    sys.modules.pop(LUA_RENDER_MODULE_NAME, None)
@@ -0,0 +1,282 @@
+import os
+import hashlib
+import bpy
+from .utils import get_guid_mapfile
+from .asset_registry import AssetRegistry
+
+# Guid Map
+# ---------------------------
+# which asset (scene dir, room dir, variant script) each guid is bound to. loaded once into memory from:
+#   .lexeditor/guids          snapshot, one "<guid>\t<assetpath>" line per binding
+#   .lexeditor/guids.journal  changes since the snapshot, one record per line:
+#     g <sha1 of the snapshot>     header, the journal only applies on top of that snapshot
+#     b <guid> <assetpath>         bind (or rebind) a guid
+#     u <guid>                     unbind a guid
+#     m <old path> <new path>      rebind everything at or inside old path (a renamed directory)
+# single asset operations only append a record. once the journal gets long it's compacted into a new
+# snapshot. a crash can at worst lose the record being written: a torn last line is skipped (and cut off
+# before the next append), and a journal left over from before a compaction doesn't match the new
+# snapshot's hash, so it's ignored.
+# every query revalidates the (mtime, size) of both files and only rereads them if they changed on disk
+# (eg. a git checkout or another blender instance), so the maps are parsed once, not per operator.
+# changes are batched: they're written together FLUSH_DELAY seconds after the first one, so eg. pasting
+# a scene and renaming its rooms ends up as one write. saving the blend file and unregistering the addon
+# fold the journal into the snapshot (compact_journal), so the snapshot alone is complete for other tools.
+JOURNAL_COMPACT_THRESHOLD = 512
+FLUSH_DELAY = 0.5
+
+_guid_to_assetpath = {}
+_assetpath_to_guids = AssetRegistry()  # {assetpath: {guid: None}} in binding order. renamed directories only touch the assetpaths inside them
+_loaded_mapfile = None      # the snapshot the maps were loaded from (None if not loaded)
+_loaded_stats = None        # (mtime_ns, size) of the snapshot and the journal as last read or written
+_snapshot_hash = None
+_journal_record_count = 0
+_pending_records = []       # applied to the maps, not written yet
+
+def get_journal_filepath():
+    return get_guid_mapfile() + ".journal"
+
+def _file_stat(filepath):
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _get_stats(mapfile):
+    return _file_stat(mapfile), _file_stat(mapfile + ".journal")
+
+# several guids can be bound to one assetpath (eg. a stale binding), they all move with it
+def _set(guid, assetpath):
+    _remove(guid)
+    guids = _assetpath_to_guids.get(assetpath)
+    if guids is None:
+        guids = {}
+        _assetpath_to_guids.set(assetpath, guids)
+    guids[guid] = None
+    _guid_to_assetpath[guid] = assetpath
+
+def _remove(guid):
+    assetpath = _guid_to_assetpath.pop(guid, None)
+    guids = _assetpath_to_guids.get(assetpath) if assetpath is not None else None
+    if guids is not None:
+        guids.pop(guid, None)
+        if not guids:
+            _assetpath_to_guids.pop(assetpath)
+
+def _move(old_assetpath, new_assetpath):
+    for _, assetpath, guids in _assetpath_to_guids.move_subtree(old_assetpath, new_assetpath):
+        for guid in guids:
+            _guid_to_assetpath[guid] = assetpath
+
+# the guid bound last to the assetpath
+def _last_guid(guids):
+    return list(guids)[-1] if guids else None
+
+def _apply_record(parts):
+    if parts[0] == "b" and len(parts) == 3:
+        _set(parts[1], parts[2])
+    elif parts[0] == "u" and len(parts) == 2:
+        _remove(parts[1])
+    elif parts[0] == "m" and len(parts) == 3:
+        _move(parts[1], parts[2])
+
+def _read(mapfile, stats):
+    global _loaded_mapfile, _loaded_stats, _snapshot_hash, _journal_record_count
+    _guid_to_assetpath.clear()
+    _assetpath_to_guids.clear()
+
+    snapshot = b""
+    if os.path.exists(mapfile):
+        with open(mapfile, "rb") as f:
+            snapshot = f.read()
+    _snapshot_hash = hashlib.sha1(snapshot).hexdigest()
+    for line in snapshot.decode("utf-8").splitlines():
+        line_parts = line.split("\t")
+        if len(line_parts) >= 2:
+            _set(line_parts[0], line_parts[1].rstrip())
+
+    _journal_record_count = 0
+    journal_filepath = mapfile + ".journal"
+    if os.path.exists(journal_filepath):
+        with open(journal_filepath, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        lines.pop()     # whatever follows the last line break is a torn write (or nothing)
+        if lines and lines[0] == "g\t" + _snapshot_hash:
+            for line in lines[1:]:
+                _apply_record(line.split("\t"))
+                _journal_record_count += 1
+        elif lines:
+            print("Smithy2D - Warning: Ignoring a guid journal that belongs to another snapshot ('{}')".format(journal_filepath))
+    _loaded_mapfile = mapfile
+    _loaded_stats = stats
+
+    # changes that aren't written yet stay on top of what's on disk
+    for record in _pending_records:
+        _apply_record(record)
+
+def load(force=False):
+    mapfile = get_guid_mapfile()
+    if _pending_records and _loaded_mapfile != mapfile:
+        flush()     # they belong to the previously loaded blend file
+    stats = _get_stats(mapfile)     # before reading, so a write during the read is picked up next time
+    if _loaded_mapfile == mapfile and _loaded_stats == stats and not force:
+        return
+    _read(mapfile, stats)
+
+# cut a torn last line (a write interrupted by a crash) off the journal, so the next append doesn't complete it
+def _truncate_torn_line(filepath):
+    with open(filepath, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            line_break = f.read(end - start).rfind(b"\n")
+            if line_break != -1:
+                end = start + line_break + 1
+                break
+            end = start
+        if end != size:
+            f.truncate(end)
+
+# changes are applied to the maps right away, but only written by the next flush
+def _append_records(records):
+    load()
+    for record in records:
+        _apply_record(record)
+    _pending_records.extend(records)
+    if bpy.app.background:
+        flush()     # no timers without the ui (eg. a command line export)
+    elif not bpy.app.timers.is_registered(_flush_timer):
+        bpy.app.timers.register(_flush_timer, first_interval=FLUSH_DELAY, persistent=True)
+
+def _flush_timer():
+    flush()
+    return None
+
+# write all pending changes to the journal in one append
+def flush():
+    global _journal_record_count, _loaded_stats
+    if not _pending_records:
+        return
+    stats = _get_stats(_loaded_mapfile)
+    if stats != _loaded_stats:
+        _read(_loaded_mapfile, stats)    # the files changed on disk since, the journal has to match them
+
+    journal_filepath = _loaded_mapfile + ".journal"
+    os.makedirs(os.path.dirname(journal_filepath), exist_ok=True)
+    if _journal_record_count == 0:
+        # start a journal for the current snapshot (drops one left over from before a compaction)
+        with open(journal_filepath, "w", encoding="utf-8") as f:
+            f.write("g\t{}\n".format(_snapshot_hash))
+    else:
+        _truncate_torn_line(journal_filepath)
+    with open(journal_filepath, "a", encoding="utf-8") as f:
+        f.write("".join("\t".join(record) + "\n" for record in _pending_records))
+        f.flush()
+        os.fsync(f.fileno())
+    _journal_record_count += len(_pending_records)
+    del _pending_records[:]
+    _loaded_stats = _get_stats(_loaded_mapfile)
+    if _journal_record_count >= JOURNAL_COMPACT_THRESHOLD:
+        compact()
+
+# write the current bindings (pending changes included) as the new snapshot and start an empty journal
+def compact():
+    load()
+    _write_snapshot()
+
+def _write_snapshot():
+    global _snapshot_hash, _journal_record_count, _loaded_stats
+    mapfile = _loaded_mapfile
+    os.makedirs(os.path.dirname(mapfile), exist_ok=True)
+    snapshot = "".join("{}\t{}\n".format(guid, assetpath) for guid, assetpath in _guid_to_assetpath.items()).encode("utf-8")
+    tmp_mapfile = mapfile + ".tmp"
+    with open(tmp_mapfile, "wb") as f:
+        f.write(snapshot)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_mapfile, mapfile)
+    _snapshot_hash = hashlib.sha1(snapshot).hexdigest()
+    _journal_record_count = 0
+    del _pending_records[:]
+    if os.path.exists(mapfile + ".journal"):
+        os.remove(mapfile + ".journal")
+    _loaded_stats = _get_stats(mapfile)
+
+# compact the loaded maps if they have changes since their snapshot (also when another blend file was
+# opened since, the changes belong to the one they were loaded from)
+def compact_journal():
+    if _loaded_mapfile is None or (not _pending_records and _journal_record_count == 0):
+        return
+    stats = _get_stats(_loaded_mapfile)
+    if stats != _loaded_stats:
+        _read(_loaded_mapfile, stats)
+        if not _pending_records and _journal_record_count == 0:
+            return
+    _write_snapshot()
+
+# queries
+def get_assetpath(guid):
+    load()
+    return _guid_to_assetpath.get(guid)
+
+def get_guid(assetpath):
+    load()
+    return _last_guid(_assetpath_to_guids.get(assetpath))
+
+# copies of ({guid: assetpath}, {assetpath: guid})
+def get_maps():
+    load()
+    return dict(_guid_to_assetpath), dict((assetpath, _last_guid(guids)) for assetpath, guids in _assetpath_to_guids.items())
+
+# an {assetpath: guid} map for deserialize_state (the paste operators). known assetpaths are looked
+# up in the guid map, only the new guids are kept in the dict itself (see bind_new)
+class PendingBindings(dict):
+    def setdefault(self, assetpath, default=None):
+        if assetpath in self:
+            return self[assetpath]
+        guid = get_guid(assetpath) if bpy.data.filepath else None
+        if guid is None:
+            guid = self[assetpath] = default
+        return guid
+
+# changes
+def bind(guid, assetpath):
+    bind_many([(guid, assetpath)])
+
+def bind_many(bindings):
+    if bindings:
+        _append_records([("b", guid, assetpath) for guid, assetpath in bindings])
+
+# bind the entries of an {assetpath: guid} map that aren't bound yet (eg. the new guids of a paste)
+def bind_new(assetpath_map):
+    load()
+    bind_many([(guid, assetpath) for assetpath, guid in assetpath_map.items() if _guid_to_assetpath.get(guid) != assetpath])
+
+def unbind(guids):
+    load()
+    guids = [guid for guid in guids if guid in _guid_to_assetpath]
+    if guids:
+        _append_records([("u", guid) for guid in guids])
+
+# a renamed scene/room directory or variant script: rebinds it and everything inside it
+def rebind_path(old_assetpath, new_assetpath):
+    _append_records([("m", old_assetpath, new_assetpath)])
+
+# replace all bindings (the asset folder sync)
+def replace_all(guid_to_assetpath):
+    load()
+    if guid_to_assetpath == _guid_to_assetpath and _journal_record_count == 0 and not _pending_records:
+        return
+    _guid_to_assetpath.clear()
+    _assetpath_to_guids.clear()
+    for guid, assetpath in guid_to_assetpath.items():
+        _set(guid, assetpath)
+    compact()
+
+def unregister():
+    compact_journal()
+    if bpy.app.timers.is_registered(_flush_timer):
+        bpy.app.timers.unregister(_flush_timer)
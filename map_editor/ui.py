@@ -333,6 +333,29 @@ class Smithy2D_ME_PT_SceneRoomVariants(bpy.types.Panel):
         if not bpy.data.filepath:
             layout.enabled = False
 
+class Smithy2D_ME_PT_Export(bpy.types.Panel):
+    bl_space_type = 'IMAGE_EDITOR'
+    bl_region_type = 'UI'
+    bl_category = 'Map'
+    bl_options = {'DEFAULT_CLOSED'}
+    bl_label = "Export"
+
+    @classmethod
+    def poll(cls, context):
+        return context.space_data
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(context.scene.smithy2d, "export_worker_count", text="Workers")
+        layout.prop(context.scene.smithy2d, "export_binary_definition", text="Binary Definitions")
+        layout.prop(context.scene.smithy2d, "export_override_only", text="Override Only Inputs")
+        layout.prop(context.scene.smithy2d, "export_layout", text="Layout")
+        layout.prop(context.scene.smithy2d, "use_asset_registry", text="Asset Registry")
+        layout.operator("smithy2d.export_scene_states", text="Export")
+
+        if not bpy.data.filepath:
+            layout.enabled = False
+
 def register():
     pass
     
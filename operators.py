@@ -9,7 +9,7 @@ import mathutils
 from mathutils import Vector, Matrix, Quaternion
 from .ObjUtils import set_mesh_preserve_origin
 from .utils import *
-from . import ObjUtils
+from . import ObjUtils, component_usage, state_clipboard, guid_map, asset_db
 from .ecs import component_system 
 
 
@@ -245,12 +245,8 @@ class Smithy2D_VariantAddOperator(bpy.types.Operator):
             if not variant.guid:
                 self.report({"ERROR"}, "Newly created variant '{}' doesn't have a guid for some reason".format(variant.name))
                 
-            variant_guid = "{}\t{}\n".format(variant.guid, variant_assetpath)
-
             # add guids to guid file
-            guid_filepath = get_guid_mapfile()
-            with open(guid_filepath, "a") as guid_file:
-                guid_file.write(variant_guid)
+            guid_map.bind(variant.guid, variant_assetpath)
 
             if variant:
                 variant.save_scene_state(bpy.context.scene)
@@ -323,17 +319,15 @@ class Smithy2D_RoomAddOperator(bpy.types.Operator):
             if variant:
                 variant.save_scene_state(bpy.context.scene)
 
-            room_guids = ["{}\t{}\n".format(room.guid, room_assetpath)]
+            room_guids = [(room.guid, room_assetpath)]
             for variant in room.variants:
                 if not variant.guid:
                     self.report({"ERROR"}, "variant '{}' inside newly created room '{}' does not have a guid for some reason".format(variant.name, room.name))
                 variant_assetpath = variant_script_assetpath(scene.name, room.name, variant.name)
-                room_guids.append("{}\t{}\n".format(variant.guid, variant_assetpath))
+                room_guids.append((variant.guid, variant_assetpath))
 
             # add guids to guid file
-            guid_filepath = get_guid_mapfile()
-            with open(guid_filepath, "a") as guid_file:
-                guid_file.writelines(room_guids)
+            guid_map.bind_many(room_guids)
 
             scene.set_room_and_update(len(scene.rooms) - 1)
             refresh_screen_area(context.area.type)
@@ -400,22 +394,20 @@ class Smithy2D_SceneAddOperator(bpy.types.Operator):
                 variant.save_scene_state(bpy.context.scene)
 
             # collect new scene guids
-            scene_guids = ["{}\t{}\n".format(scene.guid, scene_assetpath)]
+            scene_guids = [(scene.guid, scene_assetpath)]
             for room in scene.rooms:
                 if not room.guid:
                     self.report({"ERROR"}, "room '{}' inside newly created scene '{}' does not have a guid for some reason".format(room.name, scene.name))
                 room_assetpath = room_dir_assetpath(scene.name, room.name)
-                scene_guids.append("{}\t{}\n".format(room.guid, room_assetpath))
+                scene_guids.append((room.guid, room_assetpath))
                 for variant in room.variants:
                     if not variant.guid:
                         self.report({"ERROR"}, "variant '{}' inside newly created scene '{}' does not have a guid for some reason".format(variant.name, scene.name))
                     variant_assetpath = variant_script_assetpath(scene.name, room.name, variant.name)
-                    scene_guids.append("{}\t{}\n".format(variant.guid, variant_assetpath))
+                    scene_guids.append((variant.guid, variant_assetpath))
 
             # add guids to guid file
-            guid_filepath = get_guid_mapfile()
-            with open(guid_filepath, "a") as guid_file:
-                guid_file.writelines(scene_guids)
+            guid_map.bind_many(scene_guids)
 
             context.scene.smithy2d.set_scene_and_update(len(context.scene.smithy2d.scenes) - 1)
             refresh_screen_area(context.area.type)
@@ -452,16 +444,9 @@ def rename_room_directory(scene_name, old_name, name):
         component_system.rename_asset(old_room_dir_assetpath, new_room_dir_assetpath)
         
         # rename the room and its assets in the guid file
-        guid_map_filepath = get_guid_mapfile()
-        tmp_guid_map_filepath = guid_map_filepath + ".tmp"
-        with open(guid_map_filepath, "r") as guid_file:
-            with open(tmp_guid_map_filepath, "w") as tmp_guid_file:
-                for line in guid_file:
-                    line_assetpath = line.split('\t')[1].rstrip()
-                    if line_assetpath.startswith(old_room_dir_assetpath):
-                        line = line.replace(old_room_dir_assetpath, new_room_dir_assetpath, 1)
-                    tmp_guid_file.write(line)
-        os.replace(tmp_guid_map_filepath, guid_map_filepath)
+        guid_map.rebind_path(old_room_dir_assetpath, new_room_dir_assetpath)
+        if asset_db.is_enabled():
+            asset_db.rename_subtree(old_room_dir_assetpath, new_room_dir_assetpath)
         return True
     except Exception as e:
         traceback.print_exc()
@@ -480,19 +465,12 @@ def rename_variant_script(scene_name, room_name, old_variant_name, new_variant_n
         else:
             print("Smithy2D - Warning: Renaming a Variant but the original script could not be found ('{}')".format(old_script_filepath))
         
-        component_system.rename_asset(old_assetpath, new_assetpath)
+        component_system.rename_asset(old_script_assetpath, new_script_assetpath)
 
         # rename the variant in the guid file
-        guid_map_filepath = get_guid_mapfile()
-        tmp_guid_map_filepath = guid_map_filepath + ".tmp"
-        with open(guid_map_filepath, "r") as guid_file:
-            with open(tmp_guid_map_filepath, "w") as tmp_guid_file:
-                for line in guid_file:
-                    line_assetpath = line.split('\t')[1].rstrip()
-                    if line_assetpath.startswith(old_script_assetpath):
-                        line = line.replace(old_script_assetpath, new_script_assetpath, 1)
-                    tmp_guid_file.write(line)
-        os.replace(tmp_guid_map_filepath, guid_map_filepath)
+        guid_map.rebind_path(old_script_assetpath, new_script_assetpath)
+        if asset_db.is_enabled():
+            asset_db.rename_subtree(old_script_assetpath, new_script_assetpath)
         return True
     except:
         return False
@@ -513,16 +491,9 @@ def rename_scene(old_scene_name, new_scene_name):
         component_system.rename_asset(old_scene_dir_assetpath, new_scene_assetpath)
 
         # rename the scene and its assets in the guid file
-        guid_map_filepath = get_guid_mapfile()
-        tmp_guid_map_filepath = guid_map_filepath + ".tmp"
-        with open(guid_map_filepath, "r") as guid_file:
-            with open(tmp_guid_map_filepath, "w") as tmp_guid_file:
-                for line in guid_file:
-                    line_assetpath = line.split('\t')[1].rstrip()
-                    if line_assetpath.startswith(old_scene_dir_assetpath):
-                        line = line.replace(old_scene_dir_assetpath, new_scene_assetpath, 1)
-                    tmp_guid_file.write(line)
-        os.replace(tmp_guid_map_filepath, guid_map_filepath)
+        guid_map.rebind_path(old_scene_dir_assetpath, new_scene_assetpath)
+        if asset_db.is_enabled():
+            asset_db.rename_subtree(old_scene_dir_assetpath, new_scene_assetpath)
         return True
     except:
         return False
@@ -780,6 +751,7 @@ class VariantDeleterOperator(bpy.types.Operator):
         room = variant.get_room()
         scene = room.get_scene()
         variant_assetpath = variant_script_assetpath(scene.name, room.name, variant.name)
+        variant_key = (scene.name, room.name, variant.name)
         variant_guid = variant.guid
         self.warning = ""
         asset_exists = True
@@ -801,6 +773,7 @@ class VariantDeleterOperator(bpy.types.Operator):
                 if idx == active_idx and (idx != 0 or len(collection) == 1):
                     new_active_idx -= 1
                 collection.remove(idx)
+                component_usage.forget(*variant_key)
                 
                 # log
                 if collection and new_active_idx >= 0:
@@ -812,15 +785,10 @@ class VariantDeleterOperator(bpy.types.Operator):
                 room.load_variant(new_active_idx, force=True)
             
             # remove from guids mapfile
-            guid_map_filepath = get_guid_mapfile()
-            tmp_guid_map_filepath = guid_map_filepath + ".tmp"
-            if os.path.exists(guid_map_filepath):
-                with open(guid_map_filepath, "r") as guid_file:
-                    with open(tmp_guid_map_filepath, "w") as tmp_guid_file:
-                        for line in guid_file:
-                            if line.split('\t')[0] != variant_guid:
-                                tmp_guid_file.write(line)
-                os.replace(tmp_guid_map_filepath, guid_map_filepath)
+            variant_guids = [variant_guid]
+            if asset_db.is_enabled():
+                variant_guids.extend(asset_db.remove_subtree(variant_assetpath))
+            guid_map.unbind(variant_guids)
 
             scene.dirty = True
             refresh_screen_area(context.area.type)
@@ -868,6 +836,7 @@ class RoomDeleterOperator(bpy.types.Operator):
         room = context.scene.path_resolve(self.datapath)
         scene = room.get_scene()
         room_assetpath = room_dir_assetpath(scene.name, room.name)
+        room_key = (scene.name, room.name)
 
         # collect the rooms guids (to remove them from the guids file later)
         room_guids = [room.guid]
@@ -884,6 +853,7 @@ class RoomDeleterOperator(bpy.types.Operator):
             # delete from disk
             if asset_exists:
                 archive_and_delete_asset(room_assetpath)
+                component_system.remove_asset(room_assetpath)
 
             # delete from ui
             collection = scene.rooms
@@ -895,6 +865,7 @@ class RoomDeleterOperator(bpy.types.Operator):
                 if idx == active_idx and (idx != 0 or len(collection) == 1):
                     new_active_idx -= 1
                 collection.remove(idx)
+                component_usage.forget(*room_key)
                 
                 # log
                 if collection and new_active_idx >= 0:
@@ -905,16 +876,11 @@ class RoomDeleterOperator(bpy.types.Operator):
                 scene.set_room(new_active_idx)
                 scene.load_room(new_active_idx, force=True)
 
-            # remove from guids mapfile
-            guid_map_filepath = get_guid_mapfile()
-            tmp_guid_map_filepath = guid_map_filepath + ".tmp"
-            if os.path.exists(guid_map_filepath):
-                with open(guid_map_filepath, "r") as guid_file:
-                    with open(tmp_guid_map_filepath, "w") as tmp_guid_file:
-                        for line in guid_file:
-                            if line.split('\t')[0] not in room_guids:
-                                tmp_guid_file.write(line)
-                os.replace(tmp_guid_map_filepath, guid_map_filepath)                
+            # remove from guids mapfile, with the registry also the guids it has inside the room directory
+            # (eg. a variant script that was added on disk and has no variant in this blend file)
+            if asset_db.is_enabled():
+                room_guids.extend(asset_db.remove_subtree(room_assetpath))
+            guid_map.unbind(room_guids)
 
             scene.dirty = True
             refresh_screen_area(context.area.type)
@@ -956,6 +922,7 @@ class SceneDeleterOperator(bpy.types.Operator):
 
         smithy_scene = context.scene.path_resolve(self.datapath)
         scene_assetpath = scene_dir_assetpath(smithy_scene.name)
+        scene_name = smithy_scene.name
 
         # collect all scene guids (to remove them from the guid file later)
         scene_guids = [smithy_scene.guid]
@@ -974,6 +941,7 @@ class SceneDeleterOperator(bpy.types.Operator):
             # delete from disk
             if asset_exists:
                 archive_and_delete_asset(scene_assetpath)
+                component_system.remove_asset(scene_assetpath)
 
             # delete from ui
             collection = context.scene.smithy2d.scenes
@@ -985,6 +953,7 @@ class SceneDeleterOperator(bpy.types.Operator):
                 if idx == active_idx and (idx != 0 or len(collection) == 1):
                     new_active_idx -= 1
                 collection.remove(idx)
+                component_usage.forget(scene_name)
 
                 # log
                 if collection and new_active_idx >= 0:
@@ -995,16 +964,10 @@ class SceneDeleterOperator(bpy.types.Operator):
                 context.scene.smithy2d.set_scene(new_active_idx)
                 context.scene.smithy2d.load_scene(new_active_idx, force=True)
             
-            # remove from guids mapfile
-            guid_map_filepath = get_guid_mapfile()
-            tmp_guid_map_filepath = guid_map_filepath + ".tmp"
-            if os.path.exists(guid_map_filepath):
-                with open(guid_map_filepath, "r") as guid_file:
-                    with open(tmp_guid_map_filepath, "w") as tmp_guid_file:
-                        for line in guid_file:
-                            if line.split('\t')[0] not in scene_guids:
-                                tmp_guid_file.write(line)
-                os.replace(tmp_guid_map_filepath, guid_map_filepath)
+            # remove from guids mapfile (and the guids the registry has inside the scene directory)
+            if asset_db.is_enabled():
+                scene_guids.extend(asset_db.remove_subtree(scene_assetpath))
+            guid_map.unbind(scene_guids)
 
             refresh_screen_area(context.area.type)
         except OSError as e:
@@ -1039,34 +1002,28 @@ class SyncWithAssetFolder(bpy.types.Operator):
             return str(uuid.uuid4())
 
         # sync existing assets with contents on disk
-        guid_map = {}
+        guid_to_assetpath = {}
         used_guids = set()
         assetpath_map = {}
         def get_or_create_guid_assetpath_binding(guid, default_assetpath):
-            assetpath = guid_map.get(guid)
+            assetpath = guid_to_assetpath.get(guid)
             if not assetpath:
                 assetpath = default_assetpath
-                guid_map[guid] = assetpath
+                guid_to_assetpath[guid] = assetpath
                 assetpath_map[assetpath] = guid
             return assetpath
         def get_or_create_assetpath_guid_binding(assetpath, default_guid):
             guid = assetpath_map.get(default_guid)
             if not guid:
                 guid = default_guid
-                guid_map[guid] = assetpath
+                guid_to_assetpath[guid] = assetpath
                 assetpath_map[assetpath] = guid
             return guid
                 
 
-        guid_map_filepath = get_guid_mapfile()
-        os.makedirs(os.path.dirname(guid_map_filepath), exist_ok=True)
-        if os.path.exists(guid_map_filepath):
-            with open(guid_map_filepath, "r") as guid_file:
-                # parse the guids from the guid-assetpath map file
-                for line in guid_file:
-                    line_parts = line.split("\t")
-                    guid, assetpath = line_parts[0], line_parts[1].rstrip()
-                    get_or_create_guid_assetpath_binding(guid, assetpath)
+        # the guid-assetpath bindings of the guid map
+        for guid, assetpath in guid_map.get_maps()[0].items():
+            get_or_create_guid_assetpath_binding(guid, assetpath)
             
         # rename each scene according to its mapped directories
         for scene in context.scene.smithy2d.scenes:
@@ -1113,58 +1070,56 @@ class SyncWithAssetFolder(bpy.types.Operator):
                     # set the variant's name according to its script name
                     variant.name = variant_from_assetpath(new_assetpath)
 
-        # find new assets on disk
-        scenes_dir = asset_abspath("scripts/")
-        if os.path.exists(scenes_dir):
-            for scene_name in os.listdir(scenes_dir):
-                if not scene_name.startswith('.') and scene_name != "core" and os.path.isdir(os.path.join(scenes_dir, scene_name)):
-                    scene = context.scene.smithy2d.scenes.get(scene_name)
-                    scene_assetpath = scene_dir_assetpath(scene_name)
-                    scene_abspath = asset_abspath(scene_assetpath)
-                    # add scene if it doesnt exist in the blendfile
-                    if not scene:
-                        scene = context.scene.smithy2d.scenes.add()
-                        scene.name = scene_name
-                        scene.guid = get_or_create_assetpath_guid_binding(scene_assetpath, default_guid=create_guid())
-                        used_guids.add(scene.guid)
-
-                    # find new room assets on disk
-                    if os.path.exists(scene_abspath):
-                        for room_name in os.listdir(scene_abspath):
-                            if os.path.isdir(os.path.join(scene_abspath, room_name)):
-                                room = scene.rooms.get(room_name)
-                                room_assetpath = room_dir_assetpath(scene_name, room_name)
-                                room_abspath = asset_abspath(room_assetpath)
-                                # add room if it doesnt exist in the blendfile
-                                if not room:
-                                    room = scene.rooms.add()
-                                    room.name = room_name
-                                    room.guid = assetpath_map.get(room_assetpath) or ""
-                                    room.guid = get_or_create_assetpath_guid_binding(room_assetpath, default_guid=create_guid())
-                                    used_guids.add(room.guid)
-
-                                # find new variant assets on disk
-                                variants_dir = os.path.join(room_abspath, "states")
-                                if os.path.exists(variants_dir) and os.path.isdir(variants_dir):
-                                    for variant_filename in os.listdir(variants_dir):
-                                        variant_name, ext = os.path.splitext(variant_filename)
-                                        if ext == ".lua":
-                                            variant = room.variants.get(variant_name)
-                                            variant_assetpath = variant_script_assetpath(scene_name, room_name, variant_name)
-                                            # add variant if it doesnt exist in the blendfile
-                                            if not variant:
-                                                variant = room.variants.add()
-                                                variant.name = variant_name
-                                                variant.guid = get_or_create_assetpath_guid_binding(variant_assetpath, default_guid=create_guid())
-                                                used_guids.add(variant.guid)
-        # write changes to the guid map file
-        if guid_map:
-            tmp_guid_map_filepath = get_guid_mapfile() + ".tmp"
-            with open(tmp_guid_map_filepath, "w") as tmp_guid_file:
-                for guid in used_guids:
-                    assetpath = guid_map[guid]
-                    tmp_guid_file.write("{}\t{}\n".format(guid, assetpath))
-            os.replace(tmp_guid_map_filepath, guid_map_filepath)
+        # find new assets on disk. with the asset registry, its sync walks the scripts folder (only rehashing
+        # changed files) and the new assets are looked up in it
+        registry_changes = None
+        if asset_db.is_enabled():
+            registry_changes = asset_db.sync(dict((guid, guid_to_assetpath[guid]) for guid in used_guids))
+            scene_tree = asset_db.get_scene_tree()
+        else:
+            scene_tree = get_scene_tree_on_disk()
+        for scene_name, room_tree in scene_tree.items():
+            scene = context.scene.smithy2d.scenes.get(scene_name)
+            scene_assetpath = scene_dir_assetpath(scene_name)
+            # add scene if it doesnt exist in the blendfile
+            if not scene:
+                scene = context.scene.smithy2d.scenes.add()
+                scene.name = scene_name
+                scene.guid = get_or_create_assetpath_guid_binding(scene_assetpath, default_guid=create_guid())
+                used_guids.add(scene.guid)
+
+            # find new room assets on disk
+            for room_name, variant_names in room_tree.items():
+                room = scene.rooms.get(room_name)
+                room_assetpath = room_dir_assetpath(scene_name, room_name)
+                # add room if it doesnt exist in the blendfile
+                if not room:
+                    room = scene.rooms.add()
+                    room.name = room_name
+                    room.guid = get_or_create_assetpath_guid_binding(room_assetpath, default_guid=create_guid())
+                    used_guids.add(room.guid)
+
+                # find new variant assets on disk
+                for variant_name in variant_names:
+                    variant = room.variants.get(variant_name)
+                    variant_assetpath = variant_script_assetpath(scene_name, room_name, variant_name)
+                    # add variant if it doesnt exist in the blendfile
+                    if not variant:
+                        variant = room.variants.add()
+                        variant.name = variant_name
+                        variant.guid = get_or_create_assetpath_guid_binding(variant_assetpath, default_guid=create_guid())
+                        used_guids.add(variant.guid)
+
+        # write changes to the guid map file (drops the guids of assets that don't exist anymore)
+        used_guid_to_assetpath = dict((guid, guid_to_assetpath[guid]) for guid in used_guids)
+        if guid_to_assetpath:
+            guid_map.replace_all(used_guid_to_assetpath)
+
+        if registry_changes is not None:
+            asset_db.set_guids(used_guid_to_assetpath)    # the guids of the assets added above
+            changed, removed = registry_changes
+            if changed or removed:
+                self.report({"INFO"}, "Asset registry: {} asset(s) changed, {} removed since the last sync".format(len(changed), len(removed)))
 
         refresh_screen_area("PROPERTIES")
         return {"FINISHED"}
@@ -1180,14 +1135,12 @@ class CopyVariantToClipboard(bpy.types.Operator):
         return room and room.get_active_variant()
 
     def execute(self, context):
-        guid_map, assetpath_map = get_guids_maps_from_file()
         scene = context.scene.smithy2d.get_active_scene()
         room = scene.get_active_room()
         variant = room.get_active_variant()
         save_state((scene, room, variant))
 
-        serialized = serialize_variant(variant)
-        bpy.context.window_manager.clipboard = serialized
+        state_clipboard.copy_state_to_clipboard("v", variant.name, iter_variant_state_chunks(variant))
 
         return {"FINISHED"}
     
@@ -1201,15 +1154,13 @@ class CopyRoomToClipboard(bpy.types.Operator):
         return scene and scene.get_active_room()
 
     def execute(self, context):
-        guid_map, assetpath_map = get_guids_maps_from_file()
         scene = context.scene.smithy2d.get_active_scene()
         room = scene.get_active_room()
         variant = room.get_active_variant()
         if variant:
             save_state((scene, room, variant))
 
-        serialized = serialize_room(room)
-        bpy.context.window_manager.clipboard = serialized
+        state_clipboard.copy_state_to_clipboard("r", room.name, iter_room_state_chunks(room))
 
         return {"FINISHED"}
     
@@ -1223,15 +1174,13 @@ class CopySceneToClipboard(bpy.types.Operator):
         return scene
 
     def execute(self, context):
-        guid_map, assetpath_map = get_guids_maps_from_file()
         scene = context.scene.smithy2d.get_active_scene()
 
         room = scene.get_active_room()
         variant = room.get_active_variant() if room else None
         if variant:
             save_state((scene, room, variant))
-        serialized = serialize_scene(scene)
-        bpy.context.window_manager.clipboard = serialized
+        state_clipboard.copy_state_to_clipboard("s", scene.name, iter_scene_state_chunks(scene))
 
         return {"FINISHED"}
 
@@ -1246,11 +1195,11 @@ class Smithy2D_PasteVariantFromClipboard(bpy.types.Operator):
         return room
 
     def execute(self, context):
-        guid_map, assetpath_map = get_guids_maps_from_file()
+        assetpath_map = guid_map.PendingBindings()
 
-        serialized = bpy.context.window_manager.clipboard
+        tag, name, serialized = state_clipboard.get_clipboard_state()
 
-        if not serialized.lstrip().startswith('v\t'):
+        if tag != 'v':
             self.report({"ERROR"}, "No Variant found in the clipboard")
             return {"CANCELLED"}
 
@@ -1260,10 +1209,6 @@ class Smithy2D_PasteVariantFromClipboard(bpy.types.Operator):
             self.report({"ERROR"}, "No active room to paste the variant into")
             return {"CANCELLED"}
 
-        # get room name
-        first_line = serialized.split('\n', 1)[0].lstrip()
-        name = first_line.split('\t')[1].strip()
-
         deserialize_state(serialized, scene=scene, room=room, variant=None, assetpath_to_guid_map=assetpath_map)
 
         variant = room.variants.get(name)
@@ -1278,14 +1223,9 @@ class Smithy2D_PasteVariantFromClipboard(bpy.types.Operator):
         else:
             room.set_variant_and_update(variant.index())
 
-        # write changes to the guid map file
+        # write the new guids to the guid map file
         if assetpath_map and bpy.data.filepath:
-            guid_map_filepath = get_guid_mapfile()
-            tmp_guid_map_filepath = guid_map_filepath + ".tmp"
-            with open(tmp_guid_map_filepath, "w") as tmp_guid_file:
-                for assetpath, guid in assetpath_map.items():
-                    tmp_guid_file.write("{}\t{}\n".format(guid, assetpath))
-            os.replace(tmp_guid_map_filepath, guid_map_filepath)
+            guid_map.bind_new(assetpath_map)
 
         return {"FINISHED"}
         
@@ -1299,10 +1239,10 @@ class Smithy2D_PasteRoomFromClipboard(bpy.types.Operator):
         return scene
 
     def execute(self, context):
-        guid_map, assetpath_map = get_guids_maps_from_file()
-        serialized = bpy.context.window_manager.clipboard
+        assetpath_map = guid_map.PendingBindings()
+        tag, name, serialized = state_clipboard.get_clipboard_state()
 
-        if not serialized.lstrip().startswith('r\t'):
+        if tag != 'r':
             self.report({"ERROR"}, "No room found in the clipboard")
             return {"CANCELLED"}
 
@@ -1311,11 +1251,7 @@ class Smithy2D_PasteRoomFromClipboard(bpy.types.Operator):
             self.report({"ERROR"}, "No active scene to paste the room into")
             return {"CANCELLED"}
 
-        # get room name
-        first_line = serialized.split('\n', 1)[0].lstrip()
-        name = first_line.split('\t')[1].strip()
-
-        deserialize_state(serialized, scene=scene, room=None, variant=None, assetpath_to_guid_map=assetpath_map)
+        deserialize_state(serialized, scene=scene, room=None, variant=None, assetpath_to_guid_map=assetpath_map, lazy=True)
 
         room = scene.rooms.get(name)
         if not room:
@@ -1331,14 +1267,9 @@ class Smithy2D_PasteRoomFromClipboard(bpy.types.Operator):
         else:
             scene.set_room_and_update(room.index())
 
-        # write changes to the guid map file
+        # write the new guids to the guid map file
         if assetpath_map and bpy.data.filepath:
-            guid_map_filepath = get_guid_mapfile()
-            tmp_guid_map_filepath = guid_map_filepath + ".tmp"
-            with open(tmp_guid_map_filepath, "w") as tmp_guid_file:
-                for assetpath, guid in assetpath_map.items():
-                    tmp_guid_file.write("{}\t{}\n".format(guid, assetpath))
-            os.replace(tmp_guid_map_filepath, guid_map_filepath)
+            guid_map.bind_new(assetpath_map)
 
         return {"FINISHED"}
 
@@ -1351,18 +1282,14 @@ class Smithy2D_PasteSceneFromClipboard(bpy.types.Operator):
         return True
 
     def execute(self, context):
-        guid_map, assetpath_map = get_guids_maps_from_file()
-        serialized = bpy.context.window_manager.clipboard
+        assetpath_map = guid_map.PendingBindings()
+        tag, name, serialized = state_clipboard.get_clipboard_state()
 
-        if not serialized.lstrip().startswith('s\t'):
+        if tag != 's':
             self.report({"ERROR"}, "No scene found in the clipboard")
             return {"CANCELLED"}
 
-        # get scene name
-        first_line = serialized.split('\n', 1)[0].lstrip()
-        name = first_line.split('\t')[1].strip()
-
-        deserialize_state(serialized, scene=None, room=None, variant=None, assetpath_to_guid_map=assetpath_map)
+        deserialize_state(serialized, scene=None, room=None, variant=None, assetpath_to_guid_map=assetpath_map, lazy=True)
 
         scene = context.scene.smithy2d.scenes.get(name)
         if not scene:
@@ -1379,14 +1306,9 @@ class Smithy2D_PasteSceneFromClipboard(bpy.types.Operator):
         else:
             context.scene.smithy2d.set_scene_and_update(scene.get_index())
 
-        # write changes to the guid map file
+        # write the new guids to the guid map file
         if assetpath_map and bpy.data.filepath:
-            guid_map_filepath = get_guid_mapfile()
-            tmp_guid_map_filepath = guid_map_filepath + ".tmp"
-            with open(tmp_guid_map_filepath, "w") as tmp_guid_file:
-                for assetpath, guid in assetpath_map.items():
-                    tmp_guid_file.write("{}\t{}\n".format(guid, assetpath))
-            os.replace(tmp_guid_map_filepath, guid_map_filepath)
+            guid_map.bind_new(assetpath_map)
 
         return {"FINISHED"}
 
@@ -1,6 +1,6 @@
 import bpy
 import uuid
-from . import ecs, ObjUtils, dialog_system
+from . import ecs, ObjUtils, dialog_system, component_usage, state_format
 from .dialog_system import TEXT_INPUT_PADDING, DIALOG_PADDING, WIDGET_PADDING
 from .utils import *
 from mathutils import Matrix, Vector
@@ -55,6 +55,10 @@ class Smithy2D_SerializedComponent(bpy.types.PropertyGroup):
             ci.datatype = datatype
             ci._set_string_value(str_value)
 
+# the component usages are keyed by scene/room/variant name
+def _name_updated(self, context):
+    component_usage.invalidate()
+
 def flatten(mat):
     dim = len(mat)
     return [mat[j][i] for i in range(dim) 
@@ -134,6 +138,7 @@ class Smithy2D_ObjectState(bpy.types.PropertyGroup):
     def load(self, variant, room, scene, obj):
         component_system = obj.smithy2d.get_component_system()
         obj.smithy2d.components.clear()
+        component_system.unindex_object(obj.name)
         for new_sc in self.components_serialized:
             bpy_c = obj.smithy2d.add_component(new_sc.name, is_global=new_sc.is_global, calc_inputs=False)
             new_sc.deserialize(bpy_c)
@@ -230,12 +235,14 @@ class Smithy2D_RoomVariant(bpy.types.PropertyGroup):
         other_variant.name = self.name
         other_variant.guid = str(uuid.uuid4())
         other_variant.object_states.clear()
+        other_variant.pending_state = self.pending_state
         for obj_state in self.object_states:
             other_state = other_variant.object_states.add()
             obj_state.copy_into(other_state)
 
     def set_name(self, val):
         self['name'] = val
+        component_usage.invalidate()
         refresh_screen_area("PROPERTIES")
        
     def get_name(self):
@@ -279,27 +286,46 @@ class Smithy2D_RoomVariant(bpy.types.PropertyGroup):
 
         # add a state for each valid object
         self.object_states.clear()
+        self.pending_state = ""
         for o in objs:
             state = self.object_states.add()
             state.name = o.name
             state.save(o)
+
+        room, scene = self.get_room_scene()
+        component_usage.update_variant(scene, room, self)
     
+    # create the object states of a variant that was pasted lazily (see deserialize_state).
+    # call before reading object_states
+    def materialize(self):
+        if self.pending_state:
+            # parse first: on a StateFormatError the variant keeps its pending state
+            nodes = state_format.parse_state(self.pending_state.split("\n"))
+            self.pending_state = ""
+            self.object_states.clear()
+            fill_variant_object_states(self, nodes)
+        return self
+
     def get_sorted_object_states(self):
+        self.materialize()
+        # {name: parent name}, read once instead of looking up the collection for every step up the hierarchy
+        parents = {}
+        for state in self.object_states:
+            parents.setdefault(state.name, state.parent)
+
         def hierarchy_depth(state):
             hierarchy_depth = 0
-            parent = state
-            while parent.parent and parent.parent in self.object_states:
-                if parent.parent not in self.object_states:
-                    break #TODO why does this happen sometimes
+            parent = state.parent
+            while parent and parent in parents:
                 hierarchy_depth += 1
-                assert parent.parent in self.object_states # object parent is backstage??
-                parent = self.object_states[parent.parent]
+                parent = parents[parent]
             return hierarchy_depth
         return sorted(self.object_states, key=hierarchy_depth)
 
     # load this variant into the bpy scene
     def load_scene_state(self, bpy_scene):
         print("Loading Variant: '{}'".format(self.get_full_name()))
+        self.materialize()
 
         # get or create the Backstage collection 
         backstage = bpy.data.collections.get("Backstage")
@@ -341,8 +367,9 @@ class Smithy2D_RoomVariant(bpy.types.PropertyGroup):
             state.load(self, room, scene, obj)
         
     guid : bpy.props.StringProperty(default="")
-    name : bpy.props.StringProperty()
+    name : bpy.props.StringProperty(update=_name_updated)
     object_states : bpy.props.CollectionProperty(type=Smithy2D_ObjectState)
+    pending_state : bpy.props.StringProperty(default="")    # serialized object states of a lazily pasted variant
 
 class Smithy2D_Room(bpy.types.PropertyGroup):
     def init(self, name):
@@ -396,6 +423,7 @@ class Smithy2D_Room(bpy.types.PropertyGroup):
 
     def set_name(self, val):
         self['name'] = val
+        component_usage.invalidate()
         refresh_screen_area("PROPERTIES")
        
     def get_name(self):
@@ -450,7 +478,7 @@ class Smithy2D_Room(bpy.types.PropertyGroup):
     size : bpy.props.FloatVectorProperty(size=2)
     variants : bpy.props.CollectionProperty(type=Smithy2D_RoomVariant)
     active_variant_index: bpy.props.IntProperty(default=-1, set=set_variant_and_update, get=get_variant)
-    name : bpy.props.StringProperty()
+    name : bpy.props.StringProperty(update=_name_updated)
 
 class Smithy2D_Object(bpy.types.PropertyGroup):
     def get_component(self, name):
@@ -473,6 +501,7 @@ class Smithy2D_Object(bpy.types.PropertyGroup):
         for i, c in reversed(list(enumerate(self.components))):
             if c.name == name:
                 self.components.remove(i)
+        self.get_component_system().unindex_component(self.id_data.name, name)
 
     def get_components(self):
         return self.components[:]
@@ -531,6 +560,7 @@ class Smithy2D_Scene(bpy.types.PropertyGroup):
 
     def set_name(self, name):
         self['name'] = name
+        component_usage.invalidate()
         refresh_screen_area("PROPERTIES")
         
     def get_name(self):
@@ -581,7 +611,7 @@ class Smithy2D_Scene(bpy.types.PropertyGroup):
         return bpy.data.images.get(self.map_image)
 
     guid : bpy.props.StringProperty(default="")
-    name : bpy.props.StringProperty()
+    name : bpy.props.StringProperty(update=_name_updated)
     rooms : bpy.props.CollectionProperty(type=Smithy2D_Room)
     active_room_index : bpy.props.IntProperty(default=-1, get=get_room, set=set_room_and_update)
     map_image : bpy.props.StringProperty()
@@ -594,6 +624,11 @@ def _scene_changed(old_scene, new_scene):
     new_variant = new_room.get_active_variant() if new_room else None
     switch_state((old_scene, old_room, old_variant), (new_scene, new_room, new_variant))
 
+# definitions exported in the old format would not match the includes files anymore
+def _export_format_updated(self, context):
+    for scene in self.scenes:
+        scene.dirty = True
+
 class Smithy2D_ScenePropertyGroup(bpy.types.PropertyGroup):
     def get_active_scene(self):
         if self.scenes:
@@ -626,6 +661,20 @@ class Smithy2D_ScenePropertyGroup(bpy.types.PropertyGroup):
     active_scene_index : bpy.props.IntProperty(set=set_scene_and_update, get=get_scene)
     scenes : bpy.props.CollectionProperty(type=Smithy2D_Scene)
     version : bpy.props.IntVectorProperty(size=3, default=get_addon_version())
+    export_worker_count : bpy.props.IntProperty(default=0, min=0, max=64, 
+        description="Number of processes that render scene definitions. 0 or 1 exports on the main thread")
+    export_binary_definition : bpy.props.BoolProperty(default=False,
+        description="Also export a compact binary '.definition.bin' next to each '.definition.lua'")
+    export_override_only : bpy.props.BoolProperty(default=False, update=_export_format_updated,
+        description="Only export the component inputs that differ from the script defaults. The defaults are written once to the component includes files")
+    export_layout : bpy.props.EnumProperty(default="SCENE", update=_export_format_updated,
+        items=[
+            ("SCENE", "Scene", "One definition file per scene"),
+            ("ROOM", "Room", "One definition file per room, plus a scene index"),
+            ("VARIANT", "Variant", "One definition file per variant, plus a scene index")],
+        description="How the scene definitions are split into files")
+    use_asset_registry : bpy.props.BoolProperty(default=False,
+        description="Keep an index of the scripts folder in '.lexeditor/registry.sqlite', so syncing with the asset folder only rehashes changed files")
 
 
 def register():
@@ -0,0 +1,96 @@
+import os
+import uuid
+import zlib
+import codecs
+import bpy
+from .utils import *
+
+# File-backed Clipboard
+# ---------------------------
+# copying a scene/room/variant writes its serialized state zlib compressed into .lexeditor/clipboard/
+# and only puts a one line handle on the system clipboard:
+#   lex2d_clipboard <tag (s/r/v)> <name> <absolute filepath of the compressed state>
+# the path is absolute, so the state can be pasted into another blend file.
+# unsaved blend files (no .lexeditor folder) still copy the plain text.
+CLIPBOARD_HANDLE_TAG = "lex2d_clipboard"
+CLIPBOARD_COMPRESSION_LEVEL = 1     # the text is very repetitive, higher levels are slower for little gain
+MAX_CLIPBOARD_FILES = 4
+
+def clipboard_dir():
+    return os.path.join(bpy.path.abspath("//"), ".lexeditor", "clipboard")
+
+def iter_compressed_chunks(chunks):
+    compressor = zlib.compressobj(CLIPBOARD_COMPRESSION_LEVEL)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def iter_compressed_state_lines(filepath, buffer_size=1 << 16):
+    decompressor = zlib.decompressobj()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(buffer_size), b""):
+            lines = (pending + decoder.decode(decompressor.decompress(block))).split("\n")
+            pending = lines.pop()
+            yield from lines
+    yield from (pending + decoder.decode(decompressor.flush(), final=True)).split("\n")
+
+# (tag, name, filepath) of a clipboard handle, or None if the clipboard holds something else
+def parse_clipboard_handle(clipboard):
+    parts = clipboard.lstrip().split("\n", 1)[0].split("\t")
+    if parts[0] != CLIPBOARD_HANDLE_TAG or len(parts) < 4:
+        return None
+    return parts[1], parts[2], "\t".join(parts[3:])
+
+# only the newest few files are kept, the system clipboard can only hold one handle anyway.
+# the file the clipboard points to (shared by all blender instances) and new_filepath are never removed,
+# whatever their mtime says (coarse timestamps, clock changes)
+def remove_old_clipboard_files(directory, new_filepath):
+    keep_filepaths = [new_filepath]
+    handle = parse_clipboard_handle(bpy.context.window_manager.clipboard)
+    if handle:
+        keep_filepaths.append(handle[2])
+    keep_filepaths = set(os.path.normcase(os.path.abspath(filepath)) for filepath in keep_filepaths)
+    filepaths = [entry.path for entry in os.scandir(directory) if entry.name.endswith(".zlib")
+        and os.path.normcase(os.path.abspath(entry.path)) not in keep_filepaths]
+    filepaths.sort(key=os.path.getmtime, reverse=True)
+    for filepath in filepaths[max(MAX_CLIPBOARD_FILES - len(keep_filepaths), 0):]:
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass    # removed by another blender instance
+
+# chunks: the serialized state, eg. iter_scene_state_chunks(scene)
+def copy_state_to_clipboard(tag, name, chunks):
+    window_manager = bpy.context.window_manager
+    if not bpy.data.filepath:
+        window_manager.clipboard = "".join(chunks)
+        return
+
+    directory = clipboard_dir()
+    os.makedirs(directory, exist_ok=True)
+    filepath = os.path.join(directory, "{}.zlib".format(uuid.uuid4()))
+    write_file_atomic(filepath, iter_compressed_chunks(chunks), binary=True)
+    window_manager.clipboard = "\t".join([CLIPBOARD_HANDLE_TAG, tag, name, filepath])
+    remove_old_clipboard_files(directory, filepath)
+
+# returns (tag, name, lines) of the state on the clipboard (a handle or plain text), or (None, None, None)
+def get_clipboard_state():
+    clipboard = bpy.context.window_manager.clipboard
+    parts = clipboard.lstrip().split("\n", 1)[0].split("\t")
+    if parts[0] == CLIPBOARD_HANDLE_TAG:
+        handle = parse_clipboard_handle(clipboard)
+        if handle is None:
+            return None, None, None
+        tag, name, filepath = handle
+        if not os.path.exists(filepath):
+            print("Smithy2D - Warning: The copied state '{}' doesn't exist anymore".format(filepath))
+            return None, None, None
+        return tag, name, iter_compressed_state_lines(filepath)
+
+    if len(parts) < 2:
+        return None, None, None
+    return parts[0], parts[1].strip(), clipboard.split("\n")
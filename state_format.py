@@ -0,0 +1,172 @@
+# Clipboard State Format
+# ---------------------------
+# the text written by serialize_scene/room/variant. one tab separated line per item, indented by depth:
+#   s   <scene>
+#   r   <room> <x> <y> <width> <height>
+#   v   <variant>
+#   o   <object state>
+#   mat <16 floats, column major>, bounds <min xyz> <max xyz>, parent <name>, obj_type <type>,
+#   obj_subtype <subtype>, c <component name> <is_global> <data, with "\@\@" for line breaks>
+# location, rotation_quaternion and scale are written too, but not read back.
+#
+# parse_state reads the lines in one pass into plain data (no bpy), dispatching on the first token:
+#   scene:   {"tag": "s", "name", "rooms": [room]}
+#   room:    {"tag": "r", "name", "location", "size", "variants": [variant]}
+#   variant: {"tag": "v", "name", "objects": [object]}
+#   object:  {"tag": "o", "name", "matrix_local", "bounds", "parent", "obj_type", "obj_subtype", "components"}
+# object fields that had no line are None. components are (name, is_global, data) tuples.
+# items without a parent item in the text (eg. a copied room) are returned as roots.
+# with keep_variant_lines the object states of variants aren't kept. the variant gets their raw
+# lines instead ("lines"), to be parsed once it's actually needed. they're still checked, so malformed
+# lines raise the same StateFormatError as without keep_variant_lines.
+#
+# the format_* functions write the lines from plain values, for utils.iter_*_state_chunks (which read them off bpy data).
+
+class StateFormatError(Exception):
+    pass
+
+# Formatting
+# ---------------------------
+def format_scene_line(name):
+    return "s\t{}\n".format(name)
+
+def format_room_line(name, location, size):
+    return "\tr\t{}\t{}\t{}\t{}\t{}\n".format(name, location[0], location[1], size[0], size[1])
+
+def format_variant_line(name):
+    return "\t\tv\t{}\n".format(name)
+
+# matrix_values: the 16 values of matrix_local, column major. components: (name, is_global, data)
+def format_object_state(name, location, rotation_quaternion, scale, matrix_values, obj_type, obj_subtype,
+        bounds_min, bounds_max, parent, components):
+    lines = [
+        "\t\t\to\t{}\n".format(name),
+        "\t\t\t\tlocation\t{}\t{}\t{}\n".format(*location),
+        "\t\t\t\trotation_quaternion\t{}\t{}\t{}\t{}\n".format(*rotation_quaternion),
+        "\t\t\t\tscale\t{}\t{}\t{}\n".format(*scale),
+        "\t\t\t\tmat\t{}\n".format("\t".join(str(v) for v in matrix_values)),
+        "\t\t\t\tobj_type\t{}\n".format(obj_type)]
+    if obj_subtype:
+        lines.append("\t\t\t\tobj_subtype\t{}\n".format(obj_subtype))
+    lines.append("\t\t\t\tbounds\t{}\t{}\t{}\t{}\t{}\t{}\n".format(*bounds_min, *bounds_max))
+    lines.append("\t\t\t\tparent\t{}\n".format(parent))
+    for c_name, is_global, data in components:
+        lines.append("\t\t\t\tc\t{}\t{}\t{}\n".format(c_name, is_global, data.replace("\n", "\\@\\@")))
+    return "".join(lines)
+
+class _ParseState:
+    def __init__(self):
+        self.roots = []
+        self.scene = None
+        self.room = None
+        self.variant = None
+        self.obj = None
+        self.line_number = 0
+        self.variant_lines = None   # raw lines of the current variant (keep_variant_lines)
+
+    def error(self, message):
+        return StateFormatError("Line {}: {}".format(self.line_number, message))
+
+    def get_obj(self, tag):
+        if self.obj is None:
+            raise self.error("'{}' outside of an object state".format(tag))
+        return self.obj
+
+def _parse_floats(state, tag, text, count):
+    try:
+        values = [float(v) for v in text.split("\t")]
+    except ValueError:
+        raise state.error("invalid number in '{}'".format(tag))
+    if len(values) != count:
+        raise state.error("'{}' needs {} values, got {}".format(tag, count, len(values)))
+    return values
+
+def _parse_scene(state, rest):
+    state.scene = {"tag": "s", "name": rest.split("\t", 1)[0], "rooms": []}
+    state.room = state.variant = state.obj = state.variant_lines = None
+    state.roots.append(state.scene)
+
+def _parse_room(state, rest):
+    parts = rest.split("\t", 1)
+    values = _parse_floats(state, "r", parts[1] if len(parts) > 1 else "", 4)
+    state.room = {"tag": "r", "name": parts[0], "location": values[0:2], "size": values[2:4], "variants": []}
+    state.variant = state.obj = state.variant_lines = None
+    (state.scene["rooms"] if state.scene else state.roots).append(state.room)
+
+def _parse_variant(state, rest):
+    state.variant = {"tag": "v", "name": rest.split("\t", 1)[0], "objects": []}
+    state.obj = None
+    (state.room["variants"] if state.room else state.roots).append(state.variant)
+
+def _parse_object(state, rest):
+    state.obj = {"tag": "o", "name": rest.split("\t", 1)[0], "matrix_local": None, "bounds": None,
+        "parent": None, "obj_type": None, "obj_subtype": None, "components": []}
+    if state.variant_lines is None:  # kept lines are only checked
+        (state.variant["objects"] if state.variant else state.roots).append(state.obj)
+
+def _parse_matrix(state, rest):
+    obj = state.get_obj("mat")
+    obj["matrix_local"] = _parse_floats(state, "mat", rest, 16)
+
+def _parse_bounds(state, rest):
+    obj = state.get_obj("bounds")
+    values = _parse_floats(state, "bounds", rest, 6)
+    obj["bounds"] = (values[0:3], values[3:6])
+
+def _parse_parent(state, rest):
+    state.get_obj("parent")["parent"] = rest
+
+def _parse_obj_type(state, rest):
+    state.get_obj("obj_type")["obj_type"] = rest
+
+def _parse_obj_subtype(state, rest):
+    state.get_obj("obj_subtype")["obj_subtype"] = rest.strip()
+
+def _parse_component(state, rest):
+    parts = rest.split("\t", 2)
+    if len(parts) != 3 or parts[1] not in ["True", "False"]:
+        raise state.error("invalid component '{}'".format(parts[0]))
+    state.get_obj("c")["components"].append((parts[0], parts[1] == "True", parts[2].replace("\\@\\@", "\n")))
+
+_tag_parsers = {
+    "s": _parse_scene,
+    "r": _parse_room,
+    "v": _parse_variant,
+    "o": _parse_object,
+    "mat": _parse_matrix,
+    "bounds": _parse_bounds,
+    "parent": _parse_parent,
+    "obj_type": _parse_obj_type,
+    "obj_subtype": _parse_obj_subtype,
+    "c": _parse_component,
+}
+
+_structure_tags = set(["s", "r", "v"])
+
+# lines: any iterable of lines (a split string, a file, a generator). unknown tags are skipped
+def parse_state(lines, keep_variant_lines=False):
+    state = _ParseState()
+    for line in lines:
+        state.line_number += 1
+        tag, sep, rest = line.lstrip().partition("\t")
+        if sep:
+            if state.variant_lines is not None and tag not in _structure_tags:
+                state.variant_lines.append(line.rstrip("\n"))
+            parser = _tag_parsers.get(tag)
+            if parser:
+                parser(state, rest.rstrip("\n"))
+                if tag == "v" and keep_variant_lines:
+                    state.variant_lines = state.variant["lines"] = []
+    return state.roots
+
+# (object name, component name, is_global) of each component line. only looks at the o and c lines
+def iter_component_usages(lines):
+    obj_name = None
+    for line in lines:
+        tag, sep, rest = line.lstrip().partition("\t")
+        if tag == "o" and sep:
+            obj_name = rest.split("\t", 1)[0].rstrip("\n")
+        elif tag == "c" and sep:
+            parts = rest.split("\t", 2)
+            if len(parts) == 3:
+                yield obj_name, parts[0], parts[1] == "True"
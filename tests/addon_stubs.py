@@ -0,0 +1,67 @@
+# Blender Stand-ins
+# ---------------------------
+# minimal bpy, mathutils and bmesh modules, so the addon modules that only reach blender through bpy.path,
+# bpy.app and bpy.data can be imported and tested without it. the addon folder is imported as the package
+# "lex2d" without running its __init__ (which registers everything with blender).
+# "//" resolves to the folder of bpy.data.filepath, which set_blend_dir points at a test's tmp folder.
+import os
+import sys
+import types
+import importlib
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "lex2d"
+
+class _Timers:
+    def __init__(self):
+        self.registered = set()
+
+    def is_registered(self, function):
+        return function in self.registered
+
+    def register(self, function, first_interval=0.0, persistent=False):
+        self.registered.add(function)
+
+    def unregister(self, function):
+        self.registered.discard(function)
+
+def _abspath(path):
+    if path.startswith("//"):
+        return os.path.dirname(sys.modules["bpy"].data.filepath) + "/" + path[2:]
+    return path
+
+class _StandIn:
+    pass
+
+def _install():
+    if PACKAGE_NAME in sys.modules:
+        return
+    bpy = types.ModuleType("bpy")
+    bpy.path = types.SimpleNamespace(abspath=_abspath, relpath=lambda path: path)
+    bpy.app = types.SimpleNamespace(version=(2, 90, 0), background=True, timers=_Timers(),
+        handlers=types.SimpleNamespace(persistent=lambda function: function))
+    bpy.data = types.SimpleNamespace(filepath="")
+    bpy.context = types.SimpleNamespace(scene=None)
+    bpy.types = types.SimpleNamespace(Operator=_StandIn, PropertyGroup=_StandIn, Panel=_StandIn, UIList=_StandIn, Menu=_StandIn)
+    bpy.props = types.SimpleNamespace(**dict((name, lambda *args, **kwargs: None) for name in ["StringProperty", "BoolProperty",
+        "IntProperty", "FloatProperty", "FloatVectorProperty", "IntVectorProperty", "CollectionProperty", "PointerProperty", "EnumProperty"]))
+    sys.modules["bpy"] = bpy
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Vector = mathutils.Matrix = mathutils.Quaternion = list
+    sys.modules["mathutils"] = mathutils
+    sys.modules["bmesh"] = types.ModuleType("bmesh")
+
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [ADDON_DIR]
+    package.bl_info = {"version": (0, 0, 0)}
+    sys.modules[PACKAGE_NAME] = package
+
+# imports lex2d.<module_name>, with the stand-ins installed first
+def import_addon_module(module_name):
+    _install()
+    return importlib.import_module("{}.{}".format(PACKAGE_NAME, module_name))
+
+def set_blend_dir(blend_dir):
+    _install()
+    sys.modules["bpy"].data.filepath = os.path.join(str(blend_dir), "test.blend")
@@ -0,0 +1,109 @@
+# asset_db.py runs with the blender stand-ins of addon_stubs.py, on an asset folder in the test's tmp folder
+import os
+import pytest
+import addon_stubs
+
+# scripts/<scene>/<room>/states/<variant>.lua, with the files around them that aren't scenes, rooms or variants
+FIXTURE_FILES = [
+    "scripts/core/components/Transform.lua",
+    "scripts/readme.lua",
+    "scripts/.hidden/states.lua",
+    "scripts/S/main.lua",
+    "scripts/S/helpers.lua",
+    "scripts/S/.definition.lua",
+    "scripts/S/R/helpers.lua",
+    "scripts/S/R/components/C.lua",
+    "scripts/S/R/states/V.lua",
+    "scripts/S/R/states/W.lua",
+    "scripts/S/R/states/notes.txt",
+    "scripts/S/R2/states/V.lua",
+]
+FIXTURE_DIRS = ["scripts/S/Empty", "scripts/T"]
+
+@pytest.fixture
+def asset_db(tmp_path):
+    addon_stubs.set_blend_dir(tmp_path)
+    module = addon_stubs.import_addon_module("asset_db")
+    utils = addon_stubs.import_addon_module("utils")
+    for assetpath in FIXTURE_FILES:
+        os.makedirs(os.path.dirname(utils.asset_abspath(assetpath)), exist_ok=True)
+        with open(utils.asset_abspath(assetpath), "w") as f:
+            f.write("return {}\n")
+    for assetpath in FIXTURE_DIRS:
+        os.makedirs(utils.asset_abspath(assetpath), exist_ok=True)
+    yield module
+    module.close()
+
+def sorted_tree(scene_tree):
+    return dict((scene, dict((room, sorted(variants)) for room, variants in rooms.items())) for scene, rooms in scene_tree.items())
+
+def kinds(asset_db):
+    return dict(asset_db.connect().execute("SELECT assetpath, kind FROM assets"))
+
+def test_scene_tree_matches_the_disk(asset_db):
+    utils = addon_stubs.import_addon_module("utils")
+    asset_db.sync({})
+    assert sorted_tree(asset_db.get_scene_tree()) == sorted_tree(utils.get_scene_tree_on_disk())
+    assert asset_db.get_scene_tree() == {"S": {"Empty": [], "R": ["V", "W"], "R2": ["V"]}, "T": {}}
+
+def test_loose_scripts_are_not_scenes_or_rooms(asset_db):
+    asset_db.sync({})
+    assert kinds(asset_db) == {
+        "scripts/S": "scene", "scripts/T": "scene",
+        "scripts/S/R": "room", "scripts/S/R2": "room", "scripts/S/Empty": "room",
+        "scripts/S/R/states/V.lua": "variant", "scripts/S/R/states/W.lua": "variant", "scripts/S/R2/states/V.lua": "variant",
+        "scripts/core/components/Transform.lua": "component", "scripts/S/R/components/C.lua": "component",
+    }
+
+def test_sync_reports_changes(asset_db):
+    utils = addon_stubs.import_addon_module("utils")
+    changed, removed = asset_db.sync({"g0": "scripts/S"})
+    assert "scripts/S/R/states/V.lua" in changed and removed == []
+    assert asset_db.sync({"g0": "scripts/S"}) == ([], [])
+
+    with open(utils.asset_abspath("scripts/S/R/states/V.lua"), "w") as f:
+        f.write("return {x = 1}\n")
+    os.remove(utils.asset_abspath("scripts/S/R/states/W.lua"))
+    assert asset_db.sync({"g0": "scripts/S"}) == (["scripts/S/R/states/V.lua"], ["scripts/S/R/states/W.lua"])
+    assert asset_db.connect().execute("SELECT guid FROM assets WHERE assetpath = 'scripts/S'").fetchone() == ("g0",)
+
+def test_rename_and_remove_subtrees(asset_db):
+    asset_db.sync({})
+    asset_db.rename_subtree("scripts/S/R", "scripts/S/Q")
+    asset_db.remove_subtree("scripts/S/R2")
+    assert asset_db.get_scene_tree() == {"S": {"Empty": [], "Q": ["V", "W"]}, "T": {}}
+
+def test_sync_of_a_directory_only_touches_its_subtree(asset_db):
+    utils = addon_stubs.import_addon_module("utils")
+    asset_db.sync({})
+    os.remove(utils.asset_abspath("scripts/S/R2/states/V.lua"))
+    os.remove(utils.asset_abspath("scripts/core/components/Transform.lua"))
+    assert asset_db.sync({}, dir_assetpath="scripts/S/R2") == ([], ["scripts/S/R2/states/V.lua"])
+    assert "scripts/core/components/Transform.lua" in kinds(asset_db)
+
+def test_file_stats(asset_db):
+    utils = addon_stubs.import_addon_module("utils")
+    asset_db.sync({})
+    stats = asset_db.get_file_stats("scripts/S/R")
+    assert sorted(stats) == ["scripts/S/R/components/C.lua", "scripts/S/R/states/V.lua", "scripts/S/R/states/W.lua"]
+    stat = os.stat(utils.asset_abspath("scripts/S/R/states/V.lua"))
+    assert stats["scripts/S/R/states/V.lua"] == (stat.st_size, stat.st_mtime_ns)
+
+def test_remove_subtree_returns_the_guids_inside(asset_db):
+    asset_db.sync({"g0": "scripts/S", "g1": "scripts/S/R", "g2": "scripts/S/R/states/V.lua", "g3": "scripts/S/R2"})
+    assert sorted(asset_db.remove_subtree("scripts/S/R")) == ["g1", "g2"]
+    assert asset_db.remove_subtree("scripts/S/R") == []
+
+def test_export_preflight_through_the_registry(asset_db):
+    utils = addon_stubs.import_addon_module("utils")
+    export_preflight = addon_stubs.import_addon_module("export_preflight")
+    asset_db.sync({})
+    with open(utils.asset_abspath("scripts/S/R/states/X.lua"), "w") as f:
+        f.write("return {}\n")    # added since the last full sync
+
+    preflight = export_preflight.ExportPreflight(use_registry=True)
+    on_disk = export_preflight.ExportPreflight()
+    for assetpath in ["scripts/S/R/states/V.lua", "scripts/S/R/states/X.lua", "scripts/S/R/states/Y.lua",
+            "scripts/S/R/components/C.lua", "scripts/core/components/Transform.lua", "scripts/core/components/Missing.lua"]:
+        assert preflight.get_stat(assetpath) == on_disk.get_stat(assetpath)
+    assert "scripts/S/R/states/X.lua" in kinds(asset_db)
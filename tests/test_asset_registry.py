@@ -0,0 +1,131 @@
+# asset_registry.py doesn't import bpy, so it's loaded by path like state_format.py
+import os
+import random
+import importlib.util
+
+def load_asset_registry():
+    module_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "asset_registry.py")
+    spec = importlib.util.spec_from_file_location("asset_registry", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+asset_registry = load_asset_registry()
+
+# the assetpaths the trie leads to, and whether it has nodes that lead to none (left over after a removal)
+def walk_trie(registry):
+    assetpaths = []
+    dead_nodes = 0
+    pending = [registry.root]
+    while pending:
+        node = pending.pop()
+        if node.assetpath is not None:
+            assetpaths.append(node.assetpath)
+        elif not node.children and node is not registry.root:
+            dead_nodes += 1
+        pending.extend(node.children.values())
+    return sorted(assetpaths), dead_nodes
+
+def assert_consistent(registry, expected):
+    assert dict(registry.items()) == expected
+    assert walk_trie(registry) == (sorted(expected), 0)
+
+def make_registry(assetpaths):
+    registry = asset_registry.AssetRegistry()
+    for i, assetpath in enumerate(assetpaths):
+        registry.set(assetpath, i)
+    return registry
+
+# Keys
+# ---------------------------
+def test_keys_are_normalized():
+    registry = make_registry(["scripts/S/", "scripts//S/R"])
+    assert sorted(registry) == ["scripts/S", "scripts/S/R"]
+    assert "scripts/S" in registry and "/scripts/S//" in registry
+    assert registry["scripts/S/R/"] == 1
+    assert registry.get("scripts//S") == 0
+    assert registry.pop("scripts/S/R/") == 1
+    assert_consistent(registry, {"scripts/S": 0})
+
+def test_set_replaces_the_value():
+    registry = make_registry(["scripts/S", "scripts/S/"])
+    assert_consistent(registry, {"scripts/S": 1})
+
+def test_pop_keeps_the_assetpaths_inside():
+    registry = make_registry(["scripts/S", "scripts/S/R"])
+    assert registry.pop("scripts/S") == 0
+    assert registry.pop("scripts/S", "missing") == "missing"
+    assert_consistent(registry, {"scripts/S/R": 1})
+
+# Subtrees
+# ---------------------------
+def test_subtrees_match_whole_segments():
+    registry = make_registry(["scripts/S/Room1", "scripts/S/Room1/V.lua", "scripts/S/Room10", "scripts/S/Room10/V.lua"])
+    assert sorted(assetpath for assetpath, _ in registry.iter_subtree("scripts/S/Room1")) == ["scripts/S/Room1", "scripts/S/Room1/V.lua"]
+    registry.remove_subtree("scripts/S/Room1/")
+    assert_consistent(registry, {"scripts/S/Room10": 2, "scripts/S/Room10/V.lua": 3})
+
+def test_remove_subtree_without_a_value_at_the_root():
+    registry = make_registry(["scripts/S/R/a.lua", "scripts/S/R/b.lua", "scripts/T/c.lua"])
+    removed = registry.remove_subtree("scripts/S")
+    assert sorted(removed) == [("scripts/S/R/a.lua", 0), ("scripts/S/R/b.lua", 1)]
+    assert registry.remove_subtree("scripts/S") == []
+    assert_consistent(registry, {"scripts/T/c.lua": 2})
+
+def test_remove_everything():
+    registry = make_registry(["scripts/S", "scripts/S/R"])
+    registry.remove_subtree("")
+    assert_consistent(registry, {})
+
+def test_move_subtree():
+    registry = make_registry(["scripts/S", "scripts/S/R", "scripts/S/R/V.lua", "scripts/S2/R"])
+    moved = registry.move_subtree("scripts/S/", "scripts//T")
+    assert sorted(moved) == [("scripts/S", "scripts/T", 0), ("scripts/S/R", "scripts/T/R", 1), ("scripts/S/R/V.lua", "scripts/T/R/V.lua", 2)]
+    assert_consistent(registry, {"scripts/T": 0, "scripts/T/R": 1, "scripts/T/R/V.lua": 2, "scripts/S2/R": 3})
+
+def test_move_into_an_existing_directory_replaces_its_values():
+    registry = make_registry(["scripts/S/R", "scripts/T/R", "scripts/T/Q"])
+    registry.move_subtree("scripts/S", "scripts/T")
+    assert_consistent(registry, {"scripts/T/R": 0, "scripts/T/Q": 2})
+
+# Random Operations
+# ---------------------------
+# the registry against a dict doing the same operations by string prefix
+def test_random_operations_match_a_dict():
+    rng = random.Random(2)
+    segments = ["scripts", "S", "S1", "S10", "R", "V.lua"]
+
+    def random_assetpath():
+        return "/".join(rng.choice(segments) for _ in range(rng.randint(1, 4))) + rng.choice(["", "/"])
+
+    def inside(assetpath, dir_assetpath):
+        return assetpath == dir_assetpath or assetpath.startswith(dir_assetpath + "/")
+
+    registry = asset_registry.AssetRegistry()
+    expected = {}
+    for i in range(3000):
+        operation = rng.random()
+        assetpath = random_assetpath()
+        key = asset_registry.normalize_assetpath(assetpath)
+        if operation < 0.5:
+            registry.set(assetpath, i)
+            expected[key] = i
+        elif operation < 0.7:
+            assert registry.pop(assetpath) == expected.pop(key, None)
+        elif operation < 0.85:
+            removed = dict((k, v) for k, v in expected.items() if inside(k, key))
+            assert dict(registry.remove_subtree(assetpath)) == removed
+            for k in removed:
+                del expected[k]
+        else:
+            new_key = asset_registry.normalize_assetpath(random_assetpath())
+            if inside(new_key, key):
+                continue    # moving a directory into itself isn't something a rename does
+            moved = dict((k, v) for k, v in expected.items() if inside(k, key))
+            for k in moved:
+                del expected[k]
+            for k, v in moved.items():
+                expected["/".join(filter(None, [new_key, k[len(key):].lstrip("/")]))] = v
+            registry.move_subtree(assetpath, new_key)
+        assert dict(registry.items()) == expected
+    assert_consistent(registry, expected)
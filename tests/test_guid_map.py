@@ -0,0 +1,107 @@
+# guid_map.py runs with the blender stand-ins of addon_stubs.py (bpy.app.background is set, so every change is
+# written right away instead of by a timer)
+import os
+import hashlib
+import pytest
+import addon_stubs
+
+@pytest.fixture
+def guid_map(tmp_path):
+    addon_stubs.set_blend_dir(tmp_path)
+    module = addon_stubs.import_addon_module("guid_map")
+    del module._pending_records[:]
+    module._loaded_mapfile = None
+    return module
+
+def read_journal(guid_map):
+    with open(guid_map.get_journal_filepath(), "rb") as f:
+        return f.read().decode("utf-8")
+
+def write_file(filepath, text):
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "wb") as f:
+        f.write(text.encode("utf-8"))
+
+# Journal
+# ---------------------------
+def test_changes_survive_a_reload(guid_map):
+    guid_map.bind_many([("g0", "scripts/S"), ("g1", "scripts/S/R"), ("g2", "scripts/S/R/V.lua")])
+    guid_map.unbind(["g2"])
+    guid_map.rebind_path("scripts/S", "scripts/T")
+    expected = {"g0": "scripts/T", "g1": "scripts/T/R"}
+    assert guid_map.get_maps()[0] == expected
+    guid_map.load(force=True)
+    assert guid_map.get_maps()[0] == expected
+    assert not os.path.exists(guid_map.get_guid_mapfile())   # only journaled so far
+
+def test_torn_tail_is_skipped_and_cut_off(guid_map):
+    guid_map.bind("g0", "scripts/S")
+    # a crash while writing "b\tg1\tscripts/S/Room1\n" left a fragment that is a valid record on its own
+    with open(guid_map.get_journal_filepath(), "a", encoding="utf-8") as f:
+        f.write("b\tg1\tscripts/S/R")
+    guid_map.load(force=True)
+    assert guid_map.get_maps()[0] == {"g0": "scripts/S"}
+
+    guid_map.bind("g2", "scripts/S/Room2")
+    assert "scripts/S/R\n" not in read_journal(guid_map)
+    guid_map.load(force=True)
+    assert guid_map.get_maps()[0] == {"g0": "scripts/S", "g2": "scripts/S/Room2"}
+
+def test_torn_tail_longer_than_a_read_block(guid_map):
+    guid_map.bind("g0", "scripts/S")
+    with open(guid_map.get_journal_filepath(), "a", encoding="utf-8") as f:
+        f.write("b\tg1\tscripts/" + "x" * 10000)
+    guid_map.load(force=True)
+    guid_map.bind("g2", "scripts/T")
+    assert read_journal(guid_map).endswith("b\tg0\tscripts/S\nb\tg2\tscripts/T\n")
+
+def test_journal_of_another_snapshot_is_ignored(guid_map):
+    snapshot = "g0\tscripts/S\n"
+    write_file(guid_map.get_guid_mapfile(), snapshot)
+    write_file(guid_map.get_journal_filepath(), "g\t{}\nb\tg1\tscripts/T\n".format(hashlib.sha1(b"an older snapshot").hexdigest()))
+    assert guid_map.get_maps()[0] == {"g0": "scripts/S"}
+
+    # the next change starts a journal for the current snapshot
+    guid_map.bind("g2", "scripts/U")
+    assert read_journal(guid_map) == "g\t{}\nb\tg2\tscripts/U\n".format(hashlib.sha1(snapshot.encode("utf-8")).hexdigest())
+    guid_map.load(force=True)
+    assert guid_map.get_maps()[0] == {"g0": "scripts/S", "g2": "scripts/U"}
+
+def test_files_changed_on_disk_are_reread(guid_map):
+    guid_map.bind("g0", "scripts/S")
+    write_file(guid_map.get_guid_mapfile(), "g1\tscripts/T\n")     # eg. a git checkout, the journal no longer matches
+    assert guid_map.get_maps()[0] == {"g1": "scripts/T"}
+
+# Compaction
+# ---------------------------
+def test_compaction_at_the_threshold(guid_map, monkeypatch):
+    monkeypatch.setattr(guid_map, "JOURNAL_COMPACT_THRESHOLD", 3)
+    guid_map.bind("g0", "scripts/S")
+    guid_map.bind("g1", "scripts/T")
+    assert os.path.exists(guid_map.get_journal_filepath())
+    guid_map.bind("g2", "scripts/U")
+    assert not os.path.exists(guid_map.get_journal_filepath())
+    expected = {"g0": "scripts/S", "g1": "scripts/T", "g2": "scripts/U"}
+    guid_map.load(force=True)
+    assert guid_map.get_maps()[0] == expected
+
+    # the next record starts a journal on top of the new snapshot
+    guid_map.unbind(["g1"])
+    del expected["g1"]
+    guid_map.load(force=True)
+    assert guid_map.get_maps()[0] == expected
+
+def test_compact_journal_folds_the_journal_into_the_snapshot(guid_map):
+    guid_map.bind_many([("g0", "scripts/S"), ("g1", "scripts/S/R")])
+    guid_map.rebind_path("scripts/S", "scripts/T")
+    guid_map.compact_journal()
+    assert not os.path.exists(guid_map.get_journal_filepath())
+    with open(guid_map.get_guid_mapfile(), encoding="utf-8") as f:
+        assert sorted(f.read().splitlines()) == ["g0\tscripts/T", "g1\tscripts/T/R"]
+
+def test_compact_journal_without_changes_keeps_the_files(guid_map):
+    write_file(guid_map.get_guid_mapfile(), "g0\tscripts/S\n")
+    assert guid_map.get_guid("scripts/S") == "g0"
+    stats = guid_map._get_stats(guid_map.get_guid_mapfile())
+    guid_map.compact_journal()
+    assert guid_map._get_stats(guid_map.get_guid_mapfile()) == stats
@@ -0,0 +1,186 @@
+# state_format.py doesn't import bpy, so it's loaded by path without the addon package (whose __init__ needs blender).
+# run from the addon folder: python -m pytest tests
+import os
+import importlib.util
+import pytest
+
+def load_state_format():
+    module_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "state_format.py")
+    spec = importlib.util.spec_from_file_location("state_format", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+state_format = load_state_format()
+
+# Serializing
+# ---------------------------
+# writes parsed nodes with the formatter utils.iter_*_state_chunks use. location, rotation_quaternion and scale
+# aren't read back, so the objects get fixed ones
+def format_object(obj, location=(1.0, 2.0, 3.0), rotation_quaternion=(1.0, 0.0, 0.0, 0.0), scale=(1.0, 1.0, 1.0)):
+    return state_format.format_object_state(obj["name"], location, rotation_quaternion, scale, obj["matrix_local"],
+        obj["obj_type"], obj["obj_subtype"], obj["bounds"][0], obj["bounds"][1], obj["parent"], obj["components"])
+
+def iter_variant_lines(variant):
+    yield state_format.format_variant_line(variant["name"])
+    for obj in variant["objects"]:
+        yield format_object(obj)
+
+def iter_room_lines(room):
+    yield state_format.format_room_line(room["name"], room["location"], room["size"])
+    for variant in room["variants"]:
+        yield from iter_variant_lines(variant)
+
+def serialize_scene(scene):
+    return state_format.format_scene_line(scene["name"]) + "".join(line for room in scene["rooms"] for line in iter_room_lines(room))
+
+def make_object(name, parent="", components=()):
+    return {"tag": "o", "name": name, "matrix_local": [float(i) for i in range(16)], "bounds": ([-0.5, -0.5, 0.0], [0.5, 0.5, 0.0]),
+        "parent": parent, "obj_type": "MESH", "obj_subtype": None, "components": list(components)}
+
+def make_scene():
+    objects = [
+        make_object("obj0", components=[("Comp0", True, "speed,float,1.5\nlabel,string,obj0")]),
+        make_object("obj1", parent="obj0", components=[("Comp0", True, "speed,float,2.0"), ("Comp1", False, "")]),
+        dict(make_object("light"), obj_type="LIGHT", obj_subtype="POINT"),
+    ]
+    return {"tag": "s", "name": "Scene0", "rooms": [
+        {"tag": "r", "name": "Room0", "location": [0.0, 0.5], "size": [0.25, 1.0], "variants": [
+            {"tag": "v", "name": "Variant0", "objects": objects},
+            {"tag": "v", "name": "Empty", "objects": []}]},
+        {"tag": "r", "name": "Room1", "location": [0.25, 0.0], "size": [0.25, 1.0], "variants": []}]}
+
+def parse(text, **kwargs):
+    return state_format.parse_state(text.split("\n"), **kwargs)
+
+# Round Trips
+# ---------------------------
+def test_round_trip():
+    scene = make_scene()
+    text = serialize_scene(scene)
+    assert parse(text) == [scene]
+    assert serialize_scene(parse(text)[0]) == text
+
+def test_round_trip_of_a_file():
+    scene = make_scene()
+    lines = serialize_scene(scene).splitlines(keepends=True)   # like iterating a file: the lines keep their "\n"
+    assert state_format.parse_state(iter(lines)) == [scene]
+
+def test_component_data_line_breaks():
+    obj = make_object("obj", components=[("Comp", False, "a,float,1\nb,string,two words\n")])
+    text = format_object(obj)
+    assert text.count("\n") == 9
+    assert parse(text)[0]["components"] == [("Comp", False, "a,float,1\nb,string,two words\n")]
+
+def test_location_rotation_and_scale_are_skipped():
+    obj = make_object("obj")
+    text = format_object(obj, location=(4.0, 5.0, 6.0), rotation_quaternion=(0.0, 1.0, 0.0, 0.0), scale=(2.0, 2.0, 2.0))
+    assert "\t\t\t\tlocation\t4.0\t5.0\t6.0\n" in text
+    assert parse(text) == [obj]
+
+def test_object_subtype_line_is_optional():
+    obj = make_object("obj")
+    assert "obj_subtype" not in format_object(obj)
+    light = dict(obj, obj_type="LIGHT", obj_subtype="POINT")
+    assert "\t\t\t\tobj_subtype\tPOINT\n" in format_object(light)
+    assert parse(format_object(light)) == [light]
+
+def test_copied_room_and_variant_are_roots():
+    scene = make_scene()
+    room_text = "".join(iter_room_lines(scene["rooms"][0]))
+    assert parse(room_text) == [scene["rooms"][0]]
+    variant_text = "".join(iter_variant_lines(scene["rooms"][0]["variants"][0]))
+    assert parse(variant_text) == [scene["rooms"][0]["variants"][0]]
+
+def test_keep_variant_lines():
+    scene = make_scene()
+    text = serialize_scene(scene)
+    variant = parse(text, keep_variant_lines=True)[0]["rooms"][0]["variants"][0]
+    assert variant["objects"] == []
+    assert "".join(line + "\n" for line in variant["lines"]) == "".join(iter_variant_lines(scene["rooms"][0]["variants"][0])).split("\n", 1)[1]
+    # the kept lines parse to the same object states later
+    assert state_format.parse_state(variant["lines"]) == scene["rooms"][0]["variants"][0]["objects"]
+
+def test_component_usages():
+    text = serialize_scene(make_scene())
+    assert list(state_format.iter_component_usages(text.split("\n"))) == [
+        ("obj0", "Comp0", True), ("obj1", "Comp0", True), ("obj1", "Comp1", False)]
+
+# Empty States
+# ---------------------------
+def test_empty_text():
+    assert parse("") == []
+    assert state_format.parse_state([]) == []
+
+def test_empty_scene():
+    scene = {"tag": "s", "name": "Scene0", "rooms": []}
+    assert parse(serialize_scene(scene)) == [scene]
+
+def test_object_without_fields():
+    obj = parse("\t\t\to\tobj\n")[0]
+    assert obj == {"tag": "o", "name": "obj", "matrix_local": None, "bounds": None, "parent": None,
+        "obj_type": None, "obj_subtype": None, "components": []}
+
+def test_blank_and_unknown_lines_are_skipped():
+    scene = make_scene()
+    lines = serialize_scene(scene).split("\n")
+    lines[2:2] = ["", "   ", "future_tag\tvalue", "no tab here"]
+    assert state_format.parse_state(lines) == [scene]
+
+# Malformed Lines
+# ---------------------------
+@pytest.mark.parametrize("text, message", [
+    ("o\tobj\nmat\t1\t2\t3", "Line 2: 'mat' needs 16 values, got 3"),
+    ("o\tobj\nbounds\t0\t0\t0\t1\tx\t1", "Line 2: invalid number in 'bounds'"),
+    ("r\tRoom\t0\t0\t1", "Line 1: 'r' needs 4 values, got 3"),
+    ("r\tRoom", "Line 1: invalid number in 'r'"),
+    ("mat\t" + "\t".join(["1"] * 16), "Line 1: 'mat' outside of an object state"),
+    ("s\tScene\nparent\tobj0", "Line 2: 'parent' outside of an object state"),
+    ("o\tobj\nc\tComp\tyes\tdata", "Line 2: invalid component 'Comp'"),
+    ("o\tobj\nc\tComp\tTrue", "Line 2: invalid component 'Comp'"),
+])
+def test_malformed_lines(text, message):
+    with pytest.raises(state_format.StateFormatError) as error:
+        parse(text)
+    assert str(error.value) == message
+
+def test_kept_variant_lines_are_checked():
+    text = serialize_scene(make_scene())
+    torn = text[:text.index("\t\t\t\tbounds") + len("\t\t\t\tbounds\t-0.5\t-0.")]
+    with pytest.raises(state_format.StateFormatError, match="'bounds' needs 6 values"):
+        parse(torn, keep_variant_lines=True)
+    with pytest.raises(state_format.StateFormatError, match="Line 3: 'parent' outside of an object state"):
+        parse("\tr\tRoom\t0\t0\t1\t1\n\t\tv\tV\n\t\t\t\tparent\tx\n", keep_variant_lines=True)
+
+def test_object_state_after_a_new_room_is_outside_of_an_object():
+    text = "s\tScene\n\tr\tRoom\t0\t0\t1\t1\n\t\tv\tV\n\t\t\to\tobj\n\tr\tRoom2\t0\t0\t1\t1\n\t\t\t\tparent\tx\n"
+    with pytest.raises(state_format.StateFormatError, match="Line 6"):
+        parse(text)
+
+# Torn Input
+# ---------------------------
+# text cut off anywhere (eg. a partial clipboard or file write) either parses to a prefix of the state or
+# raises a StateFormatError, never anything else
+def test_torn_input():
+    text = serialize_scene(make_scene())
+    for end in range(len(text) + 1):
+        try:
+            nodes = parse(text[:end])
+        except state_format.StateFormatError:
+            continue
+        assert len(nodes) <= 1
+        if end == len(text):
+            assert nodes == [make_scene()]
+
+def test_torn_number_line():
+    text = serialize_scene(make_scene())
+    torn = text[:text.index("\t\t\t\tbounds") + len("\t\t\t\tbounds\t-0.5\t-0.")]
+    with pytest.raises(state_format.StateFormatError, match="'bounds' needs 6 values"):
+        parse(torn)
+
+def test_torn_after_a_complete_line():
+    scene = make_scene()
+    text = serialize_scene(scene)
+    torn = text[:text.index("\t\t\to\tobj1")]
+    variant = parse(torn)[0]["rooms"][0]["variants"][0]
+    assert variant["objects"] == [scene["rooms"][0]["variants"][0]["objects"][0]]
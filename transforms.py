@@ -0,0 +1,122 @@
+from mathutils import Vector
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Transform inputs
+# ---------------------------
+# the exported core/Transform component of an object state (positions and sizes in screen pixels, y down)
+
+def convert_to_screen_position(blender_pos):
+    return [(blender_pos[0] * 120), -(blender_pos[1] * 120), blender_pos[2]]
+
+def convert_to_screen_size(blender_size):
+    return [blender_size[0] * 120, blender_size[1] * 120, blender_size[2]]
+
+def obj_state_transform_inputs(obj_state):
+    loc, rot, scale = obj_state.matrix_local.decompose()
+    mesh_size =  obj_state.bounds.get_dimensions()
+    pivotpos_from_topleft = Vector(obj_state.topleft) * -1
+    pivotpos_from_topleft_normalized = [a / b if b != 0 else a for a,b in zip(pivotpos_from_topleft, mesh_size)]
+    pivotpos_from_topleft_normalized[1] *= -1  # invert y because topleft coordinate system
+    return [
+        ('position', 'vec3', [round(v, 3) for v in convert_to_screen_position(loc)]),
+        ('pivot', 'vec3', [round(v, 3) for v in pivotpos_from_topleft_normalized]),
+        ('rotation_quat', 'vec4', [round(v, 3) for v in rot]),
+        ('size', 'vec4', [round(v, 3) for v in convert_to_screen_size(mesh_size)]),
+        ('scale', 'vec3', [round(v, 3) for v in scale])]
+
+# Batched transform inputs
+# ---------------------------
+# reads the transforms of all object states of a variant with foreach_get and computes their inputs
+# in one numpy pass. the output is identical to obj_state_transform_inputs:
+#  - position, pivot and size are the same double precision math on the same single precision values
+#  - blender decomposes the matrix in single precision, so rotation and scale can differ from ours in the
+#    last bits. objects with such a value close to a rounding boundary, mirrored objects and rotations
+#    near 180 degrees are decomposed by obj_state_transform_inputs instead
+ROUNDING_TOLERANCE = 2e-6
+MIN_QUAT_TRACE = .01
+
+# same as round(v, 3) for each value
+def _round3(values):
+    scaled = values * 1000
+    rounded = np.rint(scaled) / 1000
+    # np.rint rounds the scaled double, round() the exact value. they only differ right at a tie
+    near_tie = np.abs(scaled - np.floor(scaled) - .5) <= 1e-9 * np.maximum(1, np.abs(scaled))
+    for idx in zip(*np.nonzero(near_tie)):
+        rounded[idx] = round(float(values[idx]), 3)
+    return rounded
+
+def _near_rounding_boundary(values):
+    scaled = values * 1000
+    distance = np.abs(scaled - np.floor(scaled) - .5) / 1000
+    return (distance <= ROUNDING_TOLERANCE * np.maximum(1, np.abs(values))).any(axis=1)
+
+class VariantTransforms:
+    def __init__(self, object_states):
+        self.object_states = object_states
+        self.count = len(object_states)
+        self.inputs = None
+        if np is None:
+            return
+
+        self.matrices = np.empty(self.count * 16, dtype=np.float32)
+        object_states.foreach_get("matrix_local", self.matrices)
+        self.matrices = self.matrices.reshape(self.count, 4, 4)   # [object][column][row]
+        self.topleft = np.empty(self.count * 3, dtype=np.float32)
+        object_states.foreach_get("topleft", self.topleft)
+        self.topleft = self.topleft.reshape(self.count, 3)
+        # bounds is a pointer property, foreach_get can't reach into it
+        self.box_min = np.array([s.bounds.box_min[:] for s in object_states], dtype=np.float32).reshape(self.count, 3)
+        self.box_max = np.array([s.bounds.box_max[:] for s in object_states], dtype=np.float32).reshape(self.count, 3)
+
+    # everything the transform inputs of an object state are computed from
+    def get_raw_values(self, idx):
+        if np is None:
+            obj_state = self.object_states[idx]
+            mat = obj_state.matrix_local
+            return (tuple(v for row in mat for v in row), tuple(obj_state.bounds.box_min),
+                tuple(obj_state.bounds.box_max), tuple(obj_state.topleft))
+        return self.matrices[idx].tobytes() + self.box_min[idx].tobytes() + self.box_max[idx].tobytes() + self.topleft[idx].tobytes()
+
+    def get_inputs(self, idx):
+        if np is None:
+            return obj_state_transform_inputs(self.object_states[idx])
+        if self.inputs is None:
+            self.inputs = self.compute_inputs()
+        return self.inputs[idx] or obj_state_transform_inputs(self.object_states[idx])
+
+    # returns a list with the inputs of each object state (None for the ones that need the exact decompose)
+    def compute_inputs(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mesh_size = (self.box_max - self.box_min).astype(np.float64)    # single precision like mathutils
+            pivot_from_topleft = (-self.topleft).astype(np.float64)
+            pivot = np.where(mesh_size != 0, pivot_from_topleft / mesh_size, pivot_from_topleft)
+            pivot[:, 1] *= -1   # invert y because topleft coordinate system
+
+            loc = self.matrices[:, 3, 0:3].astype(np.float64)
+            position = np.stack([loc[:, 0] * 120, -(loc[:, 1] * 120), loc[:, 2]], axis=1)
+            size = np.stack([mesh_size[:, 0] * 120, mesh_size[:, 1] * 120, mesh_size[:, 2]], axis=1)
+
+            # decompose: scale is the length of each basis column, the rotation comes from the normalized basis
+            basis = self.matrices[:, 0:3, 0:3].astype(np.float64)
+            scale = np.sqrt((basis * basis).sum(axis=2))
+            n = basis / scale[:, :, np.newaxis]
+            trace = .25 * (1 + n[:, 0, 0] + n[:, 1, 1] + n[:, 2, 2])
+            w = np.sqrt(np.maximum(trace, 0))
+            inv = 1 / (4 * w)
+            quat = np.stack([w, (n[:, 1, 2] - n[:, 2, 1]) * inv, (n[:, 2, 0] - n[:, 0, 2]) * inv, (n[:, 0, 1] - n[:, 1, 0]) * inv], axis=1)
+            quat /= np.sqrt((quat * quat).sum(axis=1))[:, np.newaxis]
+
+            exact = (np.linalg.det(basis) > 0) & (trace > MIN_QUAT_TRACE) & np.isfinite(quat).all(axis=1)
+            exact &= ~_near_rounding_boundary(quat) & ~_near_rounding_boundary(scale)
+
+        position, pivot, quat, size, scale = [_round3(values).tolist() for values in [position, pivot, quat, size, scale]]
+        return [[
+            ('position', 'vec3', position[i]),
+            ('pivot', 'vec3', pivot[i]),
+            ('rotation_quat', 'vec4', quat[i]),
+            ('size', 'vec4', size[i]),
+            ('scale', 'vec3', scale[i])] if exact[i] else None for i in range(self.count)]
@@ -4,8 +4,27 @@ import shutil
 import uuid
 import os
 import bmesh
+import hashlib
+import array
 from mathutils import Vector, Matrix, Quaternion
 import time
+import importlib.util
+
+# the lua renderer lives outside the package so the export workers can import it without bpy. the addon loads it
+# by path, only the workers' sys.path gets the workers folder (see exporter.export_scene_definitions_parallel)
+LUA_RENDER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workers")
+LUA_RENDER_MODULE_NAME = "smithy2d_lua_render"
+
+def load_lua_render_module():
+    spec = importlib.util.spec_from_file_location(LUA_RENDER_MODULE_NAME, os.path.join(LUA_RENDER_DIR, LUA_RENDER_MODULE_NAME + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+lua_render = load_lua_render_module()
+global_component_assetpath = lua_render.global_component_assetpath
+get_component_from_asset = lua_render.get_component_from_asset
+component_idpath = lua_render.component_idpath
 
 def get_addon_version():
     version = sys.modules["lex2d"].bl_info['version']
@@ -51,6 +70,58 @@ def multiply_vec3(vec, other_vec):
 def divide_vec3(vec, other_vec):
     return Vector([vec[0] / other_vec[0], vec[1] / other_vec[1], vec[2] / other_vec[2]])
 
+# stream the chunks into a temp file next to the target, then swap it in.
+# readers (like the game's hot-reload) never see a half-written file
+def write_file_atomic(filepath, chunks, binary=False, buffer_size=1 << 16):
+    tmp_filepath = filepath + ".tmp"
+    try:
+        with open(tmp_filepath, "wb" if binary else "w", buffering=buffer_size) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_filepath, filepath)
+    except:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+        raise
+
+def file_content_hash(filepath, buffer_size=1 << 16):
+    hasher = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(buffer_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+# like write_file_atomic, but the target is left untouched (same mtime) if the new content is identical.
+# known_record is the (hash, size, mtime_ns) we got when we last wrote the file. if the file on disk still
+# matches its size and mtime, we trust the hash instead of rereading the file.
+# returns the new (hash, size, mtime_ns) record and whether the file was written
+def write_file_if_changed(filepath, chunks, binary=False, known_record=None, buffer_size=1 << 16):
+    tmp_filepath = filepath + ".tmp"
+    try:
+        with open(tmp_filepath, "wb" if binary else "w", buffering=buffer_size) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        # hash the bytes as written, so newline translation is included
+        content_hash = file_content_hash(tmp_filepath, buffer_size)
+        old_hash = None
+        if os.path.exists(filepath):
+            stat = os.stat(filepath)
+            if known_record and known_record[1:] == (stat.st_size, stat.st_mtime_ns):
+                old_hash = known_record[0]
+            else:
+                old_hash = file_content_hash(filepath, buffer_size)
+        written = old_hash != content_hash
+        if written:
+            os.replace(tmp_filepath, filepath)
+        else:
+            os.remove(tmp_filepath)
+    except:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+        raise
+    stat = os.stat(filepath)
+    return (content_hash, stat.st_size, stat.st_mtime_ns), written
+
 def move_directory(src_dir, dst_dir):
     shutil.move(src_dir, dst_dir)
 
@@ -512,26 +583,9 @@ def asset_archive_abspath(assetpath):
 def image_abspath(imgpath):
     return "{}gamedata/img/{}".format(bpy.path.abspath("//").replace('\\', '/'), imgpath)
 
-def global_component_assetpath(component_name):
-    return "scripts/core/components/{}.lua".format(component_name)
-
 def component_assetpath(component_name, scene_name, room_name):
     return "scripts/{}/{}/components/{}.lua".format(scene_name, room_name, component_name)
 
-def get_component_from_asset(assetpath):
-    asset_parts = assetpath.split("/")
-    if asset_parts[1] == 'core':
-        return 'core', None, os.path.splitext(asset_parts[-1])[0]
-    else:
-        return asset_parts[1], asset_parts[2], os.path.splitext(asset_parts[4])[0]
-
-def component_idpath(assetpath):
-    scene, room, component = get_component_from_asset(assetpath)
-    if scene == 'core':
-        return "{}/{}".format(scene, component)
-    else:
-        return "{}/{}/{}".format(scene, room, component)
-
 def asset_scriptpath(assetpath):
     return os.path.relpath(assetpath, start="scripts").replace('\\', '/')
 
@@ -573,6 +627,30 @@ def valid_variant_assetpath(assetpath):
         and os.path.splitext(path_parts[4])[1] == ".lua")
     return valid
 
+# {scene name: {room name: [variant names]}} of the scene and room directories and variant scripts in the scripts folder
+def get_scene_tree_on_disk():
+    scene_tree = {}
+    scenes_dir = asset_abspath("scripts/")
+    if not os.path.exists(scenes_dir):
+        return scene_tree
+    for scene_name in os.listdir(scenes_dir):
+        scene_abspath = os.path.join(scenes_dir, scene_name)
+        if scene_name.startswith('.') or scene_name == "core" or not os.path.isdir(scene_abspath):
+            continue
+        room_tree = scene_tree[scene_name] = {}
+        for room_name in os.listdir(scene_abspath):
+            room_abspath = os.path.join(scene_abspath, room_name)
+            if not os.path.isdir(room_abspath):
+                continue
+            variant_names = room_tree[room_name] = []
+            variants_dir = os.path.join(room_abspath, "states")
+            if os.path.isdir(variants_dir):
+                for variant_filename in os.listdir(variants_dir):
+                    variant_name, ext = os.path.splitext(variant_filename)
+                    if ext == ".lua":
+                        variant_names.append(variant_name)
+    return scene_tree
+
 def get_guid_mapfile():
     return os.path.join(bpy.path.abspath("//"), ".lexeditor", "guids")
 
@@ -639,136 +717,176 @@ def get_unique_variant_name(scene_name, room_name, variant_basename):
             final_name = variant_basename + "_" + str(i)
     return final_name
 
-def get_guids_maps_from_file():
-    guid_map = {}
-    assetpath_map = {}
-    if not bpy.data.filepath:
-        return {}, {}
-    guid_map_filepath = get_guid_mapfile()
-    os.makedirs(os.path.dirname(guid_map_filepath), exist_ok=True)
-    if os.path.exists(guid_map_filepath):
-        with open(guid_map_filepath, "r") as guid_file:
-            # parse the guids from the guid-assetpath map file
-            for line in guid_file:
-                line_parts = line.split("\t")
-                guid, assetpath = line_parts[0], line_parts[1].rstrip()
-                guid_map[guid] = assetpath
-                assetpath_map[assetpath] = guid
-    return guid_map, assetpath_map
-
 # Serializing State
-# ---------------------------  
-def serialize_variant(variant):
-    output = "\t\tv\t{}\n".format(variant.name)
-
-    sorted_states = variant.get_sorted_object_states()
-    for obj_state in sorted_states:
-        mat = obj_state.matrix_local
-        matrix_values = [str(mat[j][i]) for i in range(4) for j in range(4)]
-        output += "\t\t\to\t{}\n".format(obj_state.name)
-        output += "\t\t\t\tlocation\t{}\t{}\t{}\n".format(*obj_state.location)
-        output += "\t\t\t\trotation_quaternion\t{}\t{}\t{}\t{}\n".format(*obj_state.rotation_quaternion)
-        output += "\t\t\t\tscale\t{}\t{}\t{}\n".format(*obj_state.scale)
-        output += "\t\t\t\tmat\t{}\n".format("\t".join(matrix_values))
-        output += "\t\t\t\tobj_type\t{}\n".format(obj_state.obj_type)
-        if obj_state.obj_subtype:
-            output += "\t\t\t\tobj_subtype\t{}\n".format(obj_state.obj_subtype)
-        output += "\t\t\t\tbounds\t{}\t{}\t{}\t{}\t{}\t{}\n".format(*obj_state.bounds.box_min, *obj_state.bounds.box_max)
-        output += "\t\t\t\tparent\t{}\n".format(obj_state.parent)
-        for c in obj_state.components_serialized:
-            output += "\t\t\t\tc\t{}\t{}\t{}\n".format(c.name, c.is_global, c.data.replace('\n', '\@\@'))
-    return output
+# ---------------------------
+# the iter_*_state_chunks generators yield the serialized state one object state at a time,
+# so it can be streamed into a file or a hash without building the whole text first.
+# serialize_* join them for the clipboard. the format is described in state_format.py
+def iter_variant_state_chunks(variant):
+    from . import state_format
+    yield state_format.format_variant_line(variant.name)
+    if variant.pending_state:
+        yield variant.pending_state  # pasted, and its object states weren't needed since
+        return
 
-def serialize_room(room):
-    output = "\tr\t{}\t{}\t{}\t{}\t{}\n".format(room.name, room.location[0], room.location[1], room.size[0], room.size[1])
+    for obj_state in variant.get_sorted_object_states():
+        bounds = obj_state.bounds
+        # the transposed matrix's rows are the columns, so this is column major like matrix_local
+        yield state_format.format_object_state(obj_state.name, obj_state.location, obj_state.rotation_quaternion, obj_state.scale,
+            [v for column in obj_state.matrix_local.transposed() for v in column], obj_state.obj_type, obj_state.obj_subtype,
+            bounds.box_min, bounds.box_max, obj_state.parent,
+            [(c.name, c.is_global, c.data) for c in obj_state.components_serialized])
+
+def iter_room_state_chunks(room):
+    from . import state_format
+    yield state_format.format_room_line(room.name, room.location, room.size)
     for variant in room.variants:
-        output += serialize_variant(variant)
-    return output
+        yield from iter_variant_state_chunks(variant)
 
-def serialize_scene(scene):
-    output = "s\t{}\n".format(scene.name)
+def iter_scene_state_chunks(scene):
+    from . import state_format
+    yield state_format.format_scene_line(scene.name)
     for room in scene.rooms:
-        output += serialize_room(room)
-    return output
+        yield from iter_room_state_chunks(room)
+
+def serialize_variant(variant):
+    return "".join(iter_variant_state_chunks(variant))
 
+def serialize_room(room):
+    return "".join(iter_room_state_chunks(room))
+
+def serialize_scene(scene):
+    return "".join(iter_scene_state_chunks(scene))
+
+def deserialize_scene_node(scene_node, assetpath_map, deserialized_variants):
+    from . import component_usage
+    name = scene_node["name"]
+    scene = bpy.context.scene.smithy2d.scenes.get(name)
+    if not scene:
+        scene_assetpath = scene_dir_assetpath(name)
+        scene = bpy.context.scene.smithy2d.scenes.add()
+        scene.set_name(name)
+        scene.guid = assetpath_map.setdefault(scene_assetpath, str(uuid.uuid4()))
+    scene.dirty = True
+    scene.rooms.clear()
+    component_usage.forget(scene.name)
+    for room_node in scene_node["rooms"]:
+        deserialize_room_node(room_node, scene, assetpath_map, deserialized_variants)
+    return scene
+
+def deserialize_room_node(room_node, scene, assetpath_map, deserialized_variants):
+    from . import component_usage
+    name = room_node["name"]
+    room_assetpath = room_dir_assetpath(scene.name, name)
+    room = scene.rooms.get(name)
+    if not room:
+        room = scene.rooms.add()
+        room.set_name(name)
+        room.guid = assetpath_map.setdefault(room_assetpath, str(uuid.uuid4()))
+    room.variants.clear()
+    component_usage.forget(scene.name, room.name)
+    room.location = room_node["location"]
+    room.size = room_node["size"]
+    if len(scene.rooms) == 1:
+        scene.set_room(0) # select this room if it is the first one
+    for variant_node in room_node["variants"]:
+        deserialize_variant_node(variant_node, scene, room, assetpath_map, deserialized_variants)
+    return room
+
+def deserialize_variant_node(variant_node, scene, room, assetpath_map, deserialized_variants):
+    name = variant_node["name"]
+    variant_assetpath = variant_script_assetpath(scene.name, room.name, name)
+    variant = room.variants.get(name)
+    if not variant:
+        variant = room.variants.add()
+        variant.set_name(name)
+        variant.guid = assetpath_map.setdefault(variant_assetpath, str(uuid.uuid4()))
+    variant.object_states.clear()
+    variant.pending_state = ""
+    deserialized_variants.append((scene.name, room.name, variant.name))
+    if len(room.variants) == 1:
+        room.set_variant(0) # select this variant if it is the first one
+
+    if "lines" in variant_node:
+        # parsed with keep_variant_lines, the object states are created by variant.materialize()
+        variant.pending_state = "".join(line + "\n" for line in variant_node["lines"])
+    else:
+        fill_variant_object_states(variant, variant_node["objects"])
+    return variant
+
+# fills the (empty) object states of a variant: adds all of them first, then sets all matrices with one
+# foreach_set. bounds is a pointer property and the rest are strings/enums, foreach_set can't set those
+def fill_variant_object_states(variant, obj_nodes):
+    object_states = variant.object_states
+    for _ in obj_nodes:
+        object_states.add()
+    bulk_matrices = bool(obj_nodes) and all(obj_node["matrix_local"] is not None for obj_node in obj_nodes)
+    if bulk_matrices:
+        matrix_values = array.array("f")
+        for obj_node in obj_nodes:
+            matrix_values.extend(obj_node["matrix_local"])
+        object_states.foreach_set("matrix_local", matrix_values)
+    for obj_state, obj_node in zip(object_states, obj_nodes):
+        fill_object_state(obj_state, obj_node, set_matrix=not bulk_matrices)
+
+def deserialize_object_node(obj_node, variant):
+    variant.materialize()
+    return fill_object_state(variant.object_states.add(), obj_node)
+
+def fill_object_state(obj_state, obj_node, set_matrix=True):
+    obj_state.name = obj_node["name"]
+    if set_matrix and obj_node["matrix_local"] is not None:
+        obj_state.matrix_local = obj_node["matrix_local"]
+    if obj_node["parent"] is not None:
+        obj_state.parent = obj_node["parent"]
+    if obj_node["bounds"] is not None:
+        obj_state.bounds.box_min, obj_state.bounds.box_max = obj_node["bounds"]
+    if obj_node["obj_type"] is not None:
+        obj_state.obj_type = obj_node["obj_type"]
+    if obj_node["obj_subtype"] is not None:
+        obj_state.obj_subtype = obj_node["obj_subtype"]
+    for name, is_global, data in obj_node["components"]:
+        c = obj_state.components_serialized.add()
+        c.name = name
+        c.is_global = is_global
+        c.data = data
+    return obj_state
+
+# serialized: the clipboard text, or any iterable of its lines.
+# items without a parent in the text go into the given scene/room/variant.
+# lazy only creates the object states of the variants once they are needed (see Smithy2D_Variant.materialize)
 # this modifies the assetpath_to_guid_map with any new guids
-def deserialize_state(serialized, scene, room, variant, assetpath_to_guid_map):
+def deserialize_state(serialized, scene, room, variant, assetpath_to_guid_map, lazy=False):
+    from . import component_usage, state_format
+    lines = serialized.split('\n') if isinstance(serialized, str) else serialized
+    nodes = state_format.parse_state(lines, keep_variant_lines=lazy)
+
+    # only touch bpy once the whole text is parsed
     assetpath_map = assetpath_to_guid_map
-    current_room = room
-    current_variant = variant
-    current_objstate = None
-    lines = serialized.split('\n')
-    for line in lines:
-        line = line.lstrip()
-        if line.startswith('s\t'):
-            scene_parts = line[2:].split('\t')
-            name = scene_parts[0]
-            scene = bpy.context.scene.smithy2d.scenes.get(name)
-            if not scene:
-                scene_assetpath = scene_dir_assetpath(name)
-                scene = bpy.context.scene.smithy2d.scenes.add()
-                scene.set_name(name)
-                scene.guid = assetpath_map.setdefault(scene_assetpath, str(uuid.uuid4()))
-            scene.dirty = True
-            scene.rooms.clear()
-        elif line.startswith('r\t'):
-            room_parts = line[2:].split('\t')
-            name = room_parts[0]
-            room_assetpath = room_dir_assetpath(scene.name, name)
-            current_room = scene.rooms.get(name)
-            if not current_room:
-                current_room = scene.rooms.add()
-                current_room.set_name(name)
-                current_room.guid = assetpath_map.setdefault(room_assetpath, str(uuid.uuid4()))
-            current_room.variants.clear()
-            current_room.location[0] = float(room_parts[1])
-            current_room.location[1] = float(room_parts[2])
-            current_room.size[0] = float(room_parts[3])
-            current_room.size[1] = float(room_parts[4])
-            if len(scene.rooms) == 1:
-                scene.set_room(0) # select this room if it is the first one
-        elif line.startswith('v\t'):
-            variant_parts = line[2:].split('\t')
-            name = variant_parts[0]
-            variant_assetpath = variant_script_assetpath(scene.name, current_room.name, name)
-            current_variant = current_room.variants.get(name)
-            if not current_variant:
-                current_variant = current_room.variants.add()
-                current_variant.set_name(name)
-                current_variant.guid = assetpath_map.setdefault(variant_assetpath, str(uuid.uuid4()))
-            current_variant.object_states.clear()
-            if len(current_room.variants) == 1:
-                current_room.set_variant(0) # select this variant if it is the first one
-        elif line.startswith('o\t'): 
-            obj_parts = line[2:].split('\t')
-            name = obj_parts[0]
-            current_objstate = current_variant.object_states.add()
-            current_objstate.name = name
-        elif line.startswith('mat\t'):
-            #TODO split into rows
-            mat_parts = line[4:].split('\t')
-            mat_values = [float(val) for val in mat_parts]
-            assert len(mat_values) == 16 # check if a valid matrix
-            current_objstate.matrix_local = mat_values
-        elif line.startswith('parent\t'):
-            parent = line[7:]
-            current_objstate.parent = parent
-        elif line.startswith('bounds\t'):
-            line_parts = line[7:].split('\t')
-            bounds_min = (float(line_parts[0]), float(line_parts[1]), float(line_parts[2]))
-            bounds_max = (float(line_parts[3]), float(line_parts[4]), float(line_parts[5]))
-            current_objstate.bounds.box_min = bounds_min
-            current_objstate.bounds.box_max = bounds_max
-        elif line.startswith('obj_type\t'):
-            current_objstate.obj_type = line[9:]
-        elif line.startswith('obj_subtype\t'):
-            current_objstate.obj_subtype = line[12:].strip()
-        elif line.startswith('c\t'):
-            line_parts = line[2:].split('\t', 2)
-            name = line_parts[0]
-            c = current_objstate.components_serialized.add()
-            c.name = name
-            assert line_parts[1] in ["True", "False"] # check if valid bool
-            c.is_global = line_parts[1] == "True"
-            c.data = line_parts[2].replace('\@\@', '\n')
+    deserialized_variants = []  # (scene name, room name, variant name)
+    for node in nodes:
+        if node["tag"] == "s":
+            scene = deserialize_scene_node(node, assetpath_map, deserialized_variants)
+            room = variant = None
+        elif node["tag"] == "r":
+            if scene is None:
+                raise state_format.StateFormatError("Room '{}' outside of a scene".format(node["name"]))
+            room = deserialize_room_node(node, scene, assetpath_map, deserialized_variants)
+            variant = None
+        elif node["tag"] == "v":
+            if room is None:
+                raise state_format.StateFormatError("Variant '{}' outside of a room".format(node["name"]))
+            variant = deserialize_variant_node(node, scene, room, assetpath_map, deserialized_variants)
+        elif node["tag"] == "o":
+            if variant is None:
+                raise state_format.StateFormatError("Object state '{}' outside of a variant".format(node["name"]))
+            deserialize_object_node(node, variant)
+
+    # index the components of the new object states (looked up by name, the references may be stale by now)
+    for scene_name, room_name, variant_name in deserialized_variants:
+        d_scene = bpy.context.scene.smithy2d.scenes.get(scene_name)
+        d_room = d_scene.rooms.get(room_name) if d_scene else None
+        d_variant = d_room.variants.get(variant_name) if d_room else None
+        if d_variant:
+            component_usage.update_variant(d_scene, d_room, d_variant)
 
@@ -9,7 +9,7 @@ def update_variant_to_1_0_0(variant):
         dim = len(mat)
         return [mat[j][i] for i in range(dim) for j in range(dim)]
 
-    for obj_state in variant.object_states:
+    for obj_state in variant.materialize().object_states:
         loc = Vector(obj_state.location)
         rot = Quaternion(obj_state.rotation_quaternion)
         scale = Vector(obj_state.scale)
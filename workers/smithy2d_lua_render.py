@@ -0,0 +1,99 @@
+import os
+import time
+
+# Lua Renderer
+# ---------------------------
+# renders the exporter's scene snapshots (plain python data, see exporter.snapshot_scene) to lua.
+# this module imports neither bpy nor the addon package: the export workers are spawned processes
+# (a fork of blender would copy its locks and threads, eg. the script watcher's, in whatever state they're in),
+# so they import it by this top-level name from the workers folder, which only their sys.path has (the addon loads it by path).
+
+def global_component_assetpath(component_name):
+    return "scripts/core/components/{}.lua".format(component_name)
+
+def get_component_from_asset(assetpath):
+    asset_parts = assetpath.split("/")
+    if asset_parts[1] == 'core':
+        return 'core', None, os.path.splitext(asset_parts[-1])[0]
+    else:
+        return asset_parts[1], asset_parts[2], os.path.splitext(asset_parts[4])[0]
+
+def component_idpath(assetpath):
+    scene, room, component = get_component_from_asset(assetpath)
+    if scene == 'core':
+        return "{}/{}".format(scene, component)
+    else:
+        return "{}/{}/{}".format(scene, room, component)
+
+def convert_to_lua_value(datatype, val):
+    if datatype == "string":
+        return "\"" + val + "\""
+    elif datatype == "vec2":
+        return "{" + ",".join(map(str, val[0:2])) + "}"
+    elif datatype == "vec3":
+        return "{" + ",".join(map(str, val[0:3])) + "}"
+    elif datatype == "vec4":
+        return "{" + ",".join(map(str, val[0:4])) + "}"
+    elif val in ["", None]:
+        return "nil"
+    elif datatype == "float":
+        return str(val)
+    return "\"" + str(val) + "\""
+
+def obj_snapshot_to_lua_string(obj, line_prefix):
+    lines = ["{}{{\n".format(line_prefix)]
+    lines.append("{}\tname = \"{}\",\n".format(line_prefix, obj["name"]))
+    if obj["parent"] != "":
+        lines.append("{}\tparent = \"{}\",\n".format(line_prefix, obj["parent"]))
+
+    lines.append("{}\tcomponents = {{\n".format(line_prefix))
+
+    # transform component
+    lines.append("{}\t\t[\"{}\"] = {{\n".format(line_prefix, component_idpath(global_component_assetpath("Transform"))))
+    for i_n, i_t, i_v in obj["transform"]:
+        lines.append("{}\t\t\t[\"{}\"]={},\n".format(line_prefix, i_n, convert_to_lua_value(i_t, i_v)))
+    lines.append("{}\t\t}},\n".format(line_prefix)) # end component
+
+    # other components
+    for c_assetpath, inputs in obj["components"]:
+        lines.append("{}\t\t[\"{}\"] = {{\n".format(line_prefix, component_idpath(c_assetpath)))
+        for i in inputs:
+            try:
+                input_name, input_datatype, input_value = i
+                lines.append("{}\t\t\t[\"{}\"]={},\n".format(line_prefix, input_name, convert_to_lua_value(input_datatype, input_value)))
+            except:
+                print("ERROR: Invalid component input in a state for object '{}', component '{}', input ['{}']".format(
+                    obj["name"], c_assetpath, i[0]))
+                raise
+        lines.append("{}\t\t}},\n".format(line_prefix)) # end component
+
+    lines.append(line_prefix + "\t}\n") # end component list
+    lines.append(line_prefix + "}") # end object state
+    return "".join(lines)
+
+# yields a room's lua table in chunks (one per object state).
+# newly rendered object states are added to rendered_objs {(variant key, object name): lua}
+def iter_room_lua_chunks(room_snapshot, rendered_objs):
+    yield "\t\t[\"{}\"] = {{\n".format(room_snapshot["name"])   # export room
+    for variant_snapshot in room_snapshot["variants"]:
+        # export state node
+        yield "\t\t\t[\"{}\"] = {{\n".format(variant_snapshot["name"])
+        yield "\t\t\t\t{} = \"{}\",\n".format("script", variant_snapshot["script"])
+
+        yield "\t\t\t\tobjects = {\n"  # object list
+        for obj in variant_snapshot["objects"]:
+            obj_lua = obj["lua"]
+            if obj_lua is None:
+                obj_lua = obj_snapshot_to_lua_string(obj, "\t\t\t\t\t")
+                rendered_objs[(variant_snapshot["key"], obj["name"])] = obj_lua
+            yield obj_lua + ",\n"
+
+        yield "\t\t\t\t}\n\t\t\t},\n"  # end object list + end variant
+    yield "\t\t},\n" # end room
+
+# runs in a worker process
+def render_room_lua(room_snapshot):
+    start = time.perf_counter()
+    rendered_objs = {}
+    room_lua = "".join(iter_room_lua_chunks(room_snapshot, rendered_objs))
+    return room_lua, rendered_objs, time.perf_counter() - start